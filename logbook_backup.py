@@ -0,0 +1,265 @@
+"""Online backups of the logbook with the SQLite backup API, kept as a rotation of snapshots
+
+A backup copies the database a few pages at a time with a short pause
+between steps. Each step only holds a read lock, so the window and other
+terminals carry on writing while it runs. SQLite restarts a backup that sees
+another connection write to the logbook, so a copy always matches a single
+moment in time. Each snapshot is written under a temporary name and checked
+with PRAGMA quick_check, and only then does it get its timestamped name.
+"""
+import logging
+import os
+import pathlib
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Snapshots kept by default; older ones are deleted after each backup
+BACKUP_KEEP = 10
+
+# Pages copied per backup step and the pause after each step, so a large
+# logbook is copied in the background without holding up writers
+BACKUP_STEP_PAGES = 256
+BACKUP_STEP_PAUSE = 0.002
+
+# Restarts allowed before a backup that writers keep restarting is finished
+# in one step, briefly holding up writers instead of never finishing
+BACKUP_MAX_RESTARTS = 5
+
+# Snapshot file names: <logbook name>-YYYYMMDD-HHMMSS.db
+SNAPSHOT_TIME_FORMAT = '%Y%m%d-%H%M%S'
+
+# Minutes between automatic backups while the window is open
+BACKUP_INTERVAL_MINUTES = 60
+
+def backup_dir_for(db_path):
+    """Default snapshot directory: a "backups" folder next to the logbook"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'backups')
+
+def snapshot_pattern(db_path):
+    """Regular expression matching the snapshot file names of a logbook"""
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return re.compile(re.escape(stem) + r'-(\d{8}-\d{6})(?:-(\d+))?\.db$')
+
+def list_backups(db_path, backup_dir=None):
+    """Return (path, taken at, size in bytes) for each snapshot of a logbook, newest first"""
+    backup_dir = backup_dir or backup_dir_for(db_path)
+    if not os.path.isdir(backup_dir):
+        return []
+    
+    pattern = snapshot_pattern(db_path)
+    backups = []
+    for name in os.listdir(backup_dir):
+        match = pattern.match(name)
+        if match:
+            path = os.path.join(backup_dir, name)
+            taken = datetime.strptime(match.group(1), SNAPSHOT_TIME_FORMAT)
+            backups.append((taken, int(match.group(2) or 0), path))
+    backups.sort(reverse=True)
+    return [(path, taken, os.path.getsize(path)) for taken, _, path in backups]
+
+def prune_backups(db_path, backup_dir=None, keep=BACKUP_KEEP, protect=()):
+    """Delete all but the newest keep snapshots of a logbook, never deleting those in protect"""
+    protect = {os.path.abspath(path) for path in protect}
+    for path, _, _ in list_backups(db_path, backup_dir)[max(keep, 1):]:
+        if os.path.abspath(path) not in protect:
+            os.remove(path)
+
+def open_read_only(path):
+    """Open a database file read-only"""
+    return sqlite3.connect(pathlib.Path(path).absolute().as_uri() + '?mode=ro', uri=True)
+
+def quick_check(path):
+    """Run PRAGMA quick_check on a database file and return the problems found, empty if it is sound"""
+    conn = open_read_only(path)
+    try:
+        problems = [row[0] for row in conn.execute('PRAGMA quick_check')]
+    except sqlite3.DatabaseError as e:
+        problems = [str(e)]
+    finally:
+        conn.close()
+    return [] if problems == ['ok'] else problems
+
+class BackupRestartLimit(Exception):
+    """Raised inside a stepped backup to abandon it after too many restarts"""
+
+def copy_database(source, target, pages=BACKUP_STEP_PAGES, pause=BACKUP_STEP_PAUSE, progress=None,
+                  max_restarts=BACKUP_MAX_RESTARTS):
+    """Copy one open database into another through the backup API in steps of pages
+    
+    A write to the source by another connection restarts the copy. After
+    max_restarts restarts the copy is made again in a single step. progress,
+    if given, is called with the pages copied and the total.
+    """
+    restarts = 0
+    copied = 0
+    
+    def step(status, remaining, total):
+        nonlocal restarts, copied
+        # The pages copied only go down, or stay put, when the copy starts over
+        if total - remaining <= copied and pages > 0:
+            restarts += 1
+            if restarts > max_restarts:
+                raise BackupRestartLimit
+        copied = total - remaining
+        if progress:
+            progress(copied, total)
+        if remaining and pause:
+            time.sleep(pause)
+    
+    try:
+        source.backup(target, pages=pages, progress=step)
+    except BackupRestartLimit:
+        logger.warning("Backup restarted %d times by writes to the logbook, finishing it in one step", restarts)
+        source.backup(target, pages=-1)
+
+def backup_logbook(db_path, backup_dir=None, keep=BACKUP_KEEP, pages=BACKUP_STEP_PAGES, pause=BACKUP_STEP_PAUSE,
+                   progress=None):
+    """Write a verified, timestamped snapshot of a logbook and delete the oldest beyond keep
+    
+    Returns the path of the new snapshot. Raises ValueError, leaving the
+    existing snapshots alone, if the copy fails its quick check. With
+    keep=None no snapshots are deleted.
+    """
+    if not os.path.exists(db_path):
+        raise ValueError(f"There is no logbook at {db_path}")
+    backup_dir = backup_dir or backup_dir_for(db_path)
+    os.makedirs(backup_dir, exist_ok=True)
+    
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    taken = datetime.now().strftime(SNAPSHOT_TIME_FORMAT)
+    # Backups within the same second are numbered after the highest number
+    # still kept, not in the first free slot, so the newest always sorts first
+    pattern = snapshot_pattern(db_path)
+    counters = [int(match.group(2) or 0) for match in map(pattern.match, os.listdir(backup_dir))
+                if match and match.group(1) == taken]
+    name = f"{stem}-{taken}-{max(counters) + 1}" if counters else f"{stem}-{taken}"
+    path = os.path.join(backup_dir, name + '.db')
+    partial = path + '.partial'
+    
+    source = open_read_only(db_path)
+    target = sqlite3.connect(partial)
+    try:
+        copy_database(source, target, pages, pause, progress)
+    finally:
+        target.close()
+        source.close()
+    
+    problems = quick_check(partial)
+    if problems:
+        os.remove(partial)
+        raise ValueError(f"The backup copy failed its check: {'; '.join(problems[:5])}")
+    os.replace(partial, path)
+    
+    if keep is not None:
+        prune_backups(db_path, backup_dir, keep)
+    return path
+
+def changed_since_backup(db_path, backup_dir=None):
+    """Return whether a logbook, or its write-ahead log, was written since its newest snapshot was started"""
+    backups = list_backups(db_path, backup_dir)
+    if not backups:
+        return True
+    started = backups[0][1].timestamp()
+    return any(os.path.getmtime(path) >= started for path in (db_path, db_path + '-wal') if os.path.exists(path))
+
+def restore_backup(snapshot, db_path, backup_dir=None, keep=BACKUP_KEEP):
+    """Replace a logbook's contents with a snapshot, taking a snapshot of the current contents first
+    
+    The snapshot is checked before anything is touched, and is copied into
+    the logbook in a single backup step under the logbook's write lock, so
+    other terminals see either the old contents or the restored ones.
+    Returns the path of the snapshot taken of the contents replaced.
+    """
+    problems = quick_check(snapshot)
+    if problems:
+        raise ValueError(f"{os.path.basename(snapshot)} failed its check: {'; '.join(problems[:5])}")
+    
+    saved = backup_logbook(db_path, backup_dir, keep=None) if os.path.exists(db_path) else None
+    source = open_read_only(snapshot)
+    target = sqlite3.connect(db_path, timeout=30)
+    try:
+        copy_database(source, target, pages=-1, pause=0)
+    finally:
+        target.close()
+        source.close()
+    
+    prune_backups(db_path, backup_dir, keep, protect=(snapshot, saved) if saved else (snapshot,))
+    return saved
+
+class BackupService:
+    """Takes backups on a background thread, on request and every interval_minutes
+    
+    An automatic backup is skipped when the logbook hasn't been written since
+    the newest snapshot was taken. Finished backups and restores are reported through a queue that the
+    owning thread empties with deliver_results, as with DatabaseWorker.
+    Automatic backups report to on_backup and on_error.
+    """
+    
+    def __init__(self, db_path, backup_dir=None, keep=BACKUP_KEEP, interval_minutes=BACKUP_INTERVAL_MINUTES,
+                 on_backup=None, on_error=None):
+        self.db_path = db_path
+        self.on_backup = on_backup
+        self.on_error = on_error
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.interval = interval_minutes * 60 if interval_minutes else None
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.running = False
+        self.thread = threading.Thread(target=self.run, name="logbook-backup", daemon=True)
+        self.thread.start()
+    
+    def backup_now(self, on_done=None, on_error=None):
+        """Queue a backup; on_done gets the snapshot path"""
+        self.requests.put((lambda: backup_logbook(self.db_path, self.backup_dir, self.keep), on_done, on_error))
+    
+    def restore(self, snapshot, on_done=None, on_error=None):
+        """Queue a restore of a snapshot; on_done gets the path of the snapshot taken beforehand"""
+        self.requests.put((lambda: restore_backup(snapshot, self.db_path, self.backup_dir, self.keep),
+                           on_done, on_error))
+    
+    def backups(self):
+        """Return the logbook's snapshots as from list_backups"""
+        return list_backups(self.db_path, self.backup_dir)
+    
+    def run(self):
+        """Backup thread: run queued requests, and a backup whenever the interval passes without one"""
+        while True:
+            try:
+                request = self.requests.get(timeout=self.interval)
+            except queue.Empty:
+                if not changed_since_backup(self.db_path, self.backup_dir):
+                    continue
+                request = (lambda: backup_logbook(self.db_path, self.backup_dir, self.keep), self.on_backup,
+                           self.on_error)
+            if request is None:
+                break
+            
+            job, on_done, on_error = request
+            self.running = True
+            try:
+                callback, value = on_done, job()
+            except Exception as e:
+                callback, value = on_error, e
+            self.running = False
+            self.results.put((callback, value))
+    
+    def deliver_results(self):
+        """Call back with the results of finished backups and restores, on the calling thread"""
+        while True:
+            try:
+                callback, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if callback:
+                callback(value)
+    
+    def stop(self):
+        """Finish the queued requests and stop the thread"""
+        self.requests.put(None)
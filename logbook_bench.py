@@ -0,0 +1,438 @@
+"""Generate synthetic logbooks and time the operations the window depends on
+    
+    python logbook_bench.py generate big.db --flights 100000
+    python logbook_bench.py run --sizes 1000 10000 100000 --output results.json
+    python logbook_bench.py compare before.json after.json
+
+Generated logbooks are reproducible: the same --seed always gives the same
+flights. run keeps them in --data-dir so later runs skip the generation.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from logbook_store import LogbookStore, STORAGE_PROFILES
+
+# Aircraft flown at the club: (type, number of airframes, share of launches, two-seater, self-launching)
+FLEET = (
+    ('ASK 21', 4, 30, True, False),
+    ('ASK 13', 2, 12, True, False),
+    ('Duo Discus', 2, 8, True, False),
+    ('DG-1000', 1, 5, True, False),
+    ('Arcus M', 1, 4, True, True),
+    ('Discus 2b', 3, 12, False, False),
+    ('LS8', 3, 10, False, False),
+    ('Astir CS', 2, 8, False, False),
+    ('ASW 28', 2, 6, False, False),
+    ('Ventus 3M', 2, 5, False, True),
+)
+
+# Names the club membership is drawn from
+FIRST_NAMES = ('Alice', 'Ben', 'Claire', 'David', 'Emma', 'Frank', 'Grace', 'Harry', 'Isla', 'James',
+               'Kate', 'Liam', 'Maria', 'Neil', 'Olivia', 'Peter', 'Rachel', 'Sam', 'Tom', 'Zoe')
+SURNAMES = ('Baker', 'Clarke', 'Davies', 'Evans', 'Fisher', 'Green', 'Hughes', 'Jones', 'King', 'Lewis',
+            'Morgan', 'Newton', 'Owen', 'Price', 'Roberts', 'Smith', 'Taylor', 'Walker', 'Wright', 'Young')
+CLUB_PILOTS = 150
+CLUB_INSTRUCTORS = 15
+
+# Launch sites and their share of launches; the first is the home field
+SITES = (('Lasham', 80), ('Dunstable', 6), ('Husbands Bosworth', 5), ('Aboyne', 4), ('Portmoak', 3),
+         ('Sutton Bank', 2))
+
+# Share of launches by month, peaking in early summer
+MONTH_WEIGHTS = (1, 2, 5, 9, 13, 15, 15, 14, 11, 7, 3, 1)
+
+# Launches a year at a busy club, used to spread generated flights over the years
+FLIGHTS_PER_YEAR = 5000
+LAST_YEAR = 2025
+
+# Typical flight length in minutes and its spread for each launch method
+DURATIONS = {'Winch': (8, 0.9), 'Aerotow': (35, 0.9), 'Self Launch': (150, 0.5)}
+
+# Remarks added to a few flights
+NOTES = ('Check flight', 'Cable break, simulated', 'Field landing', 'Wave', 'First solo',
+         'Spin training', 'Ridge soaring', 'Competition task', 'Badge flight, logger fitted')
+
+# Logbook sizes timed by run unless --sizes is given
+BENCH_SIZES = (1000, 10000, 100000, 1000000)
+
+# Rows the window shows at once, as requested by each list benchmark
+PAGE_ROWS = 30
+
+# Rows per second a CSV import into an empty logbook should sustain on a
+# laptop. Trigram search indexing and the secondary indexes take most of the
+# time, which keeps this well short of the 100k rows/s first hoped for
+IMPORT_TARGET_ROWS_PER_S = 15000
+# Runs of the import benchmark, which takes a minute on the largest logbooks
+IMPORT_REPEAT = 2
+
+# Search-as-you-type sequences: (name, filter, text typed one key at a time)
+TYPING_SEQUENCES = (
+    ('aircraft', 'All', 'discus'),
+    ('registration', 'Registration', 'g-c'),
+    ('pilot', 'Pilot', 'taylor'),
+    ('site', 'All', 'husbands'),
+)
+
+class FlightGenerator:
+    """Reproducible source of flights with a realistic club mix"""
+    
+    def __init__(self, seed=1):
+        self.rng = random.Random(seed)
+        
+        # Give every airframe its own registration
+        registrations = set()
+        self.fleet = []
+        self.fleet_weights = []
+        for aircraft_type, airframes, share, two_seater, self_launching in FLEET:
+            for _ in range(airframes):
+                registration = self.unused_registration(registrations)
+                self.fleet.append((aircraft_type, registration, two_seater, self_launching))
+                self.fleet_weights.append(share / airframes)
+        
+        # A few members fly most of the launches
+        names = [f"{first} {surname}" for surname in SURNAMES for first in FIRST_NAMES]
+        self.pilots = self.rng.sample(names, CLUB_PILOTS)
+        self.pilot_weights = [1 / (rank + 1) ** 0.8 for rank in range(CLUB_PILOTS)]
+        self.instructors = self.pilots[:CLUB_INSTRUCTORS]
+        
+        self.sites = [site for site, _ in SITES]
+        self.site_weights = [share for _, share in SITES]
+    
+    def unused_registration(self, registrations):
+        """Return a new G-Cxxx registration"""
+        while True:
+            registration = 'G-C' + ''.join(self.rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ') for _ in range(3))
+            if registration not in registrations:
+                registrations.add(registration)
+                return registration
+    
+    def random_date(self, first_year, last_year):
+        """Return an ISO date in the given years, weighted towards the summer"""
+        year = self.rng.randint(first_year, last_year)
+        month = self.rng.choices(range(1, 13), MONTH_WEIGHTS)[0]
+        day = self.rng.randint(1, 28)
+        return date(year, month, day).isoformat()
+    
+    def flight(self, flight_date=None):
+        """Return a flight dict as the entry form would produce it"""
+        rng = self.rng
+        aircraft_type, registration, two_seater, self_launching = rng.choices(self.fleet, self.fleet_weights)[0]
+        
+        if self_launching and rng.random() < 0.8:
+            launch_method = 'Self Launch'
+        else:
+            launch_method = 'Winch' if rng.random() < 0.65 else 'Aerotow'
+        median, spread = DURATIONS[launch_method]
+        minutes = int(min(720, max(3, rng.lognormvariate(0, spread) * median)))
+        
+        pilot = rng.choices(self.pilots, self.pilot_weights)[0]
+        instructor = ''
+        if two_seater and rng.random() < 0.6:
+            instructor = rng.choice([name for name in self.instructors if name != pilot])
+        
+        launch_site = rng.choices(self.sites, self.site_weights)[0]
+        landing_site = launch_site
+        distance = ''
+        # Longer solo flights are mostly cross-countries, some ending in a field
+        if minutes >= 90 and rng.random() < (0.1 if instructor else 0.5):
+            distance = f"{minutes / 60 * rng.uniform(45, 95):.1f}"
+            if rng.random() < 0.15:
+                landing_site = rng.choice([site for site in self.sites if site != launch_site])
+        
+        if minutes < 12:
+            altitude = rng.randint(9, 16) * 100
+        else:
+            altitude = int(min(25000, rng.lognormvariate(0, 0.4) * 3000)) // 50 * 50
+        
+        return {
+            'date': flight_date or self.random_date(LAST_YEAR - 9, LAST_YEAR),
+            'aircraft_type': aircraft_type,
+            'aircraft_registration': registration,
+            'pilot_in_command': pilot,
+            'instructor': instructor,
+            'launch_method': launch_method,
+            'launch_site': launch_site,
+            'landing_site': landing_site,
+            'flight_duration': f"{minutes // 60}:{minutes % 60:02d}",
+            'max_altitude': str(altitude),
+            'cross_country_distance': distance,
+            'notes': rng.choice(NOTES) if rng.random() < 0.08 else '',
+        }
+    
+    def flights(self, count):
+        """Yield count flights in date order, spread over as many seasons as a busy club needs"""
+        years = min(40, count // FLIGHTS_PER_YEAR + 1)
+        dates = sorted(self.random_date(LAST_YEAR - years + 1, LAST_YEAR) for _ in range(count))
+        for flight_date in dates:
+            yield self.flight(flight_date)
+
+def generate_logbook(path, count, seed=1, profile='standard', progress=None):
+    """Create a logbook at path holding count generated flights"""
+    if os.path.exists(path):
+        raise ValueError(f"{path} already exists")
+    logbook = LogbookStore(path, profile=profile)
+    flights = enumerate(FlightGenerator(seed).flights(count), 1)
+    imported, errors = logbook.bulk_load(lambda: logbook.import_flight_rows(flights, progress))
+    if errors:
+        raise ValueError(f"generated flight {errors[0][0]} was rejected: {errors[0][1]}")
+    logbook.conn.execute('ANALYZE')
+    return imported
+
+def bench_logbook(data_dir, count, seed, profile):
+    """Return the path of a generated logbook of count flights, generating it if needed"""
+    path = os.path.join(data_dir, f"bench-{count}-seed{seed}.db")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        started = time.perf_counter()
+        print(f"Generating {count} flights into {path}...", file=sys.stderr)
+        try:
+            generate_logbook(path + '.tmp', count, seed, profile)
+        except BaseException:
+            for suffix in ('.tmp', '.tmp-wal', '.tmp-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            raise
+        os.replace(path + '.tmp', path)
+        print(f"Generated in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return path
+
+def time_runs(operation, repeat):
+    """Call operation repeat times and return the elapsed seconds of each call"""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        runs.append(time.perf_counter() - started)
+    return runs
+
+def time_typing(logbook, filter_category, text, repeat):
+    """Time typing text into the search box, returning (whole sequence, single keystroke) runs"""
+    sequences = []
+    keystrokes = []
+    for _ in range(repeat):
+        logbook.search.invalidate()
+        started = time.perf_counter()
+        for length in range(1, len(text) + 1):
+            key_started = time.perf_counter()
+            logbook.find_flights(text[:length], filter_category, 0, PAGE_ROWS)
+            keystrokes.append(time.perf_counter() - key_started)
+        sequences.append(time.perf_counter() - started)
+    return sequences, keystrokes
+
+def run_benchmarks(path, repeat, seed, profile):
+    """Time every benchmark against one logbook and return (name, runs) pairs"""
+    results = []
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logbook_cli.py')
+    results.append(('cold_start', time_runs(
+        lambda: subprocess.run([sys.executable, cli, '--database', path, '--profile', profile, 'totals'],
+                               check=True, stdout=subprocess.DEVNULL), repeat)))
+    results.append(('open_logbook', time_runs(lambda: LogbookStore(path, profile=profile), repeat)))
+    
+    logbook = LogbookStore(path, profile=profile)
+    
+    def list_load():
+        logbook.search.invalidate()
+        logbook.find_flights('', 'All', 0, PAGE_ROWS)
+    
+    def list_last_page():
+        logbook.search.invalidate()
+        total, _ = logbook.find_flights('', 'All', 0, 0)
+        logbook.search.rows(max(0, total - PAGE_ROWS), PAGE_ROWS)
+    
+    def list_all_rows():
+        logbook.search.invalidate()
+        logbook.find_flights('', 'All')
+    
+    results.append(('list_load', time_runs(list_load, repeat)))
+    results.append(('list_last_page', time_runs(list_last_page, repeat)))
+    results.append(('list_all_rows', time_runs(list_all_rows, repeat)))
+    
+    def list_sorted_last_page():
+        logbook.search.invalidate()
+        total, _ = logbook.find_flights('', 'All', 0, 0, sort=('Pilot', False))
+        logbook.search.rows(max(0, total - PAGE_ROWS), PAGE_ROWS)
+    
+    results.append(('list_sorted_last_page', time_runs(list_sorted_last_page, repeat)))
+    
+    for name, filter_category, text in TYPING_SEQUENCES:
+        sequences, keystrokes = time_typing(logbook, filter_category, text, repeat)
+        results.append((f'type_{name}', sequences))
+        results.append((f'type_{name}_keystroke', keystrokes))
+    
+    results.append(('totals', time_runs(logbook.totals, repeat)))
+    results.append(('totals_rebuild', time_runs(logbook.rebuild_totals, repeat)))
+    results.append(('statistics', time_runs(lambda: logbook.statistics('Month'), repeat)))
+    results.append(('statistics_rebuild', time_runs(logbook.rebuild_statistics, repeat)))
+    
+    rng = random.Random(seed)
+    last_id = logbook.conn.execute('SELECT MAX(id) FROM flights').fetchone()[0] or 0
+    results.append(('flight_details', time_runs(lambda: logbook.get_flight(rng.randint(1, last_id)), repeat)))
+    
+    def completion_load():
+        logbook.completions.invalidate()
+        logbook.completions.field('pilot_in_command')
+    
+    results.append(('completion_load', time_runs(completion_load, repeat)))
+    results.append(('completion_suggest', time_runs(lambda: logbook.completions.suggest('pilot_in_command', 'a'),
+                                                    repeat)))
+    
+    def currency_load():
+        logbook.currency_index.invalidate()
+        logbook.currency_index.current()
+    
+    results.append(('currency_load', time_runs(currency_load, repeat)))
+    results.append(('currency_report', time_runs(logbook.currency_report, repeat)))
+    
+    # Writes leave the logbook as they found it so runs stay comparable
+    generator = FlightGenerator(seed)
+    created = []
+    results.append(('create_flight', time_runs(lambda: created.append(logbook.create_flight(generator.flight())),
+                                               repeat)))
+    updates = iter(created)
+    results.append(('save_flight', time_runs(lambda: logbook.save_flight(next(updates), generator.flight()),
+                                             repeat)))
+    removals = iter(created)
+    results.append(('remove_flight', time_runs(lambda: logbook.remove_flight(next(removals)), repeat)))
+    
+    # Importing the logbook's own CSV export into an empty one times the bulk import
+    with tempfile.TemporaryDirectory() as scratch:
+        csv_path = os.path.join(scratch, 'flights.csv')
+        logbook.export_flights(csv_path)
+        imports = []
+        
+        def import_csv():
+            target = LogbookStore(os.path.join(scratch, f"import-{len(imports)}.db"), profile=profile)
+            imports.append(target.import_file(csv_path)[0])
+            target.conn.close()
+        
+        results.append(('import_csv', time_runs(import_csv, min(repeat, IMPORT_REPEAT))))
+    
+    return results
+
+def summarize(size, name, runs):
+    """Return the machine-readable result for one benchmark"""
+    result = {
+        'size': size,
+        'benchmark': name,
+        'runs': len(runs),
+        'min_ms': round(min(runs) * 1000, 3),
+        'median_ms': round(statistics.median(runs) * 1000, 3),
+        'max_ms': round(max(runs) * 1000, 3),
+    }
+    if name == 'import_csv':
+        result['rows_per_s'] = round(size / statistics.median(runs))
+    return result
+
+def run_generate(path, count, seed=1, profile='standard'):
+    """Write a generated logbook to path"""
+    started = time.perf_counter()
+    
+    def report(done):
+        print(f"Generated {done} of {count} flights", file=sys.stderr)
+    
+    try:
+        generated = generate_logbook(path, count, seed, profile, report)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        sys.exit(f"Generation failed: {e}")
+    print(f"Generated {generated} flights in {time.perf_counter() - started:.1f}s")
+    return 0
+
+def run_suite(sizes, repeat=5, seed=1, profile='standard', data_dir='bench_data', output=None):
+    """Time every benchmark against each logbook size, printing a table and optionally writing JSON"""
+    report = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'profile': profile,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'results': [],
+    }
+    
+    print(f"{'Flights':>8}  {'Benchmark':<28}  {'min ms':>10}  {'median ms':>10}  {'max ms':>10}")
+    for size in sizes:
+        path = bench_logbook(data_dir, size, seed, profile)
+        for name, runs in run_benchmarks(path, repeat, seed, profile):
+            result = summarize(size, name, runs)
+            report['results'].append(result)
+            print(f"{size:>8}  {name:<28}  {result['min_ms']:>10.2f}  {result['median_ms']:>10.2f}  "
+                  f"{result['max_ms']:>10.2f}")
+            if 'rows_per_s' in result:
+                below = '  BELOW TARGET' if result['rows_per_s'] < IMPORT_TARGET_ROWS_PER_S else ''
+                print(f"{'':>8}  {'':<28}  {result['rows_per_s']} rows/s against a target of "
+                      f"{IMPORT_TARGET_ROWS_PER_S}{below}")
+    
+    if output:
+        with open(output, 'w') as out:
+            json.dump(report, out, indent=2)
+            out.write('\n')
+    return 0
+
+def run_compare(before_path, after_path, threshold=20.0):
+    """Print the change in median time between two result files, failing on regressions over threshold percent"""
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before = {(r['size'], r['benchmark']): r for r in json.load(before_file)['results']}
+        after = json.load(after_file)['results']
+    
+    regressions = 0
+    print(f"{'Flights':>8}  {'Benchmark':<28}  {'before ms':>10}  {'after ms':>10}  {'change':>8}")
+    for result in after:
+        previous = before.get((result['size'], result['benchmark']))
+        if previous is None:
+            continue
+        change = ((result['median_ms'] - previous['median_ms']) / previous['median_ms'] * 100
+                  if previous['median_ms'] else 0.0)
+        flag = ''
+        if change > threshold:
+            regressions += 1
+            flag = '  REGRESSION'
+        print(f"{result['size']:>8}  {result['benchmark']:<28}  {previous['median_ms']:>10.2f}  "
+              f"{result['median_ms']:>10.2f}  {change:>+7.1f}%{flag}")
+    print(f"{regressions} regression(s) over {threshold:g}%")
+    return 1 if regressions else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Glider Pilot Logbook generator and benchmarks")
+    parser.add_argument('--seed', type=int, default=1, help="seed for the generated flights (default: 1)")
+    parser.add_argument('--profile', default='standard', choices=list(STORAGE_PROFILES),
+                        help="storage profile to benchmark (default: standard)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    generate = commands.add_parser('generate', help="write a logbook of generated flights")
+    generate.add_argument('path', metavar='FILE')
+    generate.add_argument('--flights', type=int, default=10000, help="number of flights (default: 10000)")
+    
+    run = commands.add_parser('run', help="time the benchmarks against generated logbooks")
+    run.add_argument('--sizes', type=int, nargs='+', default=list(BENCH_SIZES),
+                     help="logbook sizes to time (default: %(default)s)")
+    run.add_argument('--repeat', type=int, default=5, help="runs of each benchmark (default: 5)")
+    run.add_argument('--data-dir', default='bench_data',
+                     help="where generated logbooks are kept between runs (default: bench_data)")
+    run.add_argument('--output', metavar='FILE', help="write the results to FILE as JSON")
+    
+    compare = commands.add_parser('compare', help="compare two JSON result files")
+    compare.add_argument('before', metavar='BEFORE')
+    compare.add_argument('after', metavar='AFTER')
+    compare.add_argument('--threshold', type=float, default=20.0,
+                         help="slowdown in percent reported as a regression (default: 20)")
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == 'generate':
+        return run_generate(args.path, args.flights, args.seed, args.profile)
+    if args.command == 'run':
+        return run_suite(args.sizes, args.repeat, args.seed, args.profile, args.data_dir, args.output)
+    return run_compare(args.before, args.after, args.threshold)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""Command-line access to the glider logbook that runs without tkinter or a display"""
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from logbook_store import (LogbookStore, FILTER_COLUMNS, EXPORT_FORMATS, STORAGE_PROFILES, STATISTICS_DIMENSIONS,
+                           SORT_COLUMNS, DEFAULT_SORT, BULK_EDIT_FIELDS, CURRENCY_WINDOWS, check_query_plans,
+                           parse_date_range)
+from logbook_backup import backup_logbook, list_backups, restore_backup, BACKUP_KEEP
+
+# Flights listed by the query command unless --limit is given
+QUERY_LIMIT = 50
+
+# Headings and widths for the query command's table output
+QUERY_HEADINGS = ('ID', 'Date', 'Aircraft', 'Registration', 'Pilot', 'Launch', 'Duration',
+                  'Max Alt (ft)', 'XC Dist (km)')
+QUERY_WIDTHS = (6, 10, 14, 12, 18, 10, 8, 12, 12)
+
+def report_upgrade(description, done, total):
+    """Show the progress of a logbook schema upgrade on stderr"""
+    if total:
+        print(f"Upgrading logbook: {description} ({done} of {total} flights)", file=sys.stderr)
+    else:
+        print(f"Upgrading logbook: {description}...", file=sys.stderr)
+
+def run_query(database, search_term='', filter_category='All', offset=0, limit=QUERY_LIMIT, as_json=False,
+              profile='standard', sort=DEFAULT_SORT, date_range=None):
+    """Print a page of the flights matching a search, newest first unless another sort is given"""
+    logbook = LogbookStore(database, progress=report_upgrade, profile=profile)
+    total, rows = logbook.find_flights(search_term, filter_category, offset, limit, sort, date_range)
+    
+    if as_json:
+        columns = logbook.search.RESULT_COLUMNS[:logbook.search.DISPLAY_WIDTH]
+        for row in rows:
+            print(json.dumps(dict(zip(columns, row))))
+        return 0
+    
+    print('  '.join(heading.ljust(width) for heading, width in zip(QUERY_HEADINGS, QUERY_WIDTHS)).rstrip())
+    for row in rows:
+        values = ('' if value is None else str(value) for value in logbook.format_row(row))
+        print('  '.join(value[:width].ljust(width) for value, width in zip(values, QUERY_WIDTHS)).rstrip())
+    print(f"Showing {len(rows)} of {total} flights", file=sys.stderr)
+    return 0
+
+def run_totals(database, as_json=False, profile='standard'):
+    """Print the running launch, hour and distance totals"""
+    logbook = LogbookStore(database, progress=report_upgrade, profile=profile)
+    launches, minutes, distance = logbook.totals()
+    
+    if as_json:
+        print(json.dumps({'launches': launches, 'minutes': minutes, 'distance': distance}))
+    else:
+        print(f"Total Launches: {launches}")
+        print(f"Total Hours: {logbook.minutes_to_time(minutes)}")
+        print(f"Total Distance: {distance:.1f} km")
+    return 0
+
+def run_statistics(database, dimension, as_json=False, rebuild=False, profile='standard'):
+    """Print launches, hours and distance for each bucket of a breakdown"""
+    logbook = LogbookStore(database, progress=report_upgrade, profile=profile)
+    if rebuild:
+        drift = logbook.rebuild_statistics()
+        print(f"Statistics rebuilt, {len(drift)} entries were out of date", file=sys.stderr)
+    rows = logbook.statistics(dimension)
+    
+    if as_json:
+        for bucket, launches, minutes, distance in rows:
+            print(json.dumps({'bucket': bucket, 'launches': launches, 'minutes': minutes, 'distance': distance}))
+        return 0
+    
+    total = sum(row[1] for row in rows)
+    print(f"{dimension[:24]:<24}  {'Launches':>8}  {'Hours':>8}  {'XC Dist (km)':>12}  {'Share':>6}")
+    for bucket, launches, minutes, distance in rows:
+        print(f"{bucket[:24]:<24}  {launches:>8}  {logbook.minutes_to_time(minutes):>8}  {distance:>12.1f}  "
+              f"{launches / total:>6.1%}")
+    return 0
+
+def run_currency(database, pilot=None, launch_method=None, windows=CURRENCY_WINDOWS, today=None, as_json=False,
+                 profile='standard'):
+    """Print launches and hours over the last days of each window for one pilot in command, or every pilot"""
+    try:
+        logbook = LogbookStore(database, progress=report_upgrade, profile=profile)
+        if pilot:
+            report = [(pilot, logbook.currency(pilot, launch_method, windows, today))]
+        else:
+            report = logbook.currency_report(launch_method, windows, today)
+    except (ValueError, sqlite3.Error) as e:
+        sys.exit(f"Currency check failed: {e}")
+    
+    if as_json:
+        for name, counts in report:
+            record = {'pilot': name}
+            for days, (launches, minutes) in counts.items():
+                record[f'launches_{days}d'] = launches
+                record[f'minutes_{days}d'] = minutes
+            print(json.dumps(record))
+        return 0
+    
+    headings = ''.join(f"  {f'Launches {days}d':>13}  {f'Hours {days}d':>10}" for days in windows)
+    print(f"{'Pilot':<24}{headings}")
+    for name, counts in report:
+        columns = ''.join(f"  {launches:>13}  {logbook.minutes_to_time(minutes):>10}"
+                          for launches, minutes in counts.values())
+        print(f"{name[:24]:<24}{columns}")
+    return 0
+
+def run_attach(database, flight_id, path, profile='standard'):
+    """Attach an IGC file to a flight and print the values derived from its track"""
+    try:
+        logbook = LogbookStore(database, progress=report_upgrade, profile=profile)
+        summary = logbook.attach_track(flight_id, path)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        sys.exit(f"Attach failed: {e}")
+    print_track(summary)
+    return 0
+
+def run_track(database, flight_id, as_json=False, profile='standard'):
+    """Print the values derived from a flight's attached track"""
+    summary = LogbookStore(database, progress=report_upgrade, profile=profile).track_summary(flight_id)
+    if summary is None:
+        print(f"Flight {flight_id} has no track attached", file=sys.stderr)
+        return 1
+    if as_json:
+        print(json.dumps(summary))
+    else:
+        print_track(summary)
+    return 0
+
+def print_track(summary):
+    """Print a track summary as from LogbookStore.track_summary"""
+    print(f"Fixes: {summary['fixes']}")
+    print(f"Takeoff: {summary['takeoff_time'] or '-'} UTC")
+    print(f"Landing: {summary['landing_time'] or '-'} UTC")
+    print(f"Max Altitude: {summary['max_altitude_m']} m")
+    if summary['distance_km'] is not None:
+        print(f"Takeoff to Landing: {summary['distance_km']:.1f} km")
+    if summary['free_distance_km'] is not None:
+        print(f"Free Distance: {summary['free_distance_km']:.1f} km")
+    if summary['triangle_km'] is not None:
+        print(f"Triangle: {summary['triangle_km']:.1f} km{' (FAI)' if summary['triangle_fai'] else ''}")
+    if summary['fai_triangle_km'] is not None and not summary['triangle_fai']:
+        print(f"FAI Triangle: {summary['fai_triangle_km']:.1f} km")
+    if summary['out_and_return_km'] is not None:
+        print(f"Out and Return: {summary['out_and_return_km']:.1f} km")
+
+def run_rescore(database, processes=None, profile='standard'):
+    """Score every attached track again, in parallel"""
+    started = time.perf_counter()
+    
+    def report(done, total):
+        print(f"Scored {done} of {total} tracks", file=sys.stderr)
+    
+    try:
+        scored = LogbookStore(database, progress=report_upgrade, profile=profile).rescore_tracks(processes, report)
+    except (RuntimeError, sqlite3.Error) as e:
+        sys.exit(f"Rescore failed: {e}")
+    print(f"Scored {scored} tracks in {time.perf_counter() - started:.2f}s")
+    return 0
+
+def run_set_field(database, field, value, flight_ids=None, search_term='', filter_category='All',
+                  profile='standard', date_range=None):
+    """Set one field on the given flights, or on every flight matching a search, in one transaction"""
+    try:
+        logbook = LogbookStore(database, progress=report_upgrade, profile=profile)
+        changed = logbook.set_field(field, value, flight_ids or None, search_term, filter_category, date_range)
+    except (ValueError, sqlite3.Error) as e:
+        sys.exit(f"Update failed: {e}")
+    print(f"Set {field} on {changed} flights")
+    return 0
+
+def run_import(database, path, profile='standard'):
+    """Import a CSV file or columnar export, listing skipped rows on stderr"""
+    started = time.perf_counter()
+    try:
+        imported, errors = LogbookStore(database, progress=report_upgrade, profile=profile).import_file(path)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        sys.exit(f"Import failed: {e}")
+    elapsed = time.perf_counter() - started
+    
+    for line, message in errors:
+        print(f"{path}:{line}: {message}", file=sys.stderr)
+    print(f"Imported {imported} flights, skipped {len(errors)} rows in {elapsed:.2f}s "
+          f"({imported / elapsed if elapsed else 0:.0f} flights/s)")
+    return 1 if errors else 0
+
+def run_export(database, path, export_format=None, search_term='', filter_category='All', profile='standard',
+               date_range=None):
+    """Export the flights matching a search to a CSV, JSON Lines or columnar file"""
+    started = time.perf_counter()
+    try:
+        logbook = LogbookStore(database, progress=report_upgrade, profile=profile)
+        exported = logbook.export_flights(path, export_format, search_term, filter_category, date_range=date_range)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        sys.exit(f"Export failed: {e}")
+    elapsed = time.perf_counter() - started
+    
+    print(f"Exported {exported} flights in {elapsed:.2f}s "
+          f"({exported / elapsed if elapsed else 0:.0f} flights/s)")
+    return 0
+
+def run_backup(database, backup_dir=None, keep=BACKUP_KEEP):
+    """Take a verified snapshot of the logbook while it stays in use"""
+    started = time.perf_counter()
+    try:
+        path = backup_logbook(database, backup_dir, keep)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        sys.exit(f"Backup failed: {e}")
+    print(f"Backed up to {path} in {time.perf_counter() - started:.2f}s")
+    return 0
+
+def run_list_backups(database, backup_dir=None):
+    """List the logbook's snapshots, newest first"""
+    for path, taken, size in list_backups(database, backup_dir):
+        print(f"{taken:%Y-%m-%d %H:%M:%S}  {size / 1024 / 1024:>8.1f} MB  {path}")
+    return 0
+
+def run_restore(database, snapshot, backup_dir=None, keep=BACKUP_KEEP):
+    """Replace the logbook with a snapshot, keeping a snapshot of what it replaces"""
+    try:
+        saved = restore_backup(snapshot, database, backup_dir, keep)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        sys.exit(f"Restore failed: {e}")
+    print(f"Restored {snapshot}" + (f", the previous contents are in {saved}" if saved else ""))
+    return 0
+
+def run_check_query_plans(database=':memory:'):
+    """Print every search query that doesn't use an index"""
+    problems = check_query_plans(database)
+    for description, query, plan in problems:
+        print(f"{description}:\n    {' '.join(query.split())}")
+        for step in plan:
+            print(f"    -> {step}")
+    print(f"{len(problems)} query plan problem(s) found")
+    return 1 if problems else 0
+
+def add_search_arguments(parser):
+    """Add the --search, --filter, --from and --to options shared by query, set and export"""
+    parser.add_argument('--search', default='', metavar='TERM',
+                        help="only include flights matching TERM")
+    parser.add_argument('--filter', default='All', choices=['All'] + list(FILTER_COLUMNS),
+                        help="field searched by --search (default: All)")
+    parser.add_argument('--from', dest='date_from', default='', metavar='YYYY-MM-DD',
+                        help="only include flights on or after this date")
+    parser.add_argument('--to', dest='date_to', default='', metavar='YYYY-MM-DD',
+                        help="only include flights on or before this date")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Glider Pilot Logbook command line")
+    parser.add_argument('--database', default='glider_logbook.db',
+                        help="logbook database to use (default: glider_logbook.db)")
+    parser.add_argument('--profile', default='standard', choices=list(STORAGE_PROFILES),
+                        help="storage profile; use club when several terminals share the logbook (default: standard)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    query = commands.add_parser('query', help="list flights, newest first")
+    add_search_arguments(query)
+    query.add_argument('--offset', type=int, default=0, help="number of matching flights to skip")
+    query.add_argument('--limit', type=int, default=QUERY_LIMIT,
+                       help=f"number of flights to list (default: {QUERY_LIMIT})")
+    query.add_argument('--json', action='store_true', help="print one JSON object per flight")
+    query.add_argument('--sort', choices=list(SORT_COLUMNS), help="column to sort on (default: newest first)")
+    query.add_argument('--descending', action='store_true', help="sort --sort from highest to lowest")
+    
+    totals = commands.add_parser('totals', help="show total launches, hours and distance")
+    totals.add_argument('--json', action='store_true', help="print the totals as a JSON object")
+    
+    stats = commands.add_parser('stats', help="show launches, hours and distance broken down by a field")
+    stats.add_argument('--by', default='Aircraft Type', choices=list(STATISTICS_DIMENSIONS),
+                       help="breakdown to show (default: Aircraft Type)")
+    stats.add_argument('--json', action='store_true', help="print one JSON object per bucket")
+    stats.add_argument('--rebuild', action='store_true', help="recompute the statistics from the flights first")
+    
+    currency = commands.add_parser('currency', help="show launches and hours in the last 90 days and 12 months")
+    currency.add_argument('--pilot', metavar='NAME', help="pilot in command to check (default: every pilot)")
+    currency.add_argument('--launch-method', metavar='METHOD', help="only count launches by METHOD")
+    currency.add_argument('--days', type=int, nargs='+', default=list(CURRENCY_WINDOWS), metavar='N',
+                          help=f"windows to count, in days up to and including today "
+                               f"(default: {' '.join(map(str, CURRENCY_WINDOWS))})")
+    currency.add_argument('--on', metavar='YYYY-MM-DD', help="count up to this date instead of today")
+    currency.add_argument('--json', action='store_true', help="print one JSON object per pilot")
+    
+    attach = commands.add_parser('attach', help="attach an IGC logger file to a flight")
+    attach.add_argument('flight_id', type=int, metavar='FLIGHT_ID')
+    attach.add_argument('path', metavar='FILE')
+    
+    track = commands.add_parser('track', help="show the values derived from a flight's IGC track")
+    track.add_argument('flight_id', type=int, metavar='FLIGHT_ID')
+    track.add_argument('--json', action='store_true', help="print the values as a JSON object")
+    
+    set_command = commands.add_parser('set', help="set a field on many flights at once")
+    set_command.add_argument('field', choices=list(BULK_EDIT_FIELDS), metavar='FIELD',
+                             help=f"field to set: {', '.join(BULK_EDIT_FIELDS)}")
+    set_command.add_argument('value', metavar='VALUE')
+    set_command.add_argument('--ids', type=int, nargs='+', metavar='FLIGHT_ID',
+                             help="flights to change (default: every flight matching --search)")
+    add_search_arguments(set_command)
+    
+    rescore = commands.add_parser('rescore', help="score every attached IGC track again")
+    rescore.add_argument('--processes', type=int, help="worker processes to use (default: one per CPU)")
+    
+    backup = commands.add_parser('backup', help="take a verified snapshot of the logbook, even while it is in use")
+    backup.add_argument('--keep', type=int, default=BACKUP_KEEP,
+                        help=f"snapshots to keep, deleting older ones (default: {BACKUP_KEEP})")
+    backups = commands.add_parser('backups', help="list the logbook's snapshots")
+    restore = commands.add_parser('restore', help="replace the logbook with a snapshot")
+    restore.add_argument('snapshot', metavar='SNAPSHOT')
+    restore.add_argument('--keep', type=int, default=BACKUP_KEEP,
+                         help=f"snapshots to keep, deleting older ones (default: {BACKUP_KEEP})")
+    for command in (backup, backups, restore):
+        command.add_argument('--backup-dir', metavar='DIR',
+                             help="where snapshots are kept (default: a backups folder next to the logbook)")
+    
+    import_command = commands.add_parser('import', help="import a CSV file or columnar export")
+    import_command.add_argument('path', metavar='FILE')
+    
+    export = commands.add_parser('export', help="export flights to a .csv, .jsonl or .glbc file")
+    export.add_argument('path', metavar='FILE')
+    export.add_argument('--format', choices=sorted(set(EXPORT_FORMATS.values())),
+                        help="export format (default: from the file extension)")
+    add_search_arguments(export)
+    
+    commands.add_parser('check-plans', help="check that every search query uses an index")
+    
+    args = parser.parse_args(argv)
+    date_range = None
+    if hasattr(args, 'date_from'):
+        try:
+            date_range = parse_date_range(args.date_from, args.date_to)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if args.command == 'query':
+        sort = (args.sort, args.descending) if args.sort else DEFAULT_SORT
+        return run_query(args.database, args.search, args.filter, args.offset, args.limit, args.json, args.profile,
+                         sort, date_range)
+    if args.command == 'totals':
+        return run_totals(args.database, args.json, args.profile)
+    if args.command == 'stats':
+        return run_statistics(args.database, args.by, args.json, args.rebuild, args.profile)
+    if args.command == 'currency':
+        return run_currency(args.database, args.pilot, args.launch_method, args.days, args.on, args.json, args.profile)
+    if args.command == 'attach':
+        return run_attach(args.database, args.flight_id, args.path, args.profile)
+    if args.command == 'track':
+        return run_track(args.database, args.flight_id, args.json, args.profile)
+    if args.command == 'set':
+        return run_set_field(args.database, args.field, args.value, args.ids, args.search, args.filter, args.profile,
+                             date_range)
+    if args.command == 'rescore':
+        return run_rescore(args.database, args.processes, args.profile)
+    if args.command == 'backup':
+        return run_backup(args.database, args.backup_dir, args.keep)
+    if args.command == 'backups':
+        return run_list_backups(args.database, args.backup_dir)
+    if args.command == 'restore':
+        return run_restore(args.database, args.snapshot, args.backup_dir, args.keep)
+    if args.command == 'import':
+        return run_import(args.database, args.path, args.profile)
+    if args.command == 'export':
+        return run_export(args.database, args.path, args.format, args.search, args.filter, args.profile, date_range)
+    return run_check_query_plans(args.database)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+"""IGC flight-track parsing, compact storage and derived flight values
+
+A track is held as parallel typed arrays, one element per B-record fix, and
+stored in the logbook as a single packed blob. Derived values are computed
+with NumPy when it is installed and with plain Python otherwise, which is
+slower on long tracks but gives the same results. NumPy is only imported
+when a track is first read, so opening a logbook doesn't pay for it.
+"""
+import math
+import struct
+import sys
+import zlib
+from array import array
+from functools import lru_cache
+
+# Track blob header: magic bytes and format version
+TRACK_MAGIC = b'GLBT'
+TRACK_VERSION = 1
+
+# Track columns in blob order with their array type codes: seconds since the
+# first fix, latitude and longitude in thousandths of a minute, pressure and
+# GNSS altitude in metres, and 1 for a 3D (A) fix or 0 for a 2D (V) fix
+TRACK_COLUMNS = (
+    ('times', 'i'),
+    ('lats', 'i'),
+    ('lons', 'i'),
+    ('pressure_alts', 'i'),
+    ('gnss_alts', 'i'),
+    ('valid', 'b'),
+)
+
+# Length of the fixed part of a B record: B HHMMSS DDMMmmmN DDDMMmmmE V PPPPP GGGGG
+B_RECORD_LENGTH = 35
+
+# Ground speed in m/s above which the glider counts as flying
+FLYING_SPEED = 12.0
+
+# Mean earth radius used for great-circle distances, in km
+EARTH_RADIUS_KM = 6371.0
+
+# Feet per metre, for the logbook's max altitude column
+FEET_PER_METRE = 3.28084
+
+class FlightTrack:
+    """A flight track as compact typed arrays, one element per fix"""
+    
+    def __init__(self, start_time=0, flight_date=None, **columns):
+        # Seconds after midnight UTC of the first fix, and the HFDTE date if present
+        self.start_time = start_time
+        self.flight_date = flight_date
+        for name, type_code in TRACK_COLUMNS:
+            setattr(self, name, columns.get(name, array(type_code)))
+    
+    def __len__(self):
+        return len(self.times)
+    
+    def to_blob(self):
+        """Pack the track as a header followed by each column, compressed together"""
+        header = TRACK_MAGIC + struct.pack('<HIi', TRACK_VERSION, len(self), self.start_time)
+        date = (self.flight_date or '').encode('ascii')
+        header += struct.pack('<B', len(date)) + date
+        
+        data = bytearray()
+        for name, _ in TRACK_COLUMNS:
+            column = array(getattr(self, name).typecode, getattr(self, name))
+            if sys.byteorder == 'big':
+                column.byteswap()
+            data += column.tobytes()
+        return header + zlib.compress(bytes(data))
+    
+    @classmethod
+    def from_blob(cls, blob):
+        """Unpack a track written by to_blob"""
+        if blob[:4] != TRACK_MAGIC:
+            raise ValueError("Not a stored flight track")
+        version, count, start_time = struct.unpack_from('<HIi', blob, 4)
+        if version != TRACK_VERSION:
+            raise ValueError(f"Unsupported flight track version {version}")
+        position = 14
+        date_length = blob[position]
+        flight_date = blob[position + 1:position + 1 + date_length].decode('ascii') or None
+        data = zlib.decompress(blob[position + 1 + date_length:])
+        
+        columns = {}
+        offset = 0
+        for name, type_code in TRACK_COLUMNS:
+            column = array(type_code)
+            column.frombytes(data[offset:offset + column.itemsize * count])
+            if sys.byteorder == 'big':
+                column.byteswap()
+            offset += column.itemsize * count
+            columns[name] = column
+        return cls(start_time, flight_date, **columns)
+
+def read_igc(path):
+    """Stream an IGC file's B records into a FlightTrack
+    
+    Only the fixed-width part of each B record is kept while reading, then
+    all of them are decoded in one pass. Lines that aren't well-formed fixes
+    are skipped, as loggers sometimes write partial records on power loss.
+    """
+    records = bytearray()
+    flight_date = None
+    with open(path, 'rb') as igc_file:
+        for line in igc_file:
+            if line[:1] == b'B' and len(line) >= B_RECORD_LENGTH:
+                records += line[:B_RECORD_LENGTH]
+            elif line[:5] == b'HFDTE' and flight_date is None:
+                flight_date = igc_date(line)
+    
+    track = decode_b_records(bytes(records))
+    track.flight_date = flight_date
+    if not len(track):
+        raise ValueError(f"{path} has no GPS fixes (B records)")
+    return track
+
+@lru_cache(maxsize=None)
+def numpy_or_none():
+    """Return the numpy module, importing it on first use, or None if it isn't installed, for any module using it"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def has_numpy():
+    """Return whether NumPy is installed, which scoring needs"""
+    return numpy_or_none() is not None
+
+def igc_date(line):
+    """Return the ISO date of an HFDTE header line ("HFDTE010724" or "HFDTEDATE:010724,01"), or None"""
+    digits = line[5:].split(b':')[-1][:6]
+    if len(digits) != 6 or not digits.isdigit():
+        return None
+    day, month, year = int(digits[:2]), int(digits[2:4]), int(digits[4:])
+    year += 2000 if year < 80 else 1900
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+def decode_b_records(records):
+    """Decode concatenated fixed-width B records into a FlightTrack"""
+    count = len(records) // B_RECORD_LENGTH
+    if numpy_or_none() is not None:
+        return decode_b_records_numpy(records, count)
+    
+    columns = {name: array(type_code) for name, type_code in TRACK_COLUMNS}
+    seconds = array('i')
+    for start in range(0, count * B_RECORD_LENGTH, B_RECORD_LENGTH):
+        record = records[start:start + B_RECORD_LENGTH]
+        try:
+            clock = int(record[1:3]) * 3600 + int(record[3:5]) * 60 + int(record[5:7])
+            lat = int(record[7:9]) * 60000 + int(record[9:14])
+            lon = int(record[15:18]) * 60000 + int(record[18:23])
+            pressure_alt, gnss_alt = int(record[25:30]), int(record[30:35])
+        except ValueError:
+            continue
+        seconds.append(clock)
+        columns['lats'].append(-lat if record[14:15] == b'S' else lat)
+        columns['lons'].append(-lon if record[23:24] == b'W' else lon)
+        columns['pressure_alts'].append(pressure_alt)
+        columns['gnss_alts'].append(gnss_alt)
+        columns['valid'].append(record[24:25] == b'A')
+    
+    # Times become seconds since the first fix, carrying on past midnight UTC
+    start_time = seconds[0] if seconds else 0
+    day = 0
+    previous = start_time
+    for clock in seconds:
+        if clock < previous:
+            day += 86400
+        previous = clock
+        columns['times'].append(clock + day - start_time)
+    return FlightTrack(start_time, **columns)
+
+def decode_b_records_numpy(records, count):
+    """Vectorized decode_b_records"""
+    np = numpy_or_none()
+    table = np.frombuffer(records, dtype=np.uint8, count=count * B_RECORD_LENGTH).reshape(count, B_RECORD_LENGTH)
+    digits = table.astype(np.int32) - ord('0')
+    
+    def number(start, end):
+        """Decimal value of a digit field, or -1 where it isn't all digits"""
+        field = digits[:, start:end]
+        value = field @ (10 ** np.arange(end - start - 1, -1, -1, dtype=np.int64))
+        return np.where(((field >= 0) & (field <= 9)).all(axis=1), value, -1)
+    
+    def altitude(start):
+        """Signed altitude field, which may start with a minus sign"""
+        negative = table[:, start] == ord('-')
+        field = digits[:, start:start + 5].copy()
+        field[negative, 0] = 0
+        good = ((field >= 0) & (field <= 9)).all(axis=1)
+        value = field @ (10 ** np.arange(4, -1, -1, dtype=np.int64))
+        return np.where(negative, -value, value), good
+    
+    clock = number(1, 3) * 3600 + number(3, 5) * 60 + number(5, 7)
+    lat = number(7, 9) * 60000 + number(9, 14)
+    lon = number(15, 18) * 60000 + number(18, 23)
+    pressure_alt, pressure_good = altitude(25)
+    gnss_alt, gnss_good = altitude(30)
+    good = ((number(1, 7) >= 0) & (number(7, 14) >= 0) & (number(15, 23) >= 0)
+            & pressure_good & gnss_good)
+    
+    clock = clock[good]
+    lat = np.where(table[good, 14] == ord('S'), -lat[good], lat[good])
+    lon = np.where(table[good, 23] == ord('W'), -lon[good], lon[good])
+    
+    start_time = int(clock[0]) if len(clock) else 0
+    # Each step back in the clock is a pass through midnight UTC
+    days = np.concatenate(([0], np.cumsum(np.diff(clock) < 0))) * 86400
+    times = clock + days - start_time
+    
+    columns = {
+        'times': times, 'lats': lat, 'lons': lon,
+        'pressure_alts': pressure_alt[good], 'gnss_alts': gnss_alt[good],
+        'valid': (table[good, 24] == ord('A')),
+    }
+    return FlightTrack(start_time, **{name: array_from_numpy(columns[name], type_code)
+                                      for name, type_code in TRACK_COLUMNS})
+
+def array_from_numpy(values, type_code):
+    """Copy a NumPy vector into an array of the given type code"""
+    np = numpy_or_none()
+    column = array(type_code)
+    column.frombytes(values.astype(np.dtype(type_code)).tobytes())
+    return column
+
+def numpy_column(column):
+    """View an array column as a NumPy vector without copying"""
+    np = numpy_or_none()
+    return np.frombuffer(column, dtype=np.dtype(column.typecode))
+
+def track_radians(track):
+    """Return the track's latitudes and longitudes in radians as NumPy vectors"""
+    scale = math.pi / (180 * 60000)
+    return numpy_column(track.lats) * scale, numpy_column(track.lons) * scale
+
+def great_circle_km(lat1, lon1, lat2, lon2):
+    """Haversine distance in km between points in radians; works on floats and NumPy vectors alike"""
+    np = numpy_or_none()
+    sin, cos, asin, sqrt = (np.sin, np.cos, np.arcsin, np.sqrt) if np is not None else (
+        math.sin, math.cos, math.asin, math.sqrt)
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(a))
+
+def fix_radians(track, index):
+    """Return one fix's latitude and longitude in radians"""
+    scale = math.pi / (180 * 60000)
+    return track.lats[index] * scale, track.lons[index] * scale
+
+def flying_range(track):
+    """Return the indexes of the first and last fix flown faster than FLYING_SPEED, or None if it never was"""
+    if len(track) < 2:
+        return None
+    
+    np = numpy_or_none()
+    if np is not None:
+        lats, lons = track_radians(track)
+        times = numpy_column(track.times)
+        legs = great_circle_km(lats[:-1], lons[:-1], lats[1:], lons[1:]) * 1000
+        speeds = legs / np.maximum(np.diff(times), 1)
+        flying = np.flatnonzero(speeds > FLYING_SPEED)
+        if not len(flying):
+            return None
+        return int(flying[0]), int(flying[-1]) + 1
+    
+    first = last = None
+    previous = fix_radians(track, 0)
+    for index in range(1, len(track)):
+        point = fix_radians(track, index)
+        seconds = max(track.times[index] - track.times[index - 1], 1)
+        if great_circle_km(*previous, *point) * 1000 / seconds > FLYING_SPEED:
+            if first is None:
+                first = index - 1
+            last = index
+        previous = point
+    return None if first is None else (first, last)
+
+def clock_time(track, index):
+    """Return the UTC clock time of a fix as HH:MM"""
+    seconds = (track.start_time + track.times[index]) % 86400
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+def summarize_track(track):
+    """Derive the logbook values of a track
+    
+    Returns a dict with takeoff and landing times (UTC HH:MM), duration in
+    minutes, maximum altitude in metres (pressure altitude, or GNSS altitude
+    for loggers without a pressure sensor) and the straight-line distance from
+    takeoff to landing in km. Times and distance are None if the track never
+    reaches flying speed.
+    """
+    altitudes = track.pressure_alts if any(track.pressure_alts) else track.gnss_alts
+    summary = {
+        'fixes': len(track),
+        'max_altitude_m': int(numpy_column(altitudes).max() if has_numpy() else max(altitudes)),
+        'takeoff_time': None,
+        'landing_time': None,
+        'duration_minutes': None,
+        'distance_km': None,
+    }
+    
+    flown = flying_range(track)
+    if flown:
+        takeoff, landing = flown
+        summary['takeoff_time'] = clock_time(track, takeoff)
+        summary['landing_time'] = clock_time(track, landing)
+        summary['duration_minutes'] = round((track.times[landing] - track.times[takeoff]) / 60)
+        summary['distance_km'] = round(float(great_circle_km(*fix_radians(track, takeoff),
+                                                             *fix_radians(track, landing))), 1)
+    return summary
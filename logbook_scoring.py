@@ -0,0 +1,248 @@
+"""Cross-country distance scoring of flight tracks, in the style of OLC and WeGlide
+
+Three distances are scored from the flying part of a track:
+
+- free distance: start, up to three turnpoints and finish, in time order
+- triangle: three turnpoints flown in order, less the gap between the start
+  and finish points, which may be at most MAX_CLOSING_FRACTION of the
+  perimeter; it is an FAI triangle if every leg is at least
+  FAI_MIN_LEG_FRACTION of the perimeter, and the best FAI triangle is scored
+  separately since it is often shorter than the best triangle
+- out-and-return: twice the distance between two turnpoints, less the same
+  closing gap
+
+Trying every combination of fixes is O(n^4) or worse, so the search works on
+a thinned copy of the track with a precomputed distance matrix. Free distance
+is solved exactly on it by dynamic programming and then fitted to the full
+track. Triangles are searched exhaustively on a coarser copy, skipping first
+turnpoints that cannot beat the best triangle found so far, and then fitted
+to the thinned track. Scoring needs NumPy.
+"""
+from logbook_igc import numpy_or_none, flying_range, great_circle_km, track_radians, FlightTrack
+
+np = numpy_or_none()
+
+# Scores returned by score_track, in the order they are stored
+SCORE_FIELDS = ('free_distance_km', 'triangle_km', 'triangle_fai', 'out_and_return_km', 'fai_triangle_km')
+
+# Fixes kept for the distance matrix, and for the exhaustive triangle search
+FINE_POINTS = 1000
+COARSE_POINTS = 150
+
+# Triangle and out-and-return closing rules, as fractions of the scored course
+MAX_CLOSING_FRACTION = 0.2
+FAI_MIN_LEG_FRACTION = 0.28
+
+# Legs of a free distance flight with up to three turnpoints
+FREE_DISTANCE_LEGS = 4
+
+# Rounds of moving one turnpoint at a time when fitting a course to a finer track
+MAX_REFINE_ROUNDS = 20
+
+def score_track(track):
+    """Return a dict of free_distance_km, triangle_km, triangle_fai, out_and_return_km and fai_triangle_km
+    for a FlightTrack
+    
+    Distances are None for a track that never reaches flying speed, and
+    triangle_km, out_and_return_km and fai_triangle_km are None if no course
+    of that kind closes. triangle_fai says whether the best triangle is itself
+    an FAI triangle, in which case fai_triangle_km is the same distance.
+    """
+    if np is None:
+        raise RuntimeError("Scoring flights needs NumPy, install it with: pip install numpy")
+    
+    scores = dict.fromkeys(SCORE_FIELDS)
+    flown = flying_range(track)
+    if flown is None:
+        return scores
+    
+    lats, lons = track_radians(track)
+    lats, lons = lats[flown[0]:flown[1] + 1], lons[flown[0]:flown[1] + 1]
+    fine = np.unique(np.linspace(0, len(lats) - 1, min(len(lats), FINE_POINTS)).round().astype(np.intp))
+    distances = distance_matrix(lats[fine], lons[fine])
+    gaps = closing_gaps(distances)
+    
+    _, path = free_distance(distances)
+    path = fit_path(lats, lons, fine[path])
+    scores['free_distance_km'] = round(float(path_length(lats, lons, path)), 1)
+    
+    out_and_return = best_out_and_return(distances, gaps)
+    if out_and_return is not None:
+        scores['out_and_return_km'] = round(out_and_return, 1)
+    
+    triangle, fai_triangle = best_triangle(distances, gaps)
+    if triangle is not None:
+        scores['triangle_km'] = round(triangle[0], 1)
+        scores['triangle_fai'] = triangle[1]
+    if fai_triangle is not None:
+        scores['fai_triangle_km'] = round(fai_triangle, 1)
+    return scores
+
+def score_blob(item):
+    """Score a (flight_id, track blob) pair for a process pool, returning (flight_id, scores)"""
+    flight_id, blob = item
+    return flight_id, score_track(FlightTrack.from_blob(blob))
+
+def distance_matrix(lats, lons):
+    """Great-circle distances in km between every pair of points in radians"""
+    return great_circle_km(lats[:, None], lons[:, None], lats[None, :], lons[None, :])
+
+def closing_gaps(distances):
+    """Return gaps[a, b], the smallest distance from a point at or before a to a point at or after b"""
+    before = np.minimum.accumulate(distances, axis=0)
+    return np.minimum.accumulate(before[:, ::-1], axis=1)[:, ::-1]
+
+def free_distance(distances, legs=FREE_DISTANCE_LEGS):
+    """Longest path of the given number of legs through points in time order, and its point indexes
+    
+    best[j] is the longest path of the legs so far that ends at point j, so
+    each leg is one pass over the distance matrix. Legs may be empty, which
+    covers flights with fewer turnpoints.
+    """
+    count = len(distances)
+    forward = np.triu(np.ones((count, count), dtype=bool))
+    best = np.zeros(count)
+    choices = []
+    for _ in range(legs):
+        totals = np.where(forward, best[:, None] + distances, -np.inf)
+        choice = totals.argmax(axis=0)
+        best = totals[choice, np.arange(count)]
+        choices.append(choice)
+    
+    end = int(best.argmax())
+    path = [end]
+    for choice in reversed(choices):
+        path.append(int(choice[path[-1]]))
+    return float(best[end]), path[::-1]
+
+def path_length(lats, lons, path):
+    """Length in km of a path through the given point indexes"""
+    path = np.asarray(path)
+    return great_circle_km(lats[path[:-1]], lons[path[:-1]], lats[path[1:]], lons[path[1:]]).sum()
+
+def fit_path(lats, lons, path):
+    """Move each point of a path to the fix between its neighbours that lengthens the path most
+    
+    The path was found on a thinned track, so its points are only close to
+    the best fixes; this repeats until no point moves.
+    """
+    path = [int(index) for index in path]
+    last = len(lats) - 1
+    for _ in range(MAX_REFINE_ROUNDS):
+        moved = False
+        for k in range(len(path)):
+            low = path[k - 1] if k else 0
+            high = path[k + 1] if k < len(path) - 1 else last
+            candidates = np.arange(low, high + 1)
+            length = np.zeros(len(candidates))
+            if k:
+                length += great_circle_km(lats[low], lons[low], lats[candidates], lons[candidates])
+            if k < len(path) - 1:
+                length += great_circle_km(lats[high], lons[high], lats[candidates], lons[candidates])
+            best = int(candidates[length.argmax()])
+            if best != path[k] and length.max() > length[path[k] - low] + 1e-9:
+                path[k] = best
+                moved = True
+        if not moved:
+            break
+    return path
+
+def best_out_and_return(distances, gaps):
+    """Longest out-and-return distance less its closing gap, or None if none closes"""
+    out = distances
+    score = np.where(np.triu(gaps <= MAX_CLOSING_FRACTION * 2 * out, 1), 2 * out - gaps, -np.inf)
+    best = score.max() if score.size else -np.inf
+    return float(best) if best > 0 else None
+
+def triangle_scores(distances, gaps, first, seconds, thirds):
+    """Score triangles with first turnpoint `first` against arrays of second and third turnpoints
+    
+    Returns the scores (perimeter less closing gap, or -inf where the
+    triangle doesn't close or the turnpoints are out of order) and whether
+    each is an FAI triangle, as matrices indexed by (second, third).
+    """
+    a = distances[first, seconds][:, None]
+    b = distances[np.ix_(seconds, thirds)]
+    c = distances[first, thirds][None, :]
+    perimeter = a + b + c
+    gap = gaps[first, thirds][None, :]
+    valid = (seconds[:, None] < thirds[None, :]) & (gap <= MAX_CLOSING_FRACTION * perimeter) & (perimeter > 0)
+    fai = valid & (np.minimum(np.minimum(a, b), c) >= FAI_MIN_LEG_FRACTION * perimeter)
+    return np.where(valid, perimeter - gap, -np.inf), fai
+
+def best_triangle(distances, gaps):
+    """Best triangle as (distance, is FAI) and best FAI triangle distance, either None if none closes
+    
+    Every combination of turnpoints on a coarse copy of the track is tried,
+    first turnpoints in order of their upper bound: no triangle scores more
+    than twice the two sides from its first turnpoint, so once that bound is
+    below the best FAI score found, which is never above the best score, the
+    rest are skipped. Both triangles are then fitted to the full distance
+    matrix, the FAI one keeping to the FAI leg rule.
+    """
+    count = len(distances)
+    coarse = np.unique(np.linspace(0, count - 1, min(count, COARSE_POINTS)).round().astype(np.intp))
+    reach = np.triu(distances[np.ix_(coarse, coarse)], 1).max(axis=1)
+    
+    best = best_fai = (-np.inf, None, False)
+    for i in np.argsort(-reach):
+        if 4 * reach[i] <= best_fai[0]:
+            break
+        later = coarse[i + 1:]
+        if len(later) < 2:
+            continue
+        score, fai = triangle_scores(distances, gaps, coarse[i], later, later)
+        best = better_triangle(best, score, fai, coarse[i], later)
+        best_fai = better_triangle(best_fai, np.where(fai, score, -np.inf), fai, coarse[i], later)
+    
+    triangle = fai_triangle = None
+    if best[1] is not None:
+        triangle = fit_triangle(distances, gaps, best)
+    if best_fai[1] is not None:
+        fai_triangle = fit_triangle(distances, gaps, best_fai, fai_only=True)[0]
+    # Fitting the best triangle may turn it into a longer FAI triangle
+    if triangle is not None and triangle[1] and (fai_triangle is None or triangle[0] > fai_triangle):
+        fai_triangle = triangle[0]
+    return triangle, fai_triangle
+
+def better_triangle(best, score, fai, first, later):
+    """Return the better (score, points, is FAI) of best and the triangles from triangle_scores"""
+    j, k = np.unravel_index(score.argmax(), score.shape)
+    if score[j, k] > best[0]:
+        return float(score[j, k]), (int(first), int(later[j]), int(later[k])), bool(fai[j, k])
+    return best
+
+def fit_triangle(distances, gaps, best, fai_only=False):
+    """Move each turnpoint of a triangle found on the coarse track to the best point between its neighbours
+    
+    Returns the fitted (distance, is FAI). With fai_only, turnpoints only
+    move where the triangle stays an FAI triangle.
+    """
+    score, points, fai = best
+    points = list(points)
+    last = len(distances) - 1
+    for _ in range(MAX_REFINE_ROUNDS):
+        moved = False
+        for k in range(3):
+            low = points[k - 1] + 1 if k else 0
+            high = points[k + 1] - 1 if k < 2 else last
+            candidates = np.arange(low, high + 1)
+            trial = [np.full(len(candidates), point) for point in points]
+            trial[k] = candidates
+            first, second, third = trial
+            a, b, c = distances[first, second], distances[second, third], distances[first, third]
+            perimeter = a + b + c
+            gap = gaps[first, third]
+            valid = (gap <= MAX_CLOSING_FRACTION * perimeter) & (perimeter > 0)
+            if fai_only:
+                valid &= np.minimum(np.minimum(a, b), c) >= FAI_MIN_LEG_FRACTION * perimeter
+            scores = np.where(valid, perimeter - gap, -np.inf)
+            index = int(scores.argmax())
+            if scores[index] > score + 1e-9:
+                score = float(scores[index])
+                fai = bool(min(a[index], b[index], c[index]) >= FAI_MIN_LEG_FRACTION * perimeter[index])
+                points[k] = int(candidates[index])
+                moved = True
+        if not moved:
+            break
+    return score, fai
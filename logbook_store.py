@@ -0,0 +1,2723 @@
+"""Storage, search and import/export for the glider logbook, independent of the GUI"""
+import sqlite3
+import queue
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import os
+import platform
+import re
+import sys
+import csv
+import json
+import time
+import zlib
+import struct
+import itertools
+import bisect
+import heapq
+from datetime import date
+from functools import lru_cache
+from array import array
+
+# Searchable columns, keyed by the labels shown in the "Filter by" combobox
+FILTER_COLUMNS = {
+    'Date': 'date',
+    'Aircraft Type': 'aircraft_type',
+    'Registration': 'aircraft_registration',
+    'Pilot': 'pilot_in_command',
+    'Instructor': 'instructor',
+    'Launch Method': 'launch_method',
+    'Launch Site': 'launch_site',
+    'Landing Site': 'landing_site'
+}
+
+# Dates are stored as YYYY-MM-DD text and as a Julian day number in date_jd,
+# which the date index and the From/To range filters use. Dates may also be
+# entered with / or . separators and without leading zeros
+DATE_PATTERN = re.compile(r'^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})$')
+# date.toordinal() plus this is the Julian day number
+JULIAN_DAY_OFFSET = 1721425
+LAST_JULIAN_DAY = date.max.toordinal() + JULIAN_DAY_OFFSET
+# Distinct dates remembered by normalize_date and julian_day. An import
+# repeats the same few hundred dates for every flight flown on them
+DATE_CACHE_SIZE = 4096
+# Durations are H:MM or HH:MM
+TIME_PATTERN = re.compile(r'^(\d{1,2}):([0-5]\d)$')
+
+# Flights copied or converted per transaction by schema migrations
+MIGRATION_BATCH_ROWS = 5000
+
+# Connection settings by storage profile. "club" is for several launch-point
+# terminals sharing one logbook: in WAL mode searches never wait for a writer
+# and writers only wait for each other
+STORAGE_PROFILES = {
+    'standard': {'busy_timeout': 5000, 'synchronous': 'FULL', 'cache_size': -2000, 'mmap_size': 0},
+    'club': {'journal_mode': 'WAL', 'busy_timeout': 15000, 'synchronous': 'NORMAL', 'cache_size': -32000,
+             'mmap_size': 256 * 1024 * 1024},
+}
+
+# Attempts at a write that still finds the database locked after busy_timeout,
+# and the delay before the first retry, doubled each time
+WRITE_RETRIES = 4
+WRITE_RETRY_DELAY = 0.05
+
+# Fields every flight must have, as checked by validate_flight
+REQUIRED_FIELDS = ('date', 'aircraft_type', 'aircraft_registration', 'pilot_in_command',
+                   'launch_method', 'launch_site')
+
+# Fields that can be set on many flights at once, keyed like FILTER_COLUMNS.
+# Dates are left out as they are only checked on the form
+BULK_EDIT_FIELDS = {label: column for label, column in FILTER_COLUMNS.items() if column != 'date'}
+
+# Free-text fields completed from earlier flights, and the suggestions offered
+COMPLETION_FIELDS = ('aircraft_type', 'aircraft_registration', 'pilot_in_command', 'instructor',
+                     'launch_site', 'landing_site')
+COMPLETION_LIMIT = 8
+
+# Suggestions are ranked by use count, and a value's count halves in weight
+# for every this many flights entered since it was last used
+COMPLETION_HALF_LIFE = 500
+
+# Rolling windows, in days up to and including today, counted by the currency
+# display and the currency command: the usual 90-day and 12-month checks
+CURRENCY_WINDOWS = (90, 365)
+
+# Flights inserted per transaction by the CSV importer
+IMPORT_BATCH_ROWS = 20000
+
+# CSV column headings understood by the importer, lower case with underscores,
+# dashes and any "(units)" removed. Takeoff and landing times are only used to
+# work out a missing duration
+CSV_HEADER_ALIASES = {
+    'date': 'date',
+    'flight date': 'date',
+    'aircraft type': 'aircraft_type',
+    'aircraft': 'aircraft_type',
+    'glider': 'aircraft_type',
+    'type': 'aircraft_type',
+    'aircraft registration': 'aircraft_registration',
+    'registration': 'aircraft_registration',
+    'reg': 'aircraft_registration',
+    'pilot in command': 'pilot_in_command',
+    'pilot': 'pilot_in_command',
+    'p1': 'pilot_in_command',
+    'pic': 'pilot_in_command',
+    'instructor': 'instructor',
+    'p2': 'instructor',
+    'launch method': 'launch_method',
+    'launch type': 'launch_method',
+    'launch': 'launch_method',
+    'launch site': 'launch_site',
+    'site': 'launch_site',
+    'airfield': 'launch_site',
+    'landing site': 'landing_site',
+    'flight duration': 'flight_duration',
+    'duration': 'flight_duration',
+    'flight time': 'flight_duration',
+    'max altitude': 'max_altitude',
+    'max alt': 'max_altitude',
+    'cross country distance': 'cross_country_distance',
+    'cross country': 'cross_country_distance',
+    'distance': 'cross_country_distance',
+    'notes': 'notes',
+    'remarks': 'notes',
+    'takeoff time': 'takeoff_time',
+    'takeoff': 'takeoff_time',
+    'launch time': 'takeoff_time',
+    'landing time': 'landing_time'
+}
+
+# Columns written by the exporter, with their type in the columnar format:
+# 'i' 64-bit integer, 'f' double, 's' dictionary-encoded UTF-8 string
+EXPORT_COLUMNS = (
+    ('id', 'i'),
+    ('date', 's'),
+    ('aircraft_type', 's'),
+    ('aircraft_registration', 's'),
+    ('pilot_in_command', 's'),
+    ('instructor', 's'),
+    ('launch_method', 's'),
+    ('launch_site', 's'),
+    ('landing_site', 's'),
+    ('flight_duration', 's'),
+    ('duration_minutes', 'i'),
+    ('max_altitude', 'i'),
+    ('cross_country_distance', 'f'),
+    ('notes', 's'),
+    ('created_at', 's')
+)
+
+# Rows fetched from the cursor at a time by the exporter, which is also the
+# row group size of columnar files
+EXPORT_CHUNK_ROWS = 10000
+
+# Export formats keyed by file extension
+EXPORT_FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.glbc': 'columnar'
+}
+
+# Columnar file header: magic bytes and format version
+COLUMNAR_MAGIC = b'GLBC'
+COLUMNAR_VERSION = 1
+
+# Indexes on the flights table, kept in step with this set at startup. The
+# date index serves the date ranges and also ORDER BY date DESC, id DESC since
+# it ends in the rowid, the other columns use NOCASE to match the
+# case-insensitive filters, and the IFNULL expressions serve the numeric sorts
+# in SORT_COLUMNS
+FLIGHT_INDEXES = {
+    'idx_flights_date': 'flights (IFNULL(date_jd, -1))',
+    'idx_flights_aircraft_type': 'flights (aircraft_type COLLATE NOCASE)',
+    'idx_flights_registration': 'flights (aircraft_registration COLLATE NOCASE)',
+    'idx_flights_pilot': 'flights (pilot_in_command COLLATE NOCASE)',
+    'idx_flights_instructor': 'flights (instructor COLLATE NOCASE)',
+    'idx_flights_launch_method': 'flights (launch_method COLLATE NOCASE)',
+    'idx_flights_launch_site': 'flights (launch_site COLLATE NOCASE)',
+    'idx_flights_landing_site': 'flights (landing_site COLLATE NOCASE)',
+    'idx_flights_duration': 'flights (IFNULL(duration_minutes, -1))',
+    'idx_flights_altitude': 'flights (IFNULL(max_altitude, -1))',
+    'idx_flights_distance': 'flights (IFNULL(cross_country_distance, -1))'
+}
+
+# Flight Log columns that can be sorted on, keyed by their heading: (expression
+# sorted on, which must match an index in FLIGHT_INDEXES, position of the column
+# in FlightSearch.RESULT_COLUMNS). Empty values sort as -1 so that keyset
+# comparisons never meet a NULL, which puts dates that couldn't be read before every real date
+SORT_COLUMNS = {
+    'ID': ('id', 0),
+    'Date': ('IFNULL(date_jd, -1)', 12),
+    'Aircraft': ('aircraft_type COLLATE NOCASE', 2),
+    'Registration': ('aircraft_registration COLLATE NOCASE', 3),
+    'Pilot': ('pilot_in_command COLLATE NOCASE', 4),
+    'Launch Method': ('launch_method COLLATE NOCASE', 5),
+    'Duration': ('IFNULL(duration_minutes, -1)', 6),
+    'Max Alt': ('IFNULL(max_altitude, -1)', 7),
+    'Distance': ('IFNULL(cross_country_distance, -1)', 8)
+}
+
+# Flight Log order until a heading is clicked: (SORT_COLUMNS heading, descending)
+DEFAULT_SORT = ('Date', True)
+
+# Breakdowns kept in the flight_stats table, keyed by the labels shown in the
+# Statistics window: (dimension name in the table, expression giving a flight's
+# bucket with {row} for the new./old. prefix in triggers, display order).
+# Years and months come from date_jd, with unreadable dates counted as Unknown
+STATISTICS_DIMENSIONS = {
+    'Aircraft Type': ('aircraft_type', '{row}aircraft_type', 'launches DESC, bucket'),
+    'Registration': ('registration', '{row}aircraft_registration', 'launches DESC, bucket'),
+    'Launch Method': ('launch_method', '{row}launch_method', 'launches DESC, bucket'),
+    'Launch Site': ('launch_site', '{row}launch_site', 'launches DESC, bucket'),
+    'Year': ('year', "COALESCE(strftime('%Y', {row}date_jd), 'Unknown')", "bucket = 'Unknown', bucket DESC"),
+    'Month': ('month', "COALESCE(strftime('%Y-%m', {row}date_jd), 'Unknown')", "bucket = 'Unknown', bucket DESC"),
+}
+
+# Entries kept by a QueryTrace; older ones are dropped as new ones arrive
+TRACE_ENTRIES = 5000
+
+# Track scores written per transaction when rescoring the logbook, and tracks
+# queued per worker process so the pool never runs dry
+RESCORE_BATCH_ROWS = 100
+RESCORE_QUEUE_PER_PROCESS = 4
+
+# Full flight records kept in memory for the detail form
+FLIGHT_CACHE_SIZE = 500
+
+class QueryTrace:
+    """Opt-in rolling record of SQL statements and Flight Log rebuilds
+    
+    While enabled, every statement run on a TracedConnection is recorded with
+    the operation it belongs to, the shape of its parameters, the rows fetched
+    and its wall time, and the window records the time spent updating the
+    Treeview. An operation is a user-visible action such as a search; it can
+    start on one thread and continue on another by entering context() with
+    the same operation. Parameter values are never recorded.
+    """
+    
+    def __init__(self, enabled=False, limit=TRACE_ENTRIES):
+        self.enabled = enabled
+        self.entries = deque(maxlen=limit)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.perf_counter()
+        self.last_operation = None
+    
+    def elapsed_ms(self, since=None):
+        """Milliseconds since the trace was created, or since a perf_counter reading"""
+        return round((time.perf_counter() - (self.started if since is None else since)) * 1000, 3)
+    
+    def add(self, entry):
+        """Append an entry to the rolling trace"""
+        with self.lock:
+            self.entries.append(entry)
+    
+    def start(self, name):
+        """Begin an operation and return it, or None while the trace is disabled"""
+        if not self.enabled:
+            return None
+        return {'kind': 'operation', 'operation': name, 'at_ms': self.elapsed_ms(), 'began': time.perf_counter(),
+                'statements': 0, 'rows': 0, 'sql_ms': 0.0, 'tk_ms': 0.0}
+    
+    def current(self):
+        """Return the operation statements on this thread belong to, if any"""
+        return getattr(self.local, 'operation', None)
+    
+    @contextmanager
+    def context(self, operation):
+        """Attribute statements and Treeview updates on this thread to operation"""
+        previous = self.current()
+        self.local.operation = operation
+        try:
+            yield operation
+        finally:
+            self.local.operation = previous
+    
+    def finish(self, operation):
+        """Record an operation's totals and make it the last operation"""
+        if operation is None:
+            return
+        summary = dict(operation)
+        summary['wall_ms'] = self.elapsed_ms(summary.pop('began'))
+        summary['sql_ms'] = round(summary['sql_ms'], 3)
+        summary['tk_ms'] = round(summary['tk_ms'], 3)
+        self.add(summary)
+        self.last_operation = summary
+    
+    @contextmanager
+    def operation(self, name):
+        """Run a block on this thread as one whole operation"""
+        operation = self.start(name)
+        with self.context(operation):
+            yield operation
+        self.finish(operation)
+    
+    def record_statement(self, statement, parameters, seconds, many=False):
+        """Record one executed statement and return its entry so fetches can add to it"""
+        operation = self.current()
+        entry = {
+            'kind': 'sql',
+            'at_ms': self.elapsed_ms(),
+            'operation': operation['operation'] if operation else None,
+            'thread': threading.current_thread().name,
+            'statement': ' '.join(statement.split()),
+            'params': parameter_shape(parameters, many),
+            'rows': 0,
+            'ms': seconds * 1000,
+        }
+        if operation:
+            operation['statements'] += 1
+            operation['sql_ms'] += entry['ms']
+        self.add(entry)
+        return entry
+    
+    def record_fetch(self, entry, rows, seconds):
+        """Add rows fetched after a statement ran to its entry"""
+        entry['rows'] += rows
+        entry['ms'] += seconds * 1000
+        operation = self.current()
+        if operation:
+            operation['rows'] += rows
+            operation['sql_ms'] += seconds * 1000
+    
+    @contextmanager
+    def tk_update(self, description, rows):
+        """Time a block of Treeview updates"""
+        if not self.enabled:
+            yield
+            return
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            operation = self.current()
+            ms = (time.perf_counter() - began) * 1000
+            if operation:
+                operation['tk_ms'] += ms
+            self.add({'kind': 'tk', 'at_ms': self.elapsed_ms(), 'operation': operation['operation'] if operation else None,
+                      'update': description, 'rows': rows, 'ms': round(ms, 3)})
+    
+    def snapshot(self):
+        """Return a copy of the trace entries, oldest first"""
+        with self.lock:
+            return [dict(entry) for entry in self.entries]
+    
+    def export(self, path):
+        """Write the rolling trace to a JSON file and return the number of entries"""
+        entries = self.snapshot()
+        for entry in entries:
+            if 'ms' in entry:
+                entry['ms'] = round(entry['ms'], 3)
+        report = {
+            'exported': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'entries': entries,
+        }
+        with open(path, 'w', encoding='utf-8') as out:
+            json.dump(report, out, indent=1)
+            out.write('\n')
+        return len(entries)
+
+def parameter_shape(parameters, many=False):
+    """Describe statement parameters by type without their values, e.g. "(str, int)" or "120 x (int)" """
+    if many:
+        rows = parameters if isinstance(parameters, (list, tuple)) else list(parameters)
+        return f"{len(rows)} x {parameter_shape(rows[0]) if rows else '()'}"
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f"{name}: {type(value).__name__}" for name, value in parameters.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in parameters) + ')'
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that reports statements and fetches to its connection's QueryTrace"""
+    
+    trace_entry = None
+    
+    def execute(self, sql, parameters=()):
+        trace = self.connection.trace
+        if trace is None or not trace.enabled:
+            self.trace_entry = None
+            return super().execute(sql, parameters)
+        began = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.trace_entry = trace.record_statement(sql, parameters, time.perf_counter() - began)
+    
+    def executemany(self, sql, seq_of_parameters):
+        trace = self.connection.trace
+        if trace is None or not trace.enabled:
+            self.trace_entry = None
+            return super().executemany(sql, seq_of_parameters)
+        seq_of_parameters = list(seq_of_parameters)
+        began = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.trace_entry = trace.record_statement(sql, seq_of_parameters, time.perf_counter() - began, many=True)
+    
+    def traced_fetch(self, fetch, *args):
+        """Call a fetch method, adding its rows and time to the last statement's entry"""
+        if self.trace_entry is None:
+            return fetch(*args)
+        began = time.perf_counter()
+        rows = fetch(*args)
+        count = len(rows) if isinstance(rows, list) else int(rows is not None)
+        self.connection.trace.record_fetch(self.trace_entry, count, time.perf_counter() - began)
+        return rows
+    
+    def fetchone(self):
+        return self.traced_fetch(super().fetchone)
+    
+    def fetchmany(self, size=None):
+        return self.traced_fetch(super().fetchmany, self.arraysize if size is None else size)
+    
+    def fetchall(self):
+        return self.traced_fetch(super().fetchall)
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors report to trace, a QueryTrace, when it is set and enabled"""
+    
+    trace = None
+    
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+class FlightSearch:
+    """Search engine over the flights table backed by an FTS5 trigram index"""
+    
+    # Columns shown in the Flight Log, followed by the remaining searchable
+    # columns so that a previous result set can be narrowed in Python, and the
+    # Julian day that dates sort on
+    RESULT_COLUMNS = ('id', 'date', 'aircraft_type', 'aircraft_registration', 'pilot_in_command',
+                      'launch_method', 'duration_minutes', 'max_altitude', 'cross_country_distance',
+                      'instructor', 'launch_site', 'landing_site', 'date_jd')
+    DISPLAY_WIDTH = 9
+    
+    # The trigram tokenizer cannot match terms shorter than three characters
+    MIN_FTS_TERM = 3
+    
+    # Result sets up to this size are held in memory, larger ones are paged
+    CACHE_LIMIT = 5000
+    
+    # Rows fetched per query when paging and the number of pages kept
+    BLOCK_SIZE = 200
+    MAX_BLOCKS = 16
+    
+    def __init__(self, conn):
+        self.conn = conn
+        self.fts_enabled = False
+        self.sort = DEFAULT_SORT
+        self.invalidate()
+        
+        # Kept so bulk imports can suspend the trigger and restore it afterwards
+        columns = ', '.join(FILTER_COLUMNS.values())
+        new_values = ', '.join(f'new.{col}' for col in FILTER_COLUMNS.values())
+        old_values = ', '.join(f'old.{col}' for col in FILTER_COLUMNS.values())
+        self.insert_trigger_sql = f'''
+            CREATE TRIGGER IF NOT EXISTS flights_fts_insert AFTER INSERT ON flights BEGIN
+                INSERT INTO flights_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        '''
+        # Only changes to the searchable columns touch the index
+        self.update_trigger_sql = f'''
+            CREATE TRIGGER IF NOT EXISTS flights_fts_update AFTER UPDATE OF {columns} ON flights BEGIN
+                INSERT INTO flights_fts (flights_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO flights_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        '''
+    
+    def load_index(self):
+        """Search through the FTS5 index if the schema has one"""
+        cursor = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='flights_fts'")
+        self.fts_enabled = cursor.fetchone() is not None
+    
+    def init_index(self, cursor):
+        """Create the empty FTS5 shadow index and its sync triggers
+        
+        Returns False, leaving searches to LIKE scans, if SQLite was built
+        without FTS5 or the trigram tokenizer.
+        """
+        columns = ', '.join(FILTER_COLUMNS.values())
+        old_values = ', '.join(f'old.{col}' for col in FILTER_COLUMNS.values())
+        
+        try:
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS flights_fts USING fts5(
+                    {columns}, content='flights', content_rowid='id', tokenize='trigram'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return False
+        
+        cursor.execute(self.insert_trigger_sql)
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS flights_fts_delete AFTER DELETE ON flights BEGIN
+                INSERT INTO flights_fts (flights_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END
+        ''')
+        cursor.execute(self.update_trigger_sql)
+        
+        return True
+    
+    def index_flights_after(self, cursor, flight_id, last_id=None):
+        """Add every flight with an id above flight_id, up to last_id if given, to the index in one statement"""
+        columns = ', '.join(FILTER_COLUMNS.values())
+        if last_id is None:
+            cursor.execute(f'''
+                INSERT INTO flights_fts (rowid, {columns})
+                SELECT id, {columns} FROM flights WHERE id > ?
+            ''', (flight_id,))
+        else:
+            cursor.execute(f'''
+                INSERT INTO flights_fts (rowid, {columns})
+                SELECT id, {columns} FROM flights WHERE id > ? AND id <= ?
+            ''', (flight_id, last_id))
+    
+    def set_criteria(self, search_term, filter_category, date_range=None):
+        """Set the search criteria without running the search
+        
+        date_range is None or a (first, last) pair of Julian days from
+        parse_date_range.
+        """
+        self.invalidate()
+        self.last_term = search_term.lower()
+        self.last_category = filter_category
+        self.last_range = date_range
+    
+    def set_sort(self, sort):
+        """Order results by a (SORT_COLUMNS heading, descending) pair, dropping a result set in another order"""
+        if sort[0] not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort on {sort[0]!r}, use one of: {', '.join(SORT_COLUMNS)}")
+        if sort != self.sort:
+            self.sort = sort
+            self.invalidate()
+    
+    def adopt(self, search_term, filter_category, total, rows, sort=DEFAULT_SORT, date_range=None):
+        """Take over a result set found by a search on another connection"""
+        self.sort = sort
+        self.last_term = search_term.lower()
+        self.last_category = filter_category
+        self.last_range = date_range
+        self.last_rows = rows
+        self.total = total
+        self.blocks = OrderedDict()
+    
+    def invalidate(self):
+        """Forget the cached result set after the flights table changes"""
+        self.last_term = None
+        self.last_category = None
+        self.last_range = None
+        self.last_rows = None
+        self.total = 0
+        self.blocks = OrderedDict()
+    
+    def search_columns(self, filter_category):
+        """Return the columns a search in the given category looks at"""
+        if filter_category == "All":
+            return list(FILTER_COLUMNS.values())
+        if filter_category in FILTER_COLUMNS:
+            return [FILTER_COLUMNS[filter_category]]
+        return []
+    
+    def uses_fts(self):
+        """Check whether the current search can be answered from the FTS index"""
+        return (self.fts_enabled and len(self.last_term or '') >= self.MIN_FTS_TERM
+                and bool(self.search_columns(self.last_category)))
+    
+    def build_where(self, ordered=False):
+        """Build the condition and parameters for the current search
+        
+        With ordered=True a full-text match is written so that the planner walks
+        the date index in order and probes the matches, instead of looking the
+        matches up by id and sorting them. A date range is a BETWEEN on the
+        date index expression, ANDed with the term's condition.
+        """
+        conditions = []
+        params = []
+        columns = self.search_columns(self.last_category)
+        
+        if self.last_term and columns and self.uses_fts():
+            # Quote the term as a phrase so it matches as a substring
+            phrase = '"' + self.last_term.replace('"', '""') + '"'
+            if len(columns) == 1:
+                phrase = f"{columns[0]} : {phrase}"
+            id_column = "+id" if ordered else "id"
+            conditions.append(f"{id_column} IN (SELECT rowid FROM flights_fts WHERE flights_fts MATCH ?)")
+            params.append(phrase)
+        elif self.last_term and columns:
+            # Terms too short for the trigram index fall back to a substring match,
+            # LIKE already ignores ASCII case so the column indexes can cover it
+            conditions.append("(" + " OR ".join(f"{col} LIKE ?" for col in columns) + ")")
+            params.extend([f'%{self.last_term}%'] * len(columns))
+        
+        if self.last_range is not None:
+            # Flights whose date couldn't be read are -1, outside every range
+            conditions.append("IFNULL(date_jd, -1) BETWEEN ? AND ?")
+            params.extend(self.last_range)
+        
+        return " AND ".join(conditions), params
+    
+    def order_by(self, reverse=False):
+        """ORDER BY clause for the current sort, or for the opposite order with reverse=True"""
+        expression, _ = SORT_COLUMNS[self.sort[0]]
+        direction = 'DESC' if self.sort[1] != reverse else 'ASC'
+        if expression == 'id':
+            return f"ORDER BY id {direction}"
+        return f"ORDER BY {expression} {direction}, id {direction}"
+    
+    def keyset_condition(self, row, after=True):
+        """Condition for the rows after (or before) a result row in the current sort
+        
+        Written as a range on the sort expression plus a tie-break on id, rather
+        than a row value comparison, so the planner can seek in expression and
+        NOCASE indexes too.
+        """
+        expression, _ = SORT_COLUMNS[self.sort[0]]
+        op = '<' if self.sort[1] == after else '>'
+        if expression == 'id':
+            return f"id {op} ?", [row[0]]
+        value = self.sort_value(row)
+        return f"{expression} {op}= ? AND ({expression} {op} ? OR id {op} ?)", [value, value, row[0]]
+    
+    def sort_value(self, row):
+        """Return a result row's value of the sort expression, as SQLite compares it"""
+        value = row[SORT_COLUMNS[self.sort[0]][1]]
+        return -1 if value is None else value
+    
+    def sort_key(self, row):
+        """Python sort key of a result row that orders like the current sort's ORDER BY ascending"""
+        value = self.sort_value(row)
+        if 'NOCASE' in SORT_COLUMNS[self.sort[0]][0]:
+            value = value.lower()
+        return (value, row[0])
+    
+    def count_query(self):
+        """Query counting the flights that match the current search"""
+        where, params = self.build_where()
+        where_clause = f"WHERE {where}" if where else ""
+        return f"SELECT COUNT(*) FROM flights {where_clause}", params
+    
+    def result_query(self):
+        """Query for the whole current result set, plus whether it still needs sorting"""
+        where, params = self.build_where()
+        columns = ', '.join(self.RESULT_COLUMNS)
+        if self.uses_fts():
+            # Few enough matches to cache, so sorting them beats scanning the date index
+            return f"SELECT {columns} FROM flights WHERE {where}", params, True
+        where_clause = f"WHERE {where}" if where else ""
+        return f"SELECT {columns} FROM flights {where_clause} {self.order_by()}", params, False
+    
+    def block_query(self, block, previous_row=None, next_row=None):
+        """Query for one page of the current result set
+        
+        previous_row and next_row are the neighbouring rows already fetched,
+        which let the page be found by seeking on (sort value, id) instead of
+        OFFSET. Returns the query, its parameters and whether the rows come back
+        reversed.
+        """
+        where, params = self.build_where(ordered=True)
+        conditions = [where] if where else []
+        order_by = self.order_by()
+        offset = 0
+        reverse = False
+        
+        if block == 0:
+            pass
+        elif previous_row:
+            # Keyset pagination: continue after the last row already seen
+            condition, keyset_params = self.keyset_condition(previous_row)
+            conditions.append(condition)
+            params = params + keyset_params
+        elif next_row:
+            # Walk backwards from the first row of the following page
+            condition, keyset_params = self.keyset_condition(next_row, after=False)
+            conditions.append(condition)
+            params = params + keyset_params
+            order_by = self.order_by(reverse=True)
+            reverse = True
+        else:
+            # A jump with no neighbouring page to seek from
+            offset = block * self.BLOCK_SIZE
+        
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (f"SELECT {', '.join(self.RESULT_COLUMNS)} FROM flights {where_clause} {order_by} "
+                 f"LIMIT ? OFFSET ?")
+        return query, params + [self.BLOCK_SIZE, offset], reverse
+    
+    def export_query(self, columns):
+        """Query for the given columns of every flight in the current result set"""
+        where, params = self.build_where(ordered=True)
+        where_clause = f"WHERE {where}" if where else ""
+        return f"SELECT {', '.join(columns)} FROM flights {where_clause} {self.order_by()}", params
+    
+    def matching_row_query(self, flight_id):
+        """Query for a single flight's result row if it matches the current search"""
+        where, params = self.build_where()
+        conditions = ["id = ?"] + ([where] if where else [])
+        query = f"SELECT {', '.join(self.RESULT_COLUMNS)} FROM flights WHERE {' AND '.join(conditions)}"
+        return query, [flight_id] + params
+    
+    def search(self, search_term, filter_category, date_range=None):
+        """Run a search and return the number of matching flights"""
+        search_term = search_term.lower()
+        
+        if (self.last_rows is not None and self.last_term and filter_category == self.last_category
+                and date_range == self.last_range and self.last_term in search_term):
+            # Anything matching the extended term also matched the previous one
+            columns = [self.RESULT_COLUMNS.index(col) for col in self.search_columns(filter_category)]
+            rows = [row for row in self.last_rows
+                    if any(row[i] is not None and search_term in str(row[i]).lower() for i in columns)]
+            total = len(rows)
+            self.last_term = search_term
+        else:
+            self.last_term = search_term
+            self.last_category = filter_category
+            self.last_range = date_range
+            try:
+                total = self.conn.execute(*self.count_query()).fetchone()[0]
+                
+                rows = None
+                if total <= self.CACHE_LIMIT:
+                    query, params, needs_sort = self.result_query()
+                    rows = self.conn.execute(query, params).fetchall()
+                    if needs_sort:
+                        rows.sort(key=self.sort_key, reverse=self.sort[1])
+            except sqlite3.Error:
+                # An interrupted search mustn't leave the criteria of one search
+                # cached with the rows of another for the next keystroke to narrow
+                self.invalidate()
+                raise
+        
+        self.last_rows = rows
+        self.total = total
+        self.blocks = OrderedDict()
+        
+        return total
+    
+    def rows(self, offset, limit):
+        """Return display rows for a slice of the current result set"""
+        if self.last_rows is not None:
+            rows = self.last_rows[offset:offset + limit]
+        else:
+            first_block = offset // self.BLOCK_SIZE
+            last_block = (offset + limit - 1) // self.BLOCK_SIZE
+            rows = []
+            for block in range(first_block, last_block + 1):
+                rows.extend(self.fetch_block(block))
+            start = offset - first_block * self.BLOCK_SIZE
+            rows = rows[start:start + limit]
+        
+        return [row[:self.DISPLAY_WIDTH] for row in rows]
+    
+    def missing_blocks(self, offset, limit):
+        """Return the pages of a slice of the current result set that rows() would have to fetch"""
+        if self.last_rows is not None:
+            return []
+        first_block = offset // self.BLOCK_SIZE
+        last_block = (offset + limit - 1) // self.BLOCK_SIZE
+        return [block for block in range(first_block, last_block + 1) if block not in self.blocks]
+    
+    def neighbours(self, blocks):
+        """Return the cached pages next to the given ones, which a search elsewhere can seek from"""
+        return {near: list(self.blocks[near]) for block in blocks for near in (block - 1, block + 1)
+                if near in self.blocks and near not in blocks}
+    
+    def add_blocks(self, blocks):
+        """Cache pages fetched by a search on another connection, keeping at most MAX_BLOCKS"""
+        for block, rows in blocks.items():
+            self.blocks[block] = rows
+            self.blocks.move_to_end(block)
+        while len(self.blocks) > self.MAX_BLOCKS:
+            self.blocks.popitem(last=False)
+    
+    def fetch_block(self, block):
+        """Fetch one page of the current result set, seeking from a cached neighbour"""
+        if block in self.blocks:
+            self.blocks.move_to_end(block)
+            return self.blocks[block]
+        
+        previous_block = self.blocks.get(block - 1)
+        next_block = self.blocks.get(block + 1)
+        query, params, reverse = self.block_query(block,
+                                                  previous_row=previous_block[-1] if previous_block else None,
+                                                  next_row=next_block[0] if next_block else None)
+        rows = self.conn.execute(query, params).fetchall()
+        if reverse:
+            rows.reverse()
+        
+        self.blocks[block] = rows
+        if len(self.blocks) > self.MAX_BLOCKS:
+            self.blocks.popitem(last=False)
+        return rows
+    
+    def matching_row(self, flight_id):
+        """Return the result row for a flight if it matches the current search"""
+        return self.conn.execute(*self.matching_row_query(flight_id)).fetchone()
+    
+    def apply_change(self, flight_id, was_listed, row):
+        """Patch the current result set after one flight was added, edited or deleted
+        
+        row is the flight's new result row, or None if it was deleted or no longer
+        matches. Returns True if the flight moved, appeared or disappeared, and
+        False if only its values changed in place.
+        """
+        if self.last_rows is not None:
+            rows = self.last_rows
+            old_index = next((i for i, cached in enumerate(rows) if cached[0] == flight_id), None)
+            if old_index is not None:
+                del rows[old_index]
+            
+            new_index = None
+            if row is not None:
+                new_index = self.sorted_position(rows, row)
+                rows.insert(new_index, row)
+            
+            self.total = len(rows)
+            return old_index != new_index
+        
+        self.total += (row is not None) - bool(was_listed)
+        
+        for block_rows in self.blocks.values():
+            for i, cached in enumerate(block_rows):
+                if cached[0] == flight_id:
+                    if row is not None and self.sort_key(cached) == self.sort_key(row):
+                        block_rows[i] = row
+                        return False
+                    break
+        
+        # Every page after the change shifts by one row
+        self.blocks.clear()
+        return True
+    
+    def sorted_position(self, rows, row):
+        """Binary search for where a row belongs in a list in the current sort order"""
+        key = self.sort_key(row)
+        descending = self.sort[1]
+        low, high = 0, len(rows)
+        while low < high:
+            mid = (low + high) // 2
+            mid_key = self.sort_key(rows[mid])
+            if (mid_key > key) if descending else (mid_key < key):
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+class FlightCache:
+    """Bounded LRU cache of full flights rows keyed by id
+    
+    Rows are read in batches on the database worker and stored on the Tk
+    thread, so a batch can arrive after a write made it stale. Every
+    invalidation bumps the generation, and put_many drops batches read
+    under an older one.
+    """
+    
+    def __init__(self, size=FLIGHT_CACHE_SIZE):
+        self.size = size
+        self.flights = OrderedDict()
+        self.generation = 0
+    
+    def get(self, flight_id):
+        """Return the cached row for flight_id, or None"""
+        flight = self.flights.get(flight_id)
+        if flight is not None:
+            self.flights.move_to_end(flight_id)
+        return flight
+    
+    def missing(self, flight_ids):
+        """Return the ids that aren't cached, in order"""
+        return [flight_id for flight_id in flight_ids if flight_id not in self.flights]
+    
+    def put_many(self, flights, generation):
+        """Cache rows read when the cache was at the given generation, evicting the least recently used"""
+        if generation != self.generation:
+            return
+        for flight in flights:
+            self.flights[flight[0]] = flight
+            self.flights.move_to_end(flight[0])
+        while len(self.flights) > self.size:
+            self.flights.popitem(last=False)
+    
+    def invalidate(self, flight_id):
+        """Forget one flight after it was changed or deleted"""
+        self.flights.pop(flight_id, None)
+        self.generation += 1
+    
+    def clear(self):
+        """Forget every flight, after another terminal has written to the logbook"""
+        self.flights.clear()
+        self.generation += 1
+
+class CompletionIndex:
+    """Prefix index of the values used in the free-text flight fields, for autocomplete
+    
+    Each field keeps its distinct values sorted case-insensitively, so the
+    values starting with a prefix are one bisect away, along with how often
+    each is used and the id of the last flight using it. A field is read from
+    the database the first time it is asked for and then kept up to date by
+    the store's write paths; bulk writes drop the index to be read again.
+    A window can instead read every field on its worker connection and adopt
+    the result, so the Tk thread never waits on the read.
+    """
+    
+    def __init__(self, conn):
+        self.conn = conn
+        # Column -> (sorted (folded value, value) pairs, value -> [uses, last flight id])
+        self.fields = {}
+        # Counts changes, so a read made meanwhile on another connection can be told apart
+        self.generation = 0
+    
+    def field(self, column):
+        """Return the sorted keys and use counts of a field, reading them the first time"""
+        index = self.fields.get(column)
+        if index is None:
+            index = self.fields[column] = self.read_field(column)
+        return index
+    
+    def read_field(self, column):
+        """Read a field's sorted keys and use counts from the database"""
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT {column}, COUNT(*), MAX(id) FROM flights
+            WHERE {column} IS NOT NULL AND {column} != '' GROUP BY {column}
+        ''')
+        uses = {value: [count, last_id] for value, count, last_id in cursor.fetchall()}
+        keys = sorted((value.casefold(), value) for value in uses)
+        return keys, uses
+    
+    def read(self, columns=COMPLETION_FIELDS):
+        """Read every field from the database without touching this index, for another index to adopt"""
+        return {column: self.read_field(column) for column in columns}
+    
+    def values(self, column):
+        """Return a field's values in order, or none if it hasn't been read yet"""
+        keys, _ = self.fields.get(column, ((), None))
+        return [value for _, value in keys]
+    
+    def adopt(self, fields, generation):
+        """Take over fields from read() on another connection, unless this index changed since generation
+        
+        Returns whether it did; a read that may have missed a change is dropped.
+        """
+        if generation != self.generation:
+            return False
+        self.fields = fields
+        self.generation += 1
+        return True
+    
+    def suggest(self, column, prefix, limit=COMPLETION_LIMIT):
+        """Return up to limit values of a field starting with prefix, ignoring case, best ranked first"""
+        prefix = prefix.casefold()
+        if not prefix:
+            return []
+        keys, uses = self.field(column)
+        start = bisect.bisect_left(keys, (prefix,))
+        end = bisect.bisect_left(keys, (prefix + '\U0010ffff',), start)
+        values = [value for _, value in keys[start:end]]
+        if not values:
+            return []
+        # Ages count back from the newest match, which orders them the same as
+        # from the newest flight and keeps the weights from underflowing
+        newest_id = max(uses[value][1] for value in values)
+        return heapq.nlargest(limit, values, key=lambda value: self.weight(uses[value], newest_id))
+    
+    @staticmethod
+    def weight(use, newest_id):
+        """Ranking weight of a value: its use count, halved for every COMPLETION_HALF_LIFE flights since its last use"""
+        count, last_id = use
+        return count * 0.5 ** ((newest_id - last_id) / COMPLETION_HALF_LIFE)
+    
+    def add(self, flight, flight_id):
+        """Count the values of a flight, given as a dict keyed by column, in the fields already read"""
+        self.generation += 1
+        for column, (keys, uses) in self.fields.items():
+            value = flight.get(column)
+            if not value:
+                continue
+            use = uses.get(value)
+            if use is None:
+                uses[value] = [1, flight_id]
+                bisect.insort(keys, (value.casefold(), value))
+            else:
+                use[0] += 1
+                use[1] = max(use[1], flight_id)
+    
+    def remove(self, flight):
+        """Stop counting the values of a changed or deleted flight; a value's last use isn't wound back"""
+        self.generation += 1
+        for column, (keys, uses) in self.fields.items():
+            value = flight.get(column)
+            use = uses.get(value) if value else None
+            if use is None:
+                continue
+            use[0] -= 1
+            if not use[0]:
+                del uses[value]
+                keys.pop(bisect.bisect_left(keys, (value.casefold(), value)))
+    
+    def invalidate(self):
+        """Forget every field, to be read again when next asked for"""
+        self.fields = {}
+        self.generation += 1
+
+class DaySeries:
+    """Launches and minutes per flying day, held as Fenwick trees over the days in order
+    
+    The totals between two dates are two prefix sums, O(log n). Adding to a
+    day already in the series, or a new latest day as when today's flights
+    are entered, is O(log n) too; a new day earlier than the last rebuilds
+    the trees.
+    """
+    
+    def __init__(self, days=(), launches=(), minutes=()):
+        self.days = list(days)
+        self.trees = [self.build(launches), self.build(minutes)]
+    
+    @staticmethod
+    def build(values):
+        """Return the Fenwick tree of a list of values, indexed from 1, in O(n)"""
+        tree = [0] + list(values)
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        return tree
+    
+    @staticmethod
+    def prefix(tree, count):
+        """Sum of the first count values of a tree"""
+        total = 0
+        while count:
+            total += tree[count]
+            count &= count - 1
+        return total
+    
+    def add(self, day, launches, minutes):
+        """Add launches and minutes, negative to take a flight away, to a day"""
+        index = bisect.bisect_left(self.days, day)
+        if index < len(self.days) and self.days[index] == day:
+            for tree, value in zip(self.trees, (launches, minutes)):
+                i = index + 1
+                while i < len(tree):
+                    tree[i] += value
+                    i += i & -i
+        elif index == len(self.days):
+            # The new last node covers the values since the previous power-of-two boundary
+            self.days.append(day)
+            count = len(self.days)
+            for tree, value in zip(self.trees, (launches, minutes)):
+                tree.append(value + self.prefix(tree, count - 1) - self.prefix(tree, count - (count & -count)))
+        else:
+            columns = [[self.prefix(tree, i) - self.prefix(tree, i - 1) for i in range(1, len(tree))]
+                       for tree in self.trees]
+            self.days.insert(index, day)
+            columns[0].insert(index, launches)
+            columns[1].insert(index, minutes)
+            self.trees = [self.build(column) for column in columns]
+    
+    def total(self, first, last):
+        """Return the (launches, minutes) on the days from first to last inclusive"""
+        start = bisect.bisect_left(self.days, first)
+        end = bisect.bisect_right(self.days, last)
+        return tuple(self.prefix(tree, end) - self.prefix(tree, start) for tree in self.trees)
+
+class CurrencyIndex:
+    """Rolling-window launches and minutes by pilot in command and launch method, for currency checks
+    
+    Flights are totalled per day into a DaySeries for each pilot and launch
+    method, each pilot, each method and the whole logbook, so any "last N
+    days" count is a lookup and two prefix sums. Names compare without case,
+    like the search filters, and flights whose date couldn't be read are left
+    out. The series are read from the database the first time they are asked
+    for and kept up to date by the store's single-flight writes; bulk writes
+    drop them, and so does a commit from another connection, which shows up
+    as a change in PRAGMA data_version. A window writes and counts through
+    its worker's store, so its own writes never cause a reload.
+    """
+    
+    def __init__(self, conn):
+        self.conn = conn
+        # (folded pilot or None, folded launch method or None) -> DaySeries
+        self.series = None
+        self.version = None
+        # Folded name -> name as first entered
+        self.pilot_names = {}
+        self.method_names = {}
+    
+    def data_version(self):
+        """Return PRAGMA data_version, which changes when another connection commits"""
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+    
+    def is_current(self):
+        """Return whether the series are read and no other connection has committed since"""
+        return self.series is not None and self.data_version() == self.version
+    
+    def current(self):
+        """Return the series, reading them if they aren't read yet or another connection has committed"""
+        version = self.data_version()
+        if self.series is None or version != self.version:
+            self.load(self.conn.cursor())
+            self.version = version
+        return self.series
+    
+    def load(self, cursor):
+        """Total every flight by day for each pilot and launch method, then merge those into the wider series"""
+        # Scanning and totalling in Python is quicker than a GROUP BY that
+        # hardly reduces the rows of a busy club's logbook
+        cursor.execute('SELECT pilot_in_command, launch_method, date_jd, duration_minutes FROM flights '
+                       'WHERE date_jd IS NOT NULL')
+        self.pilot_names = {}
+        self.method_names = {}
+        keys = {}
+        flown = {}
+        for pilot, method, day, minutes in cursor:
+            key = keys.get((pilot, method))
+            if key is None:
+                key = keys[pilot, method] = self.keys(pilot, method)[0]
+            totals = flown.setdefault(key, {})
+            total = totals.get(day)
+            if total is None:
+                totals[day] = [1, minutes or 0]
+            else:
+                total[0] += 1
+                total[1] += minutes or 0
+        
+        days = {}
+        for (pilot_key, method_key), totals in flown.items():
+            for key in ((pilot_key, method_key), (pilot_key, None), (None, method_key), (None, None)):
+                merged = days.setdefault(key, {})
+                for day, (launches, minutes) in totals.items():
+                    total = merged.get(day)
+                    if total is None:
+                        merged[day] = [launches, minutes]
+                    else:
+                        total[0] += launches
+                        total[1] += minutes
+        
+        self.series = {}
+        for key, totals in days.items():
+            ordered = sorted(totals.items())
+            self.series[key] = DaySeries([day for day, _ in ordered], [launches for _, (launches, _) in ordered],
+                                         [minutes for _, (_, minutes) in ordered])
+    
+    def keys(self, pilot, method):
+        """Return the series a flight counts in, noting the names: by pilot and method, by each, and overall"""
+        pilot_key, method_key = pilot.casefold(), method.casefold()
+        self.pilot_names.setdefault(pilot_key, pilot)
+        self.method_names.setdefault(method_key, method)
+        return (pilot_key, method_key), (pilot_key, None), (None, method_key), (None, None)
+    
+    def flight(self, flight_id):
+        """Return a flight's (pilot, launch method, Julian day, minutes) for add, or None if the series aren't read"""
+        if self.series is None:
+            return None
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT pilot_in_command, launch_method, date_jd, duration_minutes FROM flights WHERE id = ?',
+                       (flight_id,))
+        return cursor.fetchone()
+    
+    def add(self, entry, sign=1):
+        """Count a flight as returned by flight(), or stop counting it with sign=-1"""
+        if entry is None or entry[2] is None or self.series is None:
+            return
+        pilot, method, day, minutes = entry
+        for key in self.keys(pilot, method):
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = DaySeries()
+            series.add(day, sign, sign * (minutes or 0))
+    
+    def window(self, pilot, launch_method, first, last):
+        """Return the (launches, minutes) from day first to last, for a pilot and launch method or None for any"""
+        key = (pilot.casefold() if pilot else None, launch_method.casefold() if launch_method else None)
+        series = self.current().get(key)
+        return series.total(first, last) if series else (0, 0)
+    
+    def pilots(self):
+        """Return the pilots in command, sorted by name"""
+        self.current()
+        return sorted(self.pilot_names.values(), key=str.casefold)
+    
+    def launch_methods(self):
+        """Return the launch methods used, sorted by name"""
+        self.current()
+        return sorted(self.method_names.values(), key=str.casefold)
+    
+    def invalidate(self):
+        """Forget the series, to be read again when next asked for"""
+        self.series = None
+
+class LogbookStore:
+    """Schema setup and migrations for the logbook database, independent of the GUI"""
+    
+    # Schema migrations in order. PRAGMA user_version holds the number of the
+    # last one completed, so new steps go at the end with the next number
+    MIGRATIONS = (
+        (1, "Upgrading the flights table", 'migrate_flights_table'),
+        (2, "Converting durations to minutes", 'migrate_duration_minutes'),
+        (3, "Building the search index", 'migrate_search_index'),
+        (4, "Calculating totals", 'migrate_totals'),
+        (5, "Creating indexes", 'migrate_indexes'),
+        (6, "Calculating statistics", 'migrate_statistics'),
+        (7, "Creating sort indexes", 'migrate_indexes'),
+        (8, "Creating the flight tracks table", 'migrate_tracks'),
+        (9, "Adding track scores", 'migrate_track_scores'),
+        (10, "Normalising flight dates", 'migrate_flight_dates'),
+        (11, "Adding FAI triangle scores", 'migrate_fai_triangles'),
+        (12, "Calculating statistics by date", 'migrate_date_statistics'),
+    )
+    
+    FLIGHTS_TABLE_SQL = '''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            aircraft_type TEXT NOT NULL,
+            aircraft_registration TEXT NOT NULL,
+            pilot_in_command TEXT NOT NULL,
+            instructor TEXT,
+            launch_method TEXT NOT NULL,
+            launch_site TEXT NOT NULL,
+            landing_site TEXT,
+            flight_duration TEXT,
+            max_altitude INTEGER,
+            cross_country_distance REAL,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_minutes INTEGER,
+            date_jd INTEGER
+        )
+    '''
+    
+    INSERT_FLIGHT_SQL = '''
+        INSERT INTO flights (date, aircraft_type, aircraft_registration, pilot_in_command,
+                           instructor, launch_method, launch_site, landing_site, flight_duration,
+                           max_altitude, cross_country_distance, notes, duration_minutes, date_jd)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    
+    UPDATE_FLIGHT_SQL = '''
+        UPDATE flights SET date=?, aircraft_type=?, aircraft_registration=?, pilot_in_command=?,
+                         instructor=?, launch_method=?, launch_site=?, landing_site=?, flight_duration=?,
+                         max_altitude=?, cross_country_distance=?, notes=?, duration_minutes=?, date_jd=?
+        WHERE id=?
+    '''
+    
+    TOTALS_INSERT_TRIGGER_SQL = '''
+        CREATE TRIGGER IF NOT EXISTS flight_totals_insert AFTER INSERT ON flights BEGIN
+            UPDATE flight_totals SET launches = launches + 1,
+                                     minutes = minutes + COALESCE(new.duration_minutes, 0),
+                                     distance = distance + COALESCE(new.cross_country_distance, 0.0)
+            WHERE id = 1;
+        END
+    '''
+    
+    # Adds a flight's launches, minutes and distance to one bucket of
+    # flight_stats, creating the bucket if needed. Deletes add negative values
+    STATS_UPSERT_SQL = '''
+        INSERT INTO flight_stats (dimension, bucket, launches, minutes, distance) {source}
+        ON CONFLICT (dimension, bucket) DO UPDATE SET launches = launches + excluded.launches,
+                                                      minutes = minutes + excluded.minutes,
+                                                      distance = distance + excluded.distance
+    '''
+    
+    def __init__(self, db_path='glider_logbook.db', migrate=True, progress=None, profile='standard', trace=None):
+        if profile not in STORAGE_PROFILES:
+            raise ValueError(f"Unknown storage profile {profile!r}, use one of: {', '.join(STORAGE_PROFILES)}")
+        
+        self.db_path = db_path
+        self.profile = profile
+        # Statements are only recorded once the trace is enabled
+        self.trace = QueryTrace() if trace is None else trace
+        self.conn = sqlite3.connect(db_path, factory=TracedConnection)
+        self.conn.trace = self.trace
+        self.cursor = self.conn.cursor()
+        for pragma, value in STORAGE_PROFILES[profile].items():
+            self.cursor.execute(f'PRAGMA {pragma} = {value}')
+        self.search = FlightSearch(self.conn)
+        self.flight_cache = FlightCache()
+        self.completions = CompletionIndex(self.conn)
+        self.currency_index = CurrencyIndex(self.conn)
+        
+        # A current schema costs one integer read, see migrate()
+        if migrate and self.needs_migration():
+            self.migrate(progress)
+        else:
+            self.search.load_index()
+    
+    def data_version(self):
+        """Return a number that changes whenever another connection commits to the logbook"""
+        self.cursor.execute('PRAGMA data_version')
+        return self.cursor.fetchone()[0]
+    
+    def write_with_retry(self, write):
+        """Run write(), which must commit, retrying while another terminal holds the lock
+        
+        busy_timeout already waits for the lock; this covers writers that
+        time out during a long import or are refused to avoid a deadlock.
+        """
+        for attempt in range(WRITE_RETRIES):
+            try:
+                return write()
+            except sqlite3.OperationalError as e:
+                self.conn.rollback()
+                busy = 'locked' in str(e) or 'busy' in str(e)
+                if not busy or attempt == WRITE_RETRIES - 1:
+                    raise
+                time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+    
+    def needs_migration(self):
+        """Return whether any schema migrations have yet to run"""
+        self.cursor.execute('PRAGMA user_version')
+        return self.cursor.fetchone()[0] < self.MIGRATIONS[-1][0]
+    
+    def migrate(self, progress=None):
+        """Run the schema migrations newer than PRAGMA user_version, in order
+        
+        progress, if given, is called with the step description and the number
+        of flights done and in total (both 0 for steps that aren't batched).
+        Each step records its number in user_version when it completes, and
+        batched steps save their position after every batch, so an interrupted
+        upgrade picks up where it stopped.
+        """
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS migration_progress (
+                version INTEGER PRIMARY KEY,
+                last_id INTEGER NOT NULL
+            )
+        ''')
+        self.cursor.execute('PRAGMA user_version')
+        version = self.cursor.fetchone()[0]
+        
+        for number, description, method in self.MIGRATIONS:
+            if number <= version:
+                continue
+            
+            def report(done, total, description=description):
+                if progress:
+                    progress(description, done, total)
+            
+            report(0, 0)
+            getattr(self, method)(number, report)
+            
+            self.cursor.execute('DELETE FROM migration_progress WHERE version = ?', (number,))
+            self.cursor.execute(f'PRAGMA user_version = {number}')
+            self.conn.commit()
+        
+        self.search.load_index()
+    
+    def migration_checkpoint(self, number):
+        """Return the last flight id handled by an unfinished batched migration, or None"""
+        self.cursor.execute('SELECT last_id FROM migration_progress WHERE version = ?', (number,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+    
+    def migrate_in_batches(self, number, table, step, report):
+        """Call step(after_id, last_id) for successive id ranges of table, one transaction each
+        
+        The end of each range is saved with its batch, so a later run resumes
+        after the last batch that was committed.
+        """
+        last_id = self.migration_checkpoint(number) or 0
+        self.cursor.execute(f'SELECT COUNT(*), COALESCE(MAX(id), 0) FROM {table}')
+        total, max_id = self.cursor.fetchone()
+        self.cursor.execute(f'SELECT COUNT(*) FROM {table} WHERE id <= ?', (last_id,))
+        done = self.cursor.fetchone()[0]
+        
+        while last_id < max_id:
+            self.cursor.execute(f'SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?',
+                                (last_id, MIGRATION_BATCH_ROWS - 1))
+            row = self.cursor.fetchone()
+            end_id = row[0] if row else max_id
+            
+            step(last_id, end_id)
+            self.cursor.execute('INSERT OR REPLACE INTO migration_progress (version, last_id) VALUES (?, ?)',
+                                (number, end_id))
+            self.conn.commit()
+            
+            done = min(total, done + MIGRATION_BATCH_ROWS)
+            report(done, total)
+            last_id = end_id
+    
+    def migrate_flights_table(self, number, report):
+        """Create the flights table, copying flights from the original layout in batches"""
+        self.cursor.execute("PRAGMA table_info(flights)")
+        columns = [column[1] for column in self.cursor.fetchall()]
+        
+        if not columns:
+            self.cursor.execute(self.FLIGHTS_TABLE_SQL.format(table='flights'))
+            return
+        if 'cross_country_distance' in columns:
+            return
+        
+        # The original layout had no distance column. The copy is kept if the
+        # upgrade is interrupted and continues from the last batch
+        copied = ('id, date, aircraft_type, aircraft_registration, pilot_in_command, instructor, launch_method, '
+                  'launch_site, landing_site, flight_duration, max_altitude, notes, created_at')
+        self.cursor.execute(self.FLIGHTS_TABLE_SQL.format(table='flights_new'))
+        self.migrate_in_batches(number, 'flights', lambda after_id, last_id: self.cursor.execute(f'''
+            INSERT INTO flights_new ({copied}) SELECT {copied} FROM flights WHERE id > ? AND id <= ?
+        ''', (after_id, last_id)), report)
+        
+        self.cursor.execute('BEGIN')
+        self.cursor.execute('DROP TABLE flights')
+        self.cursor.execute('ALTER TABLE flights_new RENAME TO flights')
+        self.conn.commit()
+    
+    def migrate_duration_minutes(self, number, report):
+        """Add duration_minutes and convert H:MM durations to integer minutes in batches"""
+        self.cursor.execute("PRAGMA table_info(flights)")
+        if 'duration_minutes' not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute('ALTER TABLE flights ADD COLUMN duration_minutes INTEGER')
+        
+        def convert(after_id, last_id):
+            self.cursor.execute('''
+                SELECT id, flight_duration FROM flights
+                WHERE id > ? AND id <= ? AND duration_minutes IS NULL
+                  AND flight_duration IS NOT NULL AND flight_duration != ''
+            ''', (after_id, last_id))
+            # Durations that don't parse are left NULL and count as zero in totals
+            updates = [(self.time_to_minutes(duration), flight_id) for flight_id, duration in self.cursor.fetchall()
+                       if self.validate_time_format(duration)]
+            self.cursor.executemany('UPDATE flights SET duration_minutes = ? WHERE id = ?', updates)
+        
+        self.migrate_in_batches(number, 'flights', convert, report)
+    
+    def migrate_search_index(self, number, report):
+        """Create the full-text search index and add existing flights to it in batches"""
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='flights_fts'")
+        if self.cursor.fetchone() is None:
+            # The checkpoint is saved with the new table so an interrupted run
+            # knows the index still needs filling
+            self.cursor.execute('BEGIN')
+            if not self.search.init_index(self.cursor):
+                self.conn.rollback()
+                return
+            self.cursor.execute('INSERT INTO migration_progress (version, last_id) VALUES (?, 0)', (number,))
+            self.conn.commit()
+        elif self.migration_checkpoint(number) is None:
+            # Built and filled before migrations were numbered
+            return
+        
+        self.migrate_in_batches(number, 'flights', lambda after_id, last_id: self.search.index_flights_after(
+            self.cursor, after_id, last_id), report)
+    
+    def migrate_totals(self, number, report):
+        """Create the running totals table"""
+        self.init_totals()
+    
+    def migrate_indexes(self, number, report):
+        """Create the flights indexes"""
+        # The date index is on date_jd, which migration 10 fills in
+        self.add_date_column()
+        self.init_indexes()
+    
+    def migrate_statistics(self, number, report):
+        """Create the statistics table"""
+        self.init_statistics()
+    
+    def migrate_tracks(self, number, report):
+        """Create the flight tracks table"""
+        self.init_tracks()
+    
+    def migrate_track_scores(self, number, report):
+        """Add the score columns to flight_tracks; existing tracks are scored by rescore_tracks"""
+        from logbook_scoring import SCORE_FIELDS
+        self.cursor.execute("PRAGMA table_info(flight_tracks)")
+        columns = [column[1] for column in self.cursor.fetchall()]
+        for field in SCORE_FIELDS:
+            if field not in columns:
+                column_type = 'INTEGER' if field == 'triangle_fai' else 'REAL'
+                self.cursor.execute(f'ALTER TABLE flight_tracks ADD COLUMN {field} {column_type}')
+        self.conn.commit()
+    
+    def migrate_fai_triangles(self, number, report):
+        """Add the fai_triangle_km column
+        
+        Where the best triangle was an FAI triangle it is also the best FAI
+        triangle; the others need rescore_tracks to find theirs.
+        """
+        self.migrate_track_scores(number, report)
+        self.cursor.execute('UPDATE flight_tracks SET fai_triangle_km = triangle_km WHERE triangle_fai = 1')
+        self.conn.commit()
+    
+    def add_date_column(self):
+        """Add the date_jd column to a flights table from before migration 10"""
+        self.cursor.execute("PRAGMA table_info(flights)")
+        if 'date_jd' not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute('ALTER TABLE flights ADD COLUMN date_jd INTEGER')
+    
+    def migrate_flight_dates(self, number, report):
+        """Fill in date_jd in batches, rewriting dates such as 2024/6/5 as 2024-06-05
+        
+        Dates that can't be read are left as they were with no date_jd, so they
+        sort as the oldest and fall outside every date range until corrected.
+        """
+        self.add_date_column()
+        # Search index triggers from before this step fire on any update, and
+        # would reindex every flight as its date_jd is filled in
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='flights_fts_update'")
+        if self.cursor.fetchone() is not None:
+            self.cursor.execute('DROP TRIGGER flights_fts_update')
+            self.cursor.execute(self.search.update_trigger_sql)
+        # Migration 12 recreates the statistics trigger and rebuilds the
+        # statistics, so they needn't follow each flight here
+        self.cursor.execute('DROP TRIGGER IF EXISTS flight_stats_update')
+        self.conn.commit()
+        
+        def convert(after_id, last_id):
+            self.cursor.execute('SELECT id, date FROM flights WHERE id > ? AND id <= ? AND date_jd IS NULL',
+                                (after_id, last_id))
+            days = []
+            rewritten = []
+            for flight_id, text in self.cursor.fetchall():
+                normalized = normalize_date(text)
+                if normalized == text:
+                    days.append((julian_day(normalized), flight_id))
+                elif normalized is not None:
+                    rewritten.append((normalized, julian_day(normalized), flight_id))
+            self.cursor.executemany('UPDATE flights SET date_jd = ? WHERE id = ?', days)
+            self.cursor.executemany('UPDATE flights SET date = ?, date_jd = ? WHERE id = ?', rewritten)
+        
+        self.migrate_in_batches(number, 'flights', convert, report)
+        self.init_indexes()
+    
+    def migrate_date_statistics(self, number, report):
+        """Rebuild the statistics and recreate their triggers, which put flights in years and months by date_jd"""
+        self.cursor.execute('BEGIN IMMEDIATE')
+        for trigger in ('flight_stats_insert', 'flight_stats_delete', 'flight_stats_update'):
+            self.cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        self.cursor.execute('DELETE FROM flight_stats')
+        self.add_statistics_after(self.cursor, 0)
+        # Recreates the triggers and commits
+        self.init_statistics()
+    
+    def init_totals(self):
+        """Create the running totals table and the triggers that maintain it"""
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='flight_totals'")
+        exists = self.cursor.fetchone() is not None
+        
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS flight_totals (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                launches INTEGER NOT NULL DEFAULT 0,
+                minutes INTEGER NOT NULL DEFAULT 0,
+                distance REAL NOT NULL DEFAULT 0.0
+            )
+        ''')
+        self.cursor.execute(self.TOTALS_INSERT_TRIGGER_SQL)
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS flight_totals_delete AFTER DELETE ON flights BEGIN
+                UPDATE flight_totals SET launches = launches - 1,
+                                         minutes = minutes - COALESCE(old.duration_minutes, 0),
+                                         distance = distance - COALESCE(old.cross_country_distance, 0.0)
+                WHERE id = 1;
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS flight_totals_update
+            AFTER UPDATE OF duration_minutes, cross_country_distance ON flights BEGIN
+                UPDATE flight_totals SET minutes = minutes - COALESCE(old.duration_minutes, 0)
+                                                           + COALESCE(new.duration_minutes, 0),
+                                         distance = distance - COALESCE(old.cross_country_distance, 0.0)
+                                                             + COALESCE(new.cross_country_distance, 0.0)
+                WHERE id = 1;
+            END
+        ''')
+        
+        if not exists:
+            # Seed the running totals from flights recorded before the table existed
+            self.rebuild_totals()
+        
+        self.conn.commit()
+    
+    def rebuild_totals(self):
+        """Recompute the running totals from scratch and return the previous and rebuilt values"""
+        def rebuild():
+            # Hold the write lock throughout so no other terminal's flight is missed
+            self.cursor.execute('BEGIN IMMEDIATE')
+            self.cursor.execute('SELECT launches, minutes, distance FROM flight_totals WHERE id = 1')
+            previous = self.cursor.fetchone()
+            
+            self.cursor.execute('''
+                SELECT COUNT(*), COALESCE(SUM(duration_minutes), 0), COALESCE(SUM(cross_country_distance), 0.0)
+                FROM flights
+            ''')
+            rebuilt = self.cursor.fetchone()
+            
+            self.cursor.execute('INSERT OR REPLACE INTO flight_totals (id, launches, minutes, distance) '
+                                'VALUES (1, ?, ?, ?)', rebuilt)
+            self.conn.commit()
+            return previous, rebuilt
+        
+        return self.write_with_retry(rebuild)
+    
+    def stats_upsert(self, dimension, row, sign=''):
+        """Upsert statement adding the flight row ('new' or 'old') to its bucket, or subtracting it with sign='-'"""
+        name, expression, _ = STATISTICS_DIMENSIONS[dimension]
+        source = (f"VALUES ('{name}', {expression.format(row=row + '.')}, {sign}1, "
+                  f"{sign}COALESCE({row}.duration_minutes, 0), {sign}COALESCE({row}.cross_country_distance, 0.0))")
+        return self.STATS_UPSERT_SQL.format(source=source)
+    
+    def stats_insert_trigger_sql(self):
+        """Trigger adding each new flight to the statistics, kept so bulk imports can suspend it"""
+        upserts = ''.join(self.stats_upsert(dimension, 'new') + ';' for dimension in STATISTICS_DIMENSIONS)
+        return f"CREATE TRIGGER IF NOT EXISTS flight_stats_insert AFTER INSERT ON flights BEGIN {upserts} END"
+    
+    def add_statistics_after(self, cursor, flight_id):
+        """Add every flight with an id above flight_id to the statistics with one grouped statement per dimension"""
+        for name, expression, _ in STATISTICS_DIMENSIONS.values():
+            bucket = expression.format(row='')
+            cursor.execute(self.STATS_UPSERT_SQL.format(source=f'''
+                SELECT '{name}', {bucket}, COUNT(*), COALESCE(SUM(duration_minutes), 0),
+                       COALESCE(SUM(cross_country_distance), 0.0)
+                FROM flights WHERE id > ? GROUP BY {bucket}
+            '''), (flight_id,))
+    
+    def init_statistics(self):
+        """Create the statistics table and the triggers that maintain it
+        
+        flight_stats holds launches, minutes and distance per (dimension, bucket),
+        e.g. ('launch_method', 'Winch'). Triggers keep it current one flight at
+        a time, so the Statistics window never has to scan the flights table.
+        Buckets compare without case, like the search filters.
+        """
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='flight_stats'")
+        exists = self.cursor.fetchone() is not None
+        
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS flight_stats (
+                dimension TEXT NOT NULL,
+                bucket TEXT NOT NULL COLLATE NOCASE,
+                launches INTEGER NOT NULL DEFAULT 0,
+                minutes INTEGER NOT NULL DEFAULT 0,
+                distance REAL NOT NULL DEFAULT 0.0,
+                PRIMARY KEY (dimension, bucket)
+            ) WITHOUT ROWID
+        ''')
+        self.cursor.execute(self.stats_insert_trigger_sql())
+        removals = ''.join(self.stats_upsert(dimension, 'old', '-') + ';' for dimension in STATISTICS_DIMENSIONS)
+        self.cursor.execute(f"CREATE TRIGGER IF NOT EXISTS flight_stats_delete AFTER DELETE ON flights "
+                            f"BEGIN {removals} END")
+        additions = ''.join(self.stats_upsert(dimension, 'new') + ';' for dimension in STATISTICS_DIMENSIONS)
+        self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS flight_stats_update
+            AFTER UPDATE OF date_jd, aircraft_type, aircraft_registration, launch_method, launch_site,
+                            duration_minutes, cross_country_distance ON flights
+            BEGIN {removals} {additions} END
+        ''')
+        
+        if not exists:
+            # Seed the statistics from flights recorded before the table existed
+            self.add_statistics_after(self.cursor, 0)
+        
+        self.conn.commit()
+    
+    def rebuild_statistics(self):
+        """Recompute the statistics from scratch and return the (dimension, bucket) pairs that were wrong"""
+        def rebuild():
+            self.cursor.execute('BEGIN IMMEDIATE')
+            self.cursor.execute('SELECT dimension, bucket, launches, minutes, distance FROM flight_stats '
+                                'WHERE launches != 0')
+            previous = {(row[0], row[1].lower()): row[2:] for row in self.cursor.fetchall()}
+            
+            self.cursor.execute('DELETE FROM flight_stats')
+            self.add_statistics_after(self.cursor, 0)
+            self.cursor.execute('SELECT dimension, bucket, launches, minutes, distance FROM flight_stats')
+            rebuilt = {(row[0], row[1].lower()): row[2:] for row in self.cursor.fetchall()}
+            self.conn.commit()
+            
+            drift = []
+            for key in sorted(set(previous) | set(rebuilt)):
+                old, new = previous.get(key), rebuilt.get(key)
+                if (old is None or new is None or old[:2] != new[:2]
+                        or abs(old[2] - new[2]) > 0.001):
+                    drift.append(key)
+            return drift
+        
+        return self.write_with_retry(rebuild)
+    
+    def statistics(self, dimension):
+        """Return (bucket, launches, minutes, distance) for each bucket of a breakdown in STATISTICS_DIMENSIONS"""
+        name, _, order = STATISTICS_DIMENSIONS[dimension]
+        self.cursor.execute(f'''
+            SELECT bucket, launches, minutes, distance FROM flight_stats
+            WHERE dimension = ? AND launches > 0 ORDER BY {order}
+        ''', (name,))
+        return self.cursor.fetchall()
+    
+    def init_tracks(self):
+        """Create the table of IGC tracks attached to flights
+        
+        Each track is one packed blob (see FlightTrack.to_blob) next to the
+        values derived from it, and is deleted along with its flight.
+        """
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS flight_tracks (
+                flight_id INTEGER PRIMARY KEY,
+                filename TEXT NOT NULL,
+                fixes INTEGER NOT NULL,
+                takeoff_time TEXT,
+                landing_time TEXT,
+                max_altitude_m INTEGER,
+                distance_km REAL,
+                track BLOB NOT NULL
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS flight_tracks_delete AFTER DELETE ON flights BEGIN
+                DELETE FROM flight_tracks WHERE flight_id = old.id;
+            END
+        ''')
+        self.conn.commit()
+    
+    def init_indexes(self):
+        """Create the managed flights indexes and drop ones no longer in the set"""
+        self.cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name='flights'")
+        existing = dict(self.cursor.fetchall())
+        
+        for name, sql in existing.items():
+            wanted = FLIGHT_INDEXES.get(name)
+            if name.startswith('idx_flights_') and (wanted is None or sql != f"CREATE INDEX {name} ON {wanted}"):
+                self.cursor.execute(f'DROP INDEX {name}')
+        
+        for name, definition in FLIGHT_INDEXES.items():
+            self.cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+        
+        self.conn.commit()
+    
+    def validate_time_format(self, time_str):
+        """Validate time format (H:MM or HH:MM)"""
+        if not time_str:
+            return True
+        
+        match = TIME_PATTERN.match(time_str)
+        if not match:
+            return False
+        
+        hours = int(match.group(1))
+        minutes = int(match.group(2))
+        
+        return hours >= 0 and minutes >= 0 and minutes < 60
+    
+    def time_to_minutes(self, time_str):
+        """Convert time string to minutes"""
+        if not time_str:
+            return 0
+        
+        try:
+            hours, minutes = time_str.split(':')
+            return int(hours) * 60 + int(minutes)
+        except ValueError:
+            return 0
+    
+    def minutes_to_time(self, minutes):
+        """Convert minutes to time string"""
+        hours = minutes // 60
+        mins = minutes % 60
+        return f"{hours}:{mins:02d}"
+    
+    def validate_flight(self, flight):
+        """Check a flight, given as a dict of entered text, and return the first problem or None"""
+        required = (
+            ('date', "Date is required"),
+            ('aircraft_type', "Aircraft type is required"),
+            ('aircraft_registration', "Aircraft registration is required"),
+            ('pilot_in_command', "Pilot in command is required"),
+            ('launch_method', "Launch method is required"),
+            ('launch_site', "Launch site is required"),
+        )
+        for field, message in required:
+            if not flight.get(field):
+                return message
+        
+        # Validate date format
+        if normalize_date(flight['date']) is None:
+            return "Date must be a real date in YYYY-MM-DD format (e.g., 2024-06-15)"
+        
+        # Validate duration format
+        if flight.get('flight_duration') and not self.validate_time_format(flight['flight_duration']):
+            return "Duration must be in H:MM format (e.g., 1:30)"
+        
+        # Validate altitude if provided
+        if flight.get('max_altitude'):
+            try:
+                int(flight['max_altitude'])
+            except ValueError:
+                return "Max altitude must be a number"
+        
+        # Validate distance if provided
+        if flight.get('cross_country_distance'):
+            try:
+                float(flight['cross_country_distance'])
+            except ValueError:
+                return "Cross country distance must be a number"
+        
+        return None
+    
+    def flight_values(self, flight):
+        """Convert a validated flight dict to parameters for INSERT_FLIGHT_SQL"""
+        duration = flight.get('flight_duration')
+        altitude = flight.get('max_altitude')
+        distance = flight.get('cross_country_distance')
+        flight_date = normalize_date(flight['date'])
+        return (
+            flight_date,
+            flight['aircraft_type'],
+            flight['aircraft_registration'],
+            flight['pilot_in_command'],
+            flight.get('instructor') or None,
+            flight['launch_method'],
+            flight['launch_site'],
+            flight.get('landing_site') or None,
+            duration or None,
+            int(altitude) if altitude else None,
+            float(distance) if distance else None,
+            flight.get('notes') or None,
+            self.time_to_minutes(duration) if duration else None,
+            julian_day(flight_date)
+        )
+    
+    def get_flight(self, flight_id):
+        """Return the flights row for flight_id, or None if there is no such flight"""
+        self.cursor.execute('SELECT * FROM flights WHERE id = ?', (flight_id,))
+        return self.cursor.fetchone()
+    
+    def get_flights(self, flight_ids):
+        """Return the flights rows for a list of ids in one query, skipping ids with no flight"""
+        if not flight_ids:
+            return []
+        self.cursor.execute(f'SELECT * FROM flights WHERE id IN ({", ".join("?" * len(flight_ids))})',
+                            list(flight_ids))
+        return self.cursor.fetchall()
+    
+    def flight_fields(self, flight_id, columns):
+        """Return some columns of a flight as a dict, or None if there is no such flight"""
+        self.cursor.execute(f'SELECT {", ".join(columns)} FROM flights WHERE id = ?', (flight_id,))
+        row = self.cursor.fetchone()
+        return dict(zip(columns, row)) if row else None
+    
+    def completion_values(self, flight_id):
+        """Return a flight's COMPLETION_FIELDS values as a dict, or None if the completions aren't read yet"""
+        if not self.completions.fields:
+            return None
+        return self.flight_fields(flight_id, COMPLETION_FIELDS)
+    
+    def create_flight(self, flight):
+        """Validate and insert a flight dict, returning the new flight id"""
+        error = self.validate_flight(flight)
+        if error:
+            raise ValueError(error)
+        
+        def insert():
+            self.cursor.execute(self.INSERT_FLIGHT_SQL, self.flight_values(flight))
+            self.conn.commit()
+            return self.cursor.lastrowid
+        
+        flight_id = self.write_with_retry(insert)
+        self.completions.add(flight, flight_id)
+        self.currency_index.add(self.currency_index.flight(flight_id))
+        return flight_id
+    
+    def save_flight(self, flight_id, flight):
+        """Validate a flight dict and write it over an existing flight"""
+        error = self.validate_flight(flight)
+        if error:
+            raise ValueError(error)
+        
+        def update():
+            self.cursor.execute(self.UPDATE_FLIGHT_SQL, self.flight_values(flight) + (flight_id,))
+            self.conn.commit()
+        
+        previous = self.completion_values(flight_id)
+        previous_day = self.currency_index.flight(flight_id)
+        self.write_with_retry(update)
+        self.flight_cache.invalidate(flight_id)
+        if previous:
+            self.completions.remove(previous)
+            self.completions.add(flight, flight_id)
+        self.currency_index.add(previous_day, -1)
+        self.currency_index.add(self.currency_index.flight(flight_id))
+    
+    def remove_flight(self, flight_id):
+        """Delete a flight"""
+        def delete():
+            self.cursor.execute('DELETE FROM flights WHERE id = ?', (flight_id,))
+            self.conn.commit()
+        
+        previous = self.completion_values(flight_id)
+        previous_day = self.currency_index.flight(flight_id)
+        self.write_with_retry(delete)
+        self.flight_cache.invalidate(flight_id)
+        if previous:
+            self.completions.remove(previous)
+        self.currency_index.add(previous_day, -1)
+    
+    def remove_flights(self, flight_ids):
+        """Delete a list of flights with one statement in one transaction, returning the number deleted"""
+        def delete():
+            self.cursor.execute('BEGIN IMMEDIATE')
+            self.cursor.execute('DELETE FROM flights WHERE id IN (SELECT value FROM json_each(?))',
+                                (json.dumps(list(flight_ids)),))
+            deleted = self.cursor.rowcount
+            self.conn.commit()
+            return deleted
+        
+        deleted = self.write_with_retry(delete)
+        for flight_id in flight_ids:
+            self.flight_cache.invalidate(flight_id)
+        self.completions.invalidate()
+        self.currency_index.invalidate()
+        return deleted
+    
+    def set_field(self, field, value, flight_ids=None, search_term='', filter_category='All', date_range=None):
+        """Set one BULK_EDIT_FIELDS field on a list of flights, or on every flight matching a search
+        
+        The change is one UPDATE in one transaction, and the triggers keep the
+        totals, statistics and search index in step. Returns the number of
+        flights changed.
+        """
+        column = BULK_EDIT_FIELDS.get(field)
+        if column is None:
+            raise ValueError(f"Cannot set {field!r}, use one of: {', '.join(BULK_EDIT_FIELDS)}")
+        value = value.strip() or None
+        if value is None and column in REQUIRED_FIELDS:
+            raise ValueError(f"{field} is required")
+        
+        if flight_ids is not None:
+            where, params = 'id IN (SELECT value FROM json_each(?))', [json.dumps(list(flight_ids))]
+        else:
+            where, params = self.search_for(search_term, filter_category, date_range).build_where()
+        where_clause = f"WHERE {where}" if where else ""
+        
+        def update():
+            self.cursor.execute('BEGIN IMMEDIATE')
+            self.cursor.execute(f'UPDATE flights SET {column} = ? {where_clause}', [value] + params)
+            changed = self.cursor.rowcount
+            self.conn.commit()
+            return changed
+        
+        changed = self.write_with_retry(update)
+        self.completions.invalidate()
+        self.currency_index.invalidate()
+        if flight_ids is None:
+            self.flight_cache.clear()
+        else:
+            for flight_id in flight_ids:
+                self.flight_cache.invalidate(flight_id)
+        return changed
+    
+    def attach_track(self, flight_id, path):
+        """Store an IGC file's track with a flight and take its duration and max altitude from the track
+        
+        Replaces any track already attached. The track is also scored if NumPy
+        is installed, and its free distance becomes the flight's cross-country
+        distance. Returns the values derived by summarize_track and the scores.
+        """
+        from logbook_igc import has_numpy, read_igc, summarize_track, FEET_PER_METRE
+        from logbook_scoring import score_track, SCORE_FIELDS
+        
+        track = read_igc(path)
+        summary = summarize_track(track)
+        summary.update(score_track(track) if has_numpy() else dict.fromkeys(SCORE_FIELDS))
+        blob = track.to_blob()
+        
+        def attach():
+            self.cursor.execute('BEGIN IMMEDIATE')
+            self.cursor.execute('SELECT flight_duration, duration_minutes FROM flights WHERE id = ?', (flight_id,))
+            flight = self.cursor.fetchone()
+            if flight is None:
+                self.conn.rollback()
+                raise ValueError(f"There is no flight {flight_id}")
+            
+            self.cursor.execute('''
+                INSERT OR REPLACE INTO flight_tracks (flight_id, filename, fixes, takeoff_time, landing_time,
+                                                      max_altitude_m, distance_km, track)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (flight_id, os.path.basename(path), summary['fixes'], summary['takeoff_time'],
+                  summary['landing_time'], summary['max_altitude_m'], summary['distance_km'], blob))
+            
+            # Keep the entered duration if the track never reaches flying speed
+            duration, minutes = flight
+            if summary['duration_minutes'] is not None:
+                minutes = summary['duration_minutes']
+                duration = self.minutes_to_time(minutes)
+            self.cursor.execute('UPDATE flights SET max_altitude = ?, flight_duration = ?, duration_minutes = ? '
+                                'WHERE id = ?',
+                                (round(summary['max_altitude_m'] * FEET_PER_METRE), duration, minutes, flight_id))
+            self.save_scores(flight_id, summary)
+            self.conn.commit()
+        
+        previous_day = self.currency_index.flight(flight_id)
+        self.write_with_retry(attach)
+        self.flight_cache.invalidate(flight_id)
+        self.currency_index.add(previous_day, -1)
+        self.currency_index.add(self.currency_index.flight(flight_id))
+        return summary
+    
+    def save_scores(self, flight_id, scores):
+        """Write a track's scores and copy its free distance to the flight, inside the caller's transaction"""
+        from logbook_scoring import SCORE_FIELDS
+        
+        if scores['free_distance_km'] is None:
+            return
+        self.cursor.execute(f'UPDATE flight_tracks SET {", ".join(f"{field} = ?" for field in SCORE_FIELDS)} '
+                            'WHERE flight_id = ?', [scores[field] for field in SCORE_FIELDS] + [flight_id])
+        self.cursor.execute('UPDATE flights SET cross_country_distance = ? WHERE id = ?',
+                            (scores['free_distance_km'], flight_id))
+        self.flight_cache.invalidate(flight_id)
+    
+    def score_flight(self, flight_id):
+        """Score a flight's stored track again and save the scores, returning them or None if it has no track"""
+        from logbook_scoring import score_track
+        
+        track = self.get_track(flight_id)
+        if track is None:
+            return None
+        scores = score_track(track)
+        
+        def save():
+            self.cursor.execute('BEGIN IMMEDIATE')
+            self.save_scores(flight_id, scores)
+            self.conn.commit()
+        
+        self.write_with_retry(save)
+        return scores
+    
+    def rescore_tracks(self, processes=None, progress=None):
+        """Score every stored track again on a pool of worker processes
+        
+        Tracks are read here and handed to the workers a few at a time, so
+        memory stays bounded on a large logbook, and the scores are written
+        back in batches of RESCORE_BATCH_ROWS. progress, if given, is called
+        with the number of tracks done and in total. Returns the number scored.
+        """
+        from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+        from logbook_igc import has_numpy
+        from logbook_scoring import score_blob
+        
+        if not has_numpy():
+            raise RuntimeError("Scoring flights needs NumPy, install it with: pip install numpy")
+        self.cursor.execute('SELECT flight_id FROM flight_tracks ORDER BY flight_id')
+        flight_ids = [row[0] for row in self.cursor.fetchall()]
+        reader = self.conn.cursor()
+        
+        def save(batch):
+            def write():
+                self.cursor.execute('BEGIN IMMEDIATE')
+                for flight_id, scores in batch:
+                    self.save_scores(flight_id, scores)
+                self.conn.commit()
+            self.write_with_retry(write)
+        
+        done = 0
+        batch = []
+        processes = processes or os.cpu_count() or 1
+        queue_size = processes * RESCORE_QUEUE_PER_PROCESS
+        with ProcessPoolExecutor(processes) as pool:
+            pending = set()
+            remaining = iter(flight_ids)
+            while True:
+                for flight_id in itertools.islice(remaining, queue_size - len(pending)):
+                    reader.execute('SELECT track FROM flight_tracks WHERE flight_id = ?', (flight_id,))
+                    pending.add(pool.submit(score_blob, (flight_id, reader.fetchone()[0])))
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch.append(future.result())
+                    done += 1
+                if len(batch) >= RESCORE_BATCH_ROWS or not pending:
+                    save(batch)
+                    batch = []
+                    if progress:
+                        progress(done, len(flight_ids))
+        return done
+    
+    def track_summary(self, flight_id):
+        """Return the file name and derived values of a flight's track as a dict, or None if it has none"""
+        from logbook_scoring import SCORE_FIELDS
+        
+        fields = ('filename', 'fixes', 'takeoff_time', 'landing_time', 'max_altitude_m', 'distance_km') + SCORE_FIELDS
+        self.cursor.execute(f'SELECT {", ".join(fields)} FROM flight_tracks WHERE flight_id = ?', (flight_id,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip(fields, row))
+    
+    def get_track(self, flight_id):
+        """Return a flight's track as a FlightTrack, or None if it has none"""
+        from logbook_igc import FlightTrack
+        
+        self.cursor.execute('SELECT track FROM flight_tracks WHERE flight_id = ?', (flight_id,))
+        row = self.cursor.fetchone()
+        return FlightTrack.from_blob(row[0]) if row else None
+    
+    def totals(self):
+        """Return the running (launches, minutes, distance) totals"""
+        # Kept current by triggers on the flights table
+        self.cursor.execute('SELECT launches, minutes, distance FROM flight_totals WHERE id = 1')
+        return self.cursor.fetchone()
+    
+    def currency(self, pilot=None, launch_method=None, windows=CURRENCY_WINDOWS, today=None):
+        """Return {days: (launches, minutes)} for the last days days up to and including today, for each window
+        
+        pilot narrows the count to flights with that pilot in command and
+        launch_method to one launch method, both ignoring case. today is a
+        YYYY-MM-DD date and defaults to the current date.
+        """
+        if today is None:
+            last = date.today().toordinal() + JULIAN_DAY_OFFSET
+        else:
+            last = julian_day(today)
+            if last is None:
+                raise ValueError("Currency date must be a real date in YYYY-MM-DD format (e.g., 2024-06-15)")
+        return {days: self.currency_index.window(pilot, launch_method, last - days + 1, last) for days in windows}
+    
+    def currency_report(self, launch_method=None, windows=CURRENCY_WINDOWS, today=None):
+        """Return (pilot, currency) for every pilot in command, by name, with currency as from currency()"""
+        return [(pilot, self.currency(pilot, launch_method, windows, today))
+                for pilot in self.currency_index.pilots()]
+    
+    def search_for(self, search_term='', filter_category='All', date_range=None, sort=DEFAULT_SORT):
+        """Return a FlightSearch set to the given criteria, leaving the store's own search and its cache alone"""
+        search = FlightSearch(self.conn)
+        search.fts_enabled = self.search.fts_enabled
+        search.set_sort(sort)
+        search.set_criteria(search_term, filter_category, date_range)
+        return search
+    
+    def find_flights(self, search_term='', filter_category='All', offset=0, limit=None, sort=DEFAULT_SORT,
+                     date_range=None):
+        """Search the logbook and return the number of matches and a page of display rows"""
+        self.search.set_sort(sort)
+        total = self.search.search(search_term, filter_category, date_range)
+        return total, self.search.rows(offset, total if limit is None else limit)
+    
+    def format_row(self, row):
+        """Format a display row with H:MM durations and one-decimal distances"""
+        formatted_row = list(row)
+        if formatted_row[6] is not None:  # Duration
+            formatted_row[6] = self.minutes_to_time(formatted_row[6])
+        else:
+            formatted_row[6] = ""
+        if formatted_row[8] is not None:  # Distance
+            formatted_row[8] = f"{formatted_row[8]:.1f}"
+        else:
+            formatted_row[8] = ""
+        return formatted_row
+    
+    def insert_flights(self, values):
+        """Insert many flights in one transaction
+        
+        The per-row search index, totals and statistics triggers are suspended
+        for the batch and brought up to date with set-based statements.
+        """
+        self.write_with_retry(lambda: self.insert_flights_once(values))
+        self.completions.invalidate()
+        self.currency_index.invalidate()
+    
+    def insert_flights_once(self, values):
+        """Single attempt at insert_flights"""
+        cursor = self.conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM flights')
+            last_id = cursor.fetchone()[0]
+            
+            cursor.execute('DROP TRIGGER IF EXISTS flights_fts_insert')
+            cursor.execute('DROP TRIGGER IF EXISTS flight_totals_insert')
+            cursor.execute('DROP TRIGGER IF EXISTS flight_stats_insert')
+            
+            cursor.executemany(self.INSERT_FLIGHT_SQL, values)
+            
+            if self.search.fts_enabled:
+                self.search.index_flights_after(cursor, last_id)
+                cursor.execute(self.search.insert_trigger_sql)
+            cursor.execute('''
+                UPDATE flight_totals SET launches = launches + ?, minutes = minutes + ?, distance = distance + ?
+                WHERE id = 1
+            ''', (len(values), sum(row[12] or 0 for row in values), sum(row[10] or 0.0 for row in values)))
+            cursor.execute(self.TOTALS_INSERT_TRIGGER_SQL)
+            self.add_statistics_after(cursor, last_id)
+            cursor.execute(self.stats_insert_trigger_sql())
+            
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+    
+    def import_file(self, path, progress=None):
+        """Import flights from a CSV file or a columnar export, skipping rows that fail validation
+        
+        Returns the number of flights imported and a list of (line, message)
+        for the rows that were skipped. progress, if given, is called with the
+        running count after each batch.
+        """
+        if EXPORT_FORMATS.get(os.path.splitext(path)[1].lower()) == 'columnar':
+            return self.bulk_load(lambda: self.import_columnar(path, progress))
+        return self.bulk_load(lambda: self.import_flight_rows(read_csv_flights(path), progress))
+    
+    def bulk_load(self, load):
+        """Run load() and return its result, building the indexes afterwards if the logbook was empty"""
+        # Loading into an empty logbook is faster with the indexes built once at the end
+        self.cursor.execute('SELECT launches FROM flight_totals WHERE id = 1')
+        defer_indexes = self.cursor.fetchone()[0] == 0
+        if defer_indexes:
+            for name in FLIGHT_INDEXES:
+                self.cursor.execute(f'DROP INDEX IF EXISTS {name}')
+            self.conn.commit()
+        
+        try:
+            return load()
+        finally:
+            if defer_indexes:
+                self.init_indexes()
+    
+    def import_flight_rows(self, flights, progress=None):
+        """Validate and insert (line number, flight dict) pairs in batches"""
+        imported = 0
+        errors = []
+        batch = []
+        
+        for line_number, flight in flights:
+            error = self.validate_flight(flight)
+            if error:
+                errors.append((line_number, error))
+                continue
+            
+            batch.append(self.flight_values(flight))
+            if len(batch) >= IMPORT_BATCH_ROWS:
+                self.insert_flights(batch)
+                imported += len(batch)
+                batch = []
+                if progress:
+                    progress(imported)
+        
+        if batch:
+            self.insert_flights(batch)
+            imported += len(batch)
+            if progress:
+                progress(imported)
+        
+        return imported, errors
+    
+    def export_flights(self, path, export_format=None, search_term='', filter_category='All', progress=None,
+                       date_range=None):
+        """Write the flights matching a search to a CSV, JSON Lines or columnar file
+        
+        The cursor is read EXPORT_CHUNK_ROWS rows at a time and each chunk is
+        written out before the next is fetched, so memory use doesn't grow with
+        the size of the logbook. Returns the number of flights written.
+        """
+        if export_format is None:
+            export_format = EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+        writer = {'csv': write_csv, 'jsonl': write_jsonl, 'columnar': write_columnar}.get(export_format)
+        if writer is None:
+            raise ValueError(f"Unknown export format for {path}, use one of: {', '.join(EXPORT_FORMATS)}")
+        
+        search = self.search_for(search_term, filter_category, date_range)
+        columns = [column for column, _ in EXPORT_COLUMNS]
+        
+        cursor = self.conn.cursor()
+        cursor.execute(*search.export_query(columns))
+        
+        def chunks():
+            exported = 0
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    break
+                yield rows
+                exported += len(rows)
+                if progress:
+                    progress(exported)
+        
+        if export_format == 'columnar':
+            out = open(path, 'wb')
+        else:
+            out = open(path, 'w', newline='', encoding='utf-8')
+        with out:
+            return writer(out, chunks())
+    
+    def import_columnar(self, path, progress=None):
+        """Import flights from a columnar export, one row group per transaction
+        
+        Rows were validated when they were first recorded, so they are inserted
+        as they are. Returns the number of flights imported and an empty error list.
+        """
+        fields = ('date', 'aircraft_type', 'aircraft_registration', 'pilot_in_command', 'instructor',
+                  'launch_method', 'launch_site', 'landing_site', 'flight_duration', 'max_altitude',
+                  'cross_country_distance', 'notes', 'duration_minutes')
+        imported = 0
+        for group in read_columnar(path):
+            values = [row + (julian_day(row[0]),) for row in zip(*(group[field] for field in fields))]
+            self.insert_flights(values)
+            imported += len(values)
+            if progress:
+                progress(imported)
+        return imported, []
+    
+    def __del__(self):
+        """Close database connection"""
+        if hasattr(self, 'conn'):
+            self.conn.close()
+
+class JobCancelled(Exception):
+    """Raised inside a DatabaseWorker job that was cancelled, to stop it between steps"""
+
+class DatabaseWorker:
+    """Runs jobs against a LogbookStore on a background thread with its own connection
+    
+    A job is a callable that takes the store. Submitting a job with the same key
+    as an earlier one makes the earlier one stale: it is skipped if it hasn't
+    started, interrupted if it is running, and its result is dropped either way.
+    cancel() makes a job stale without replacing it, and a long job stops at
+    its next check_cancelled(). Results wait in a queue until the owning
+    thread calls deliver_results.
+    The store is opened without migrating, so the owner should submit a job
+    that calls migrate() first if needs_migration() says so.
+    """
+    
+    def __init__(self, db_path, profile='standard', trace=None):
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.lock = threading.Lock()
+        self.generations = {}
+        self.running_key = None
+        self.running_generation = None
+        self.pending = 0
+        self.store = None
+        self.store_error = None
+        self.thread = threading.Thread(target=self.run, args=(db_path, profile, trace), name="logbook-db", daemon=True)
+        self.thread.start()
+    
+    def submit(self, job, on_done=None, on_error=None, key=None):
+        """Queue a job, superseding any earlier job submitted with the same key"""
+        with self.lock:
+            generation = self.generations.get(key, 0) + 1
+            self.generations[key] = generation
+            self.pending += 1
+            # The lock keeps the worker from moving on to another job meanwhile
+            if key is not None and self.running_key == key:
+                self.store.conn.interrupt()
+        self.requests.put((job, on_done, on_error, key, generation))
+    
+    def cancel(self, key):
+        """Make the job submitted with key stale, dropping its result
+        
+        A running job isn't interrupted, since stopping a bulk write part way
+        through a statement could leave it without its indexes; it stops at
+        its next check_cancelled().
+        """
+        with self.lock:
+            self.generations[key] = self.generations.get(key, 0) + 1
+    
+    def check_cancelled(self):
+        """Raise JobCancelled if the running job was cancelled or superseded, for long jobs to call between steps"""
+        with self.lock:
+            cancelled = not self.is_current(self.running_key, self.running_generation)
+        if cancelled:
+            raise JobCancelled()
+    
+    def post(self, callback, value):
+        """Queue a call for the owning thread from inside a job, e.g. to report progress"""
+        self.results.put((callback, value, None, None, False))
+    
+    def is_current(self, key, generation):
+        """Return whether a job is still the latest one submitted with its key"""
+        return key is None or self.generations.get(key) == generation
+    
+    def run(self, db_path, profile, trace):
+        """Worker thread: open the store, then run jobs until stop() is called"""
+        try:
+            self.store = LogbookStore(db_path, migrate=False, profile=profile, trace=trace)
+        except Exception as e:
+            self.store_error = e
+        
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            job, on_done, on_error, key, generation = request
+            
+            with self.lock:
+                if not self.is_current(key, generation):
+                    self.pending -= 1
+                    continue
+                self.running_key = key
+                self.running_generation = generation
+            
+            try:
+                if self.store_error:
+                    raise self.store_error
+                callback, value = on_done, job(self.store)
+            except Exception as e:
+                if self.store:
+                    self.store.conn.rollback()
+                callback, value = on_error, e
+            
+            with self.lock:
+                self.running_key = None
+            self.results.put((callback, value, key, generation, True))
+        
+        # Dropping the store closes its connection on the thread that opened it
+        self.store = None
+    
+    def deliver_results(self):
+        """Call back with the results of finished jobs that weren't superseded
+        
+        Callbacks run on the calling thread. Returns whether any jobs are
+        still queued or running.
+        """
+        while True:
+            try:
+                callback, value, key, generation, finished = self.results.get_nowait()
+            except queue.Empty:
+                break
+            with self.lock:
+                if finished:
+                    self.pending -= 1
+                current = self.is_current(key, generation)
+            if current and callback:
+                callback(value)
+        return self.pending > 0
+    
+    def stop(self):
+        """Finish the queued jobs and close the worker's connection"""
+        self.requests.put(None)
+
+def write_csv(out, chunks):
+    """Write chunks of export rows as CSV with a heading row"""
+    writer = csv.writer(out)
+    writer.writerow([column for column, _ in EXPORT_COLUMNS])
+    count = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+def write_jsonl(out, chunks):
+    """Write chunks of export rows as one JSON object per line"""
+    columns = [column for column, _ in EXPORT_COLUMNS]
+    count = 0
+    for rows in chunks:
+        out.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows)
+        count += len(rows)
+    return count
+
+def write_columnar(out, chunks):
+    """Write chunks of export rows as row groups of compressed typed columns
+    
+    Layout, little-endian: magic, version (u16), column count (u16), then the
+    name and type code of each column. Each row group is a row count (u32)
+    followed by every column as a compressed length (u32) and zlib data.
+    Uncompressed, a column is a null bitmap followed by int64 or float64 values,
+    or for strings a dictionary (u32 count, u32 end offsets, UTF-8 bytes) and
+    u32 indexes into it.
+    """
+    out.write(COLUMNAR_MAGIC + struct.pack('<HH', COLUMNAR_VERSION, len(EXPORT_COLUMNS)))
+    for column, type_code in EXPORT_COLUMNS:
+        name = column.encode('utf-8')
+        out.write(struct.pack('<B', len(name)) + name + type_code.encode('ascii'))
+    
+    count = 0
+    for rows in chunks:
+        out.write(struct.pack('<I', len(rows)))
+        for index, (column, type_code) in enumerate(EXPORT_COLUMNS):
+            data = zlib.compress(encode_column([row[index] for row in rows], type_code))
+            out.write(struct.pack('<I', len(data)) + data)
+        count += len(rows)
+    return count
+
+def encode_column(values, type_code):
+    """Encode one column of a row group for write_columnar"""
+    nulls = bytearray((len(values) + 7) // 8)
+    for i, value in enumerate(values):
+        if value is None:
+            nulls[i >> 3] |= 1 << (i & 7)
+    
+    dictionary = b''
+    if type_code == 'i':
+        data = array('q', (0 if value is None else int(value) for value in values))
+    elif type_code == 'f':
+        data = array('d', (0.0 if value is None else float(value) for value in values))
+    else:
+        strings = {}
+        data = array('I', (strings.setdefault('' if value is None else str(value), len(strings))
+                           for value in values))
+        encoded = [text.encode('utf-8') for text in strings]
+        offsets = array('I')
+        end = 0
+        for text in encoded:
+            end += len(text)
+            offsets.append(end)
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        dictionary = struct.pack('<I', len(encoded)) + offsets.tobytes() + b''.join(encoded)
+    
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return bytes(nulls) + dictionary + data.tobytes()
+
+def decode_column(data, type_code, count):
+    """Decode one column of a row group written by encode_column"""
+    nulls = data[:(count + 7) // 8]
+    position = len(nulls)
+    
+    if type_code == 's':
+        size = struct.unpack_from('<I', data, position)[0]
+        offsets = array('I')
+        offsets.frombytes(data[position + 4:position + 4 + 4 * size])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        position += 4 + 4 * size
+        strings = []
+        start = 0
+        for end in offsets:
+            strings.append(data[position + start:position + end].decode('utf-8'))
+            start = end
+        position += start
+        indexes = array('I')
+        indexes.frombytes(data[position:position + 4 * count])
+        if sys.byteorder == 'big':
+            indexes.byteswap()
+        values = [strings[i] for i in indexes]
+    else:
+        values = array('q' if type_code == 'i' else 'd')
+        values.frombytes(data[position:position + values.itemsize * count])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        values = values.tolist()
+    
+    for i in range(count):
+        if nulls[i >> 3] & (1 << (i & 7)):
+            values[i] = None
+    return values
+
+def read_columnar(path):
+    """Stream the row groups of a columnar export as dicts of column lists"""
+    with open(path, 'rb') as columnar_file:
+        header = columnar_file.read(8)
+        if len(header) < 8 or header[:4] != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar logbook export")
+        version, column_count = struct.unpack('<HH', header[4:])
+        if version != COLUMNAR_VERSION:
+            raise ValueError(f"{path} uses unsupported columnar format version {version}")
+        
+        columns = []
+        for _ in range(column_count):
+            name_length = columnar_file.read(1)[0]
+            name = columnar_file.read(name_length).decode('utf-8')
+            columns.append((name, columnar_file.read(1).decode('ascii')))
+        
+        while True:
+            header = columnar_file.read(4)
+            if not header:
+                break
+            count = struct.unpack('<I', header)[0]
+            group = {}
+            for name, type_code in columns:
+                length = struct.unpack('<I', columnar_file.read(4))[0]
+                group[name] = decode_column(zlib.decompress(columnar_file.read(length)), type_code, count)
+            yield group
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def normalize_date(text):
+    """Return a date as YYYY-MM-DD text, or None if it isn't a real date in a form DATE_PATTERN accepts"""
+    match = DATE_PATTERN.match(text.strip()) if text else None
+    if not match:
+        return None
+    try:
+        return date(*(int(part) for part in match.groups())).isoformat()
+    except ValueError:
+        return None
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def julian_day(text):
+    """Return the Julian day number of a date, or None if it isn't one"""
+    normalized = normalize_date(text)
+    if normalized is None:
+        return None
+    return date.fromisoformat(normalized).toordinal() + JULIAN_DAY_OFFSET
+
+def parse_date_range(date_from='', date_to=''):
+    """Turn From and To dates, either of which may be blank, into a (first, last) Julian day range
+    
+    Returns None if both are blank, and raises ValueError if either isn't a
+    date or the range is backwards.
+    """
+    days = []
+    for label, text in (('From', date_from), ('To', date_to)):
+        text = (text or '').strip()
+        day = julian_day(text) if text else None
+        if text and day is None:
+            raise ValueError(f"{label} date must be a real date in YYYY-MM-DD format (e.g., 2024-06-15)")
+        days.append(day)
+    
+    first, last = days
+    if first is None and last is None:
+        return None
+    first = 0 if first is None else first
+    last = LAST_JULIAN_DAY if last is None else last
+    if first > last:
+        raise ValueError("The From date is after the To date")
+    return first, last
+
+def csv_field(header):
+    """Map a CSV column heading to a flights field, or None if it isn't one"""
+    header = re.sub(r'\(.*?\)', '', header or '')
+    header = ' '.join(header.replace('_', ' ').replace('-', ' ').lower().split())
+    return CSV_HEADER_ALIASES.get(header)
+
+def read_csv_flights(path):
+    """Stream (line number, flight dict) pairs from a CSV file
+    
+    Headings are matched loosely (see CSV_HEADER_ALIASES) and the delimiter is
+    detected, so exports from spreadsheets and club launch-point systems can be
+    read directly. Flights without a duration get one from their takeoff and
+    landing times when both are present.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as csv_file:
+        sample = csv_file.read(8192)
+        csv_file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        
+        reader = csv.reader(csv_file, dialect)
+        headers = next(reader, [])
+        columns = [(field, index) for index, field in enumerate(map(csv_field, headers)) if field]
+        
+        missing = [field for field in REQUIRED_FIELDS if field not in dict(columns)]
+        if missing:
+            raise ValueError(f"CSV file has no column for: {', '.join(missing)}")
+        
+        for record in reader:
+            flight = {}
+            for field, index in columns:
+                value = record[index].strip() if index < len(record) else ''
+                if value:
+                    flight[field] = value
+            if not flight:
+                continue
+            
+            if not flight.get('flight_duration') and flight.get('takeoff_time') and flight.get('landing_time'):
+                flight['flight_duration'] = elapsed_time(flight['takeoff_time'], flight['landing_time'])
+            
+            yield reader.line_num, flight
+
+def elapsed_time(start, end):
+    """Return the H:MM between two HH:MM clock times, or '' if either doesn't parse"""
+    try:
+        start_hours, start_minutes = (int(part) for part in start.split(':')[:2])
+        end_hours, end_minutes = (int(part) for part in end.split(':')[:2])
+    except ValueError:
+        return ''
+    
+    minutes = (end_hours * 60 + end_minutes - start_hours * 60 - start_minutes) % (24 * 60)
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+def check_query_plans(db_path=':memory:'):
+    """Return (description, query, plan) for every search query that scans the
+    flights table without an index or sorts its results in a temp B-tree"""
+    logbook = LogbookStore(db_path)
+    search = logbook.search
+    previous_row = next_row = (1, '2024-01-01', 'ASK 21', 'G-CABC', 'A. Baker', 'Winch', 60, 2000, 50.0,
+                               None, 'Lasham', 'Lasham', julian_day('2024-01-01'))
+    date_ranges = (None, parse_date_range('2024-01-01', '2024-12-31'))
+    problems = []
+    
+    for category, search_term, date_range, sort in itertools.product(
+            ('All',) + tuple(FILTER_COLUMNS), ('', 'g', 'ask 21'), date_ranges,
+            itertools.product(SORT_COLUMNS, (True, False))):
+        search.set_sort(sort)
+        search.set_criteria(search_term, category, date_range)
+        
+        queries = [
+            ('count', search.count_query()),
+            ('result set', search.result_query()[:2]),
+            ('first page', search.block_query(0)[:2]),
+            ('next page', search.block_query(1, previous_row=previous_row)[:2]),
+            ('previous page', search.block_query(1, next_row=next_row)[:2]),
+            ('page jump', search.block_query(5)[:2]),
+            ('single flight', search.matching_row_query(1)),
+            ('export', search.export_query([column for column, _ in EXPORT_COLUMNS])),
+        ]
+        
+        for kind, (query, params) in queries:
+            plan = [row[3] for row in logbook.conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+            table_scan = any(step.startswith('SCAN flights') and 'INDEX' not in step for step in plan)
+            temp_sort = any('TEMP B-TREE' in step for step in plan)
+            
+            # The only plans allowed, as no index could do better:
+            # - sorted by id, scanning the table is walking its rowid B-tree in
+            #   order, and paging stops after one page
+            if table_scan and sort[0] == 'ID' and kind != 'count':
+                table_scan = False
+            # - counting a term too short for the trigram index across every
+            #   column, or in the date text (dates are indexed by Julian day),
+            #   reads every row whatever the indexes; pages stop after one page
+            if (table_scan and kind == 'count' and category in ('All', 'Date') and search_term
+                    and not search.uses_fts()):
+                table_scan = False
+            # - a date range in another order is found on the date index, and
+            #   only the flights in the range are sorted
+            if temp_sort and date_range and sort[0] != 'Date' and any('idx_flights_date' in step for step in plan):
+                temp_sort = False
+            
+            if table_scan or temp_sort:
+                dates = f", {date_range}" if date_range else ""
+                problems.append((f"{kind}, {category}, {search_term!r}{dates}, sorted by {sort[0]}", query, plan))
+    
+    return problems
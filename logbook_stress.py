@@ -0,0 +1,178 @@
+"""Stress a shared logbook with several processes inserting and searching at once
+
+Run it before changing storage settings for club use, e.g.
+    
+    python logbook_stress.py --writers 4 --readers 4 --seconds 20 --profile club
+
+By default it works on a scratch logbook that is deleted afterwards. It exits
+with status 1 if any write failed or the logbook is inconsistent afterwards.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from logbook_store import LogbookStore, STORAGE_PROFILES
+
+# Values the writers draw flights from
+AIRCRAFT = ('ASK 21', 'ASK 13', 'Discus 2b', 'DG-1000', 'LS8', 'Duo Discus', 'Astir CS')
+PILOTS = ('A. Baker', 'C. Davies', 'E. Fisher', 'G. Hughes', 'I. Jones', 'K. Lewis')
+SITES = ('Lasham', 'Dunstable', 'Husbands Bosworth', 'Aboyne', 'Portmoak')
+LAUNCH_METHODS = ('Winch', 'Aerotow', 'Self Launch')
+
+# Search terms the readers cycle through, including ones too short for the FTS index
+SEARCH_TERMS = ('', 'ask', 'discus', 'g-', 'lasham', 'baker', 'winch', 'dg')
+
+def random_flight(rng):
+    """Return a valid flight dict as the entry form would produce it"""
+    return {
+        'date': f"20{rng.randint(10, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        'aircraft_type': rng.choice(AIRCRAFT),
+        'aircraft_registration': f"G-{rng.choice('ABCDE')}{rng.randint(100, 999)}",
+        'pilot_in_command': rng.choice(PILOTS),
+        'instructor': rng.choice(('', '', rng.choice(PILOTS))),
+        'launch_method': rng.choice(LAUNCH_METHODS),
+        'launch_site': rng.choice(SITES),
+        'landing_site': rng.choice(('', rng.choice(SITES))),
+        'flight_duration': f"{rng.randint(0, 5)}:{rng.randint(0, 59):02d}",
+        'max_altitude': str(rng.randint(500, 12000)),
+        'cross_country_distance': rng.choice(('', str(rng.randint(0, 750)))),
+        'notes': '',
+    }
+
+def run_writer(database, profile, seconds, seed, results):
+    """Insert, update and delete single flights the way a terminal does until time runs out"""
+    logbook = LogbookStore(database, profile=profile)
+    rng = random.Random(seed)
+    counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'failed': 0}
+    mine = []
+    
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            action = rng.random()
+            if action < 0.8 or not mine:
+                mine.append(logbook.create_flight(random_flight(rng)))
+                counts['inserted'] += 1
+            elif action < 0.95:
+                logbook.save_flight(rng.choice(mine), random_flight(rng))
+                counts['updated'] += 1
+            else:
+                logbook.remove_flight(mine.pop(rng.randrange(len(mine))))
+                counts['deleted'] += 1
+        except sqlite3.Error as e:
+            counts['failed'] += 1
+            print(f"writer {seed}: {e}", file=sys.stderr)
+    
+    results.put(('writer', counts))
+
+def run_reader(database, profile, seconds, seed, results):
+    """Search, page and read totals the way an open window does until time runs out"""
+    logbook = LogbookStore(database, profile=profile)
+    rng = random.Random(seed)
+    counts = {'searches': 0, 'failed': 0}
+    
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            logbook.search.invalidate()
+            logbook.find_flights(rng.choice(SEARCH_TERMS), 'All', rng.randint(0, 500), 25)
+            logbook.totals()
+            counts['searches'] += 1
+        except sqlite3.Error as e:
+            counts['failed'] += 1
+            print(f"reader {seed}: {e}", file=sys.stderr)
+    
+    results.put(('reader', counts))
+
+def check_consistency(logbook):
+    """Return a list of problems with the running totals, statistics and search index"""
+    problems = []
+    previous, rebuilt = logbook.rebuild_totals()
+    if previous[:2] != rebuilt[:2] or abs(previous[2] - rebuilt[2]) > 0.001:
+        problems.append(f"running totals {previous} did not match the flights table {rebuilt}")
+    
+    drift = logbook.rebuild_statistics()
+    if drift:
+        problems.append(f"statistics were out of date for {len(drift)} buckets, e.g. {drift[0]}")
+    
+    if logbook.search.fts_enabled:
+        try:
+            logbook.conn.execute("INSERT INTO flights_fts (flights_fts) VALUES ('integrity-check')")
+        except sqlite3.DatabaseError as e:
+            problems.append(f"search index: {e}")
+    
+    result = logbook.conn.execute('PRAGMA integrity_check').fetchone()[0]
+    if result != 'ok':
+        problems.append(f"integrity check: {result}")
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress a logbook with concurrent writers and readers")
+    parser.add_argument('database', nargs='?',
+                        help="logbook to use (default: a scratch logbook, deleted afterwards)")
+    parser.add_argument('--writers', type=int, default=4, help="writer processes (default: 4)")
+    parser.add_argument('--readers', type=int, default=4, help="reader processes (default: 4)")
+    parser.add_argument('--seconds', type=float, default=10, help="how long to run (default: 10)")
+    parser.add_argument('--profile', default='club', choices=list(STORAGE_PROFILES),
+                        help="storage profile (default: club)")
+    args = parser.parse_args(argv)
+    
+    scratch = None
+    database = args.database
+    if database is None:
+        scratch = tempfile.mkdtemp(prefix='logbook-stress-')
+        database = os.path.join(scratch, 'stress.db')
+    
+    # Create and migrate the logbook before the workers race to open it
+    logbook = LogbookStore(database, profile=args.profile)
+    flights_before = logbook.totals()[0]
+    
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_writer, args=(database, args.profile, args.seconds, seed, results))
+                 for seed in range(args.writers)]
+    processes += [multiprocessing.Process(target=run_reader,
+                                          args=(database, args.profile, args.seconds, 1000 + seed, results))
+                  for seed in range(args.readers)]
+    
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    
+    totals = {}
+    for _, counts in reports:
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+    
+    problems = check_consistency(logbook)
+    expected = flights_before + totals.get('inserted', 0) - totals.get('deleted', 0)
+    flights_after = logbook.conn.execute('SELECT COUNT(*) FROM flights').fetchone()[0]
+    if flights_after != expected:
+        problems.append(f"expected {expected} flights, found {flights_after}")
+    if totals.get('failed'):
+        problems.append(f"{totals['failed']} operations failed")
+    
+    print(f"{args.writers} writers, {args.readers} readers, {args.profile} profile, {elapsed:.1f}s")
+    print(f"  inserted {totals.get('inserted', 0)} ({totals.get('inserted', 0) / elapsed:.0f}/s), "
+          f"updated {totals.get('updated', 0)}, deleted {totals.get('deleted', 0)}")
+    print(f"  searches {totals.get('searches', 0)} ({totals.get('searches', 0) / elapsed:.0f}/s)")
+    for problem in problems:
+        print(f"  PROBLEM: {problem}")
+    print("  logbook consistent" if not problems else f"  {len(problems)} problem(s)")
+    
+    del logbook
+    if scratch:
+        for name in os.listdir(scratch):
+            os.remove(os.path.join(scratch, name))
+        os.rmdir(scratch)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
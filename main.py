@@ -1,93 +1,86 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from tkinter import font
-import sqlite3
 from datetime import datetime
 import os
-import re
+import sys
+import math
+import argparse
+from logbook_store import (LogbookStore, DatabaseWorker, JobCancelled, QueryTrace, FILTER_COLUMNS, EXPORT_FORMATS,
+                           STORAGE_PROFILES, STATISTICS_DIMENSIONS, SORT_COLUMNS, DEFAULT_SORT, BULK_EDIT_FIELDS,
+                           COMPLETION_FIELDS, CURRENCY_WINDOWS, parse_date_range)
+from logbook_backup import BackupService, BACKUP_KEEP, BACKUP_INTERVAL_MINUTES
+import logbook_cli
 
-class GliderLogbook:
-    def __init__(self, root):
+# Delay between the last keystroke and running the search query
+SEARCH_DEBOUNCE_MS = 200
+
+# Extra rows materialized below the visible part of the Flight Log
+VIEW_BUFFER_ROWS = 5
+
+# How often finished database jobs are collected, and how long a job runs
+# before the busy indicator appears
+WORKER_POLL_MS = 15
+BUSY_INDICATOR_DELAY_MS = 150
+
+# Rows either side of the selection whose flights are read along with it
+PREFETCH_ROWS = 10
+
+# How often to check whether another terminal has written to the logbook
+CHANGE_POLL_MS = 1000
+
+# Skipped rows listed after an import from the GUI
+IMPORT_ERRORS_SHOWN = 20
+
+# Launch methods offered by the form and the currency display
+LAUNCH_METHODS = ('Winch', 'Aerotow', 'Auto-tow', 'Bungee', 'Motor glider', 'Self Launch')
+
+# Currency display choices that count every pilot or every launch method
+ALL_PILOTS = "All pilots"
+ALL_LAUNCH_METHODS = "All launches"
+
+class GliderLogbook(LogbookStore):
+    def __init__(self, root, db_path='glider_logbook.db', profile='standard', trace=False, backup_dir=None,
+                 backup_keep=BACKUP_KEEP, backup_interval=BACKUP_INTERVAL_MINUTES):
         self.root = root
         self.root.title("Glider Pilot Logbook")
         self.root.geometry("1200x800")
         
-        # Initialize database
-        self.init_database()
+        # Initialize database, leaving any schema upgrade to the worker below
+        super().__init__(db_path, migrate=False, profile=profile, trace=QueryTrace(enabled=trace))
+        self.search_after_id = None
+        self.search_pending = False
+        self.completions_pending = False
+        
+        # Open Statistics and Backups windows, if any
+        self.stats_window = None
+        self.backups_window = None
+        
+        # Snapshots are taken on their own thread so searches never wait behind one
+        self.backups = BackupService(db_path, backup_dir, backup_keep, backup_interval,
+                                     on_backup=self.show_backup_done, on_error=self.show_backup_error)
+        
+        # Searches and totals run on a worker thread so the window stays responsive
+        self.worker = DatabaseWorker(self.db_path, profile, self.trace)
+        self.worker_poll_id = None
+        self.busy_after_id = None
+        # (key, on_cancel) of the job the Cancel button stops, if any
+        self.cancellable = None
+        
+        # Writes from other terminals show up as a new data_version
+        self.seen_data_version = self.data_version()
+        self.root.after(CHANGE_POLL_MS, self.check_for_changes)
         
         # Create GUI
         self.create_widgets()
         
+        if self.needs_migration():
+            self.upgrade_logbook()
+        
         # Load data
         self.load_data()
         self.update_totals()
-    
-    def init_database(self):
-        """Initialize SQLite database and create table if it doesn't exist"""
-        self.conn = sqlite3.connect('glider_logbook.db')
-        self.cursor = self.conn.cursor()
-        
-        # Check if table exists and if it has the old structure
-        self.cursor.execute("PRAGMA table_info(flights)")
-        columns = [column[1] for column in self.cursor.fetchall()]
-        
-        if 'cross_country_distance' not in columns:
-            # Create new table with updated structure
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS flights_new (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL,
-                    aircraft_type TEXT NOT NULL,
-                    aircraft_registration TEXT NOT NULL,
-                    pilot_in_command TEXT NOT NULL,
-                    instructor TEXT,
-                    launch_method TEXT NOT NULL,
-                    launch_site TEXT NOT NULL,
-                    landing_site TEXT,
-                    flight_duration TEXT,
-                    max_altitude INTEGER,
-                    cross_country_distance REAL,
-                    notes TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # If old table exists, migrate data
-            if 'flights' in [table[0] for table in self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()]:
-                self.cursor.execute('''
-                    INSERT INTO flights_new (id, date, aircraft_type, aircraft_registration, pilot_in_command,
-                                           instructor, launch_method, launch_site, landing_site, flight_duration,
-                                           max_altitude, notes, created_at)
-                    SELECT id, date, aircraft_type, aircraft_registration, pilot_in_command,
-                           instructor, launch_method, launch_site, landing_site, flight_duration,
-                           max_altitude, notes, created_at
-                    FROM flights
-                ''')
-                self.cursor.execute('DROP TABLE flights')
-            
-            self.cursor.execute('ALTER TABLE flights_new RENAME TO flights')
-        else:
-            # Table already has correct structure
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS flights (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT NOT NULL,
-                    aircraft_type TEXT NOT NULL,
-                    aircraft_registration TEXT NOT NULL,
-                    pilot_in_command TEXT NOT NULL,
-                    instructor TEXT,
-                    launch_method TEXT NOT NULL,
-                    launch_site TEXT NOT NULL,
-                    landing_site TEXT,
-                    flight_duration TEXT,
-                    max_altitude INTEGER,
-                    cross_country_distance REAL,
-                    notes TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-        
-        self.conn.commit()
+        self.reload_completions()
     
     def create_widgets(self):
         """Create the main GUI widgets"""
@@ -123,13 +116,18 @@ class GliderLogbook:
         self.create_form_fields(form_frame)
         
         # Buttons
-        button_frame = ttk.Frame(main_frame)
+        self.button_frame = button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=3, column=0, columnspan=3, pady=(0, 10))
         
         ttk.Button(button_frame, text="Add Flight", command=self.add_flight).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(button_frame, text="Update Flight", command=self.update_flight).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(button_frame, text="Delete Flight", command=self.delete_flight).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="Bulk Edit...", command=self.open_bulk_edit).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(button_frame, text="Clear Form", command=self.clear_form).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="Import...", command=self.import_flights).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="Export...", command=self.export_view).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="Attach IGC...", command=self.attach_igc).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="Backups...", command=self.open_backups).pack(side=tk.LEFT, padx=(0, 5))
         
         # Treeview for displaying flights
         tree_frame = ttk.LabelFrame(main_frame, text="Flight Log", padding="10")
@@ -147,10 +145,40 @@ class GliderLogbook:
         self.create_totals_widgets(totals_frame)
         
         # Status bar
+        status_frame = ttk.Frame(main_frame)
+        status_frame.grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        status_frame.columnconfigure(0, weight=1)
+        
         self.status_var = tk.StringVar()
         self.status_var.set("Ready")
-        status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
-        status_bar.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        status_bar = ttk.Label(status_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
+        status_bar.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        
+        self.create_timings_widgets(status_frame)
+        
+        # Shown while a database job is taking a while, with Cancel for an import or export
+        busy_frame = ttk.Frame(main_frame)
+        busy_frame.grid(row=6, column=2, sticky=tk.E, padx=(5, 0), pady=(10, 0))
+        self.busy_bar = ttk.Progressbar(busy_frame, mode='indeterminate', length=100)
+        self.busy_bar.grid(row=0, column=0)
+        self.busy_bar.grid_remove()
+        self.cancel_button = ttk.Button(busy_frame, text="Cancel", command=self.cancel_job)
+        self.cancel_button.grid(row=0, column=1, padx=(5, 0))
+        self.cancel_button.grid_remove()
+    
+    def create_timings_widgets(self, parent):
+        """Create the timings overlay and its toggle at the right of the status bar"""
+        self.timings_var = tk.StringVar(value="Timings: waiting for the next operation")
+        self.timings_label = ttk.Label(parent, textvariable=self.timings_var, relief=tk.SUNKEN, anchor=tk.W)
+        self.timings_label.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(5, 0))
+        self.save_trace_button = ttk.Button(parent, text="Save Trace...", command=self.save_trace)
+        self.save_trace_button.grid(row=0, column=2, padx=(5, 0))
+        
+        self.timings_shown_var = tk.BooleanVar(value=self.trace.enabled)
+        ttk.Checkbutton(parent, text="Timings", variable=self.timings_shown_var,
+                        command=self.toggle_timings).grid(row=0, column=3, padx=(5, 0))
+        self.root.bind('<F12>', lambda e: self.toggle_timings(not self.timings_shown_var.get()))
+        self.toggle_timings()
     
     def create_search_widgets(self, parent):
         """Create search and filter widgets"""
@@ -159,18 +187,31 @@ class GliderLogbook:
         self.search_var = tk.StringVar()
         search_entry = ttk.Entry(parent, textvariable=self.search_var, width=20)
         search_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(5, 10), pady=2)
-        search_entry.bind('<KeyRelease>', lambda e: self.filter_data())
+        search_entry.bind('<KeyRelease>', lambda e: self.schedule_search())
         
         # Filter category
         ttk.Label(parent, text="Filter by:").grid(row=0, column=2, sticky=tk.W, pady=2)
         self.filter_category_var = tk.StringVar(value="All")
         filter_combo = ttk.Combobox(parent, textvariable=self.filter_category_var, width=15)
-        filter_combo['values'] = ('All', 'Date', 'Aircraft Type', 'Registration', 'Pilot', 'Instructor', 'Launch Method', 'Launch Site', 'Landing Site')
+        filter_combo['values'] = ('All',) + tuple(FILTER_COLUMNS)
         filter_combo.grid(row=0, column=3, sticky=(tk.W, tk.E), padx=(5, 10), pady=2)
         filter_combo.bind('<<ComboboxSelected>>', lambda e: self.filter_data())
         
         # Clear search button
         ttk.Button(parent, text="Clear Search", command=self.clear_search).grid(row=0, column=4, padx=(5, 0), pady=2)
+        
+        # Date range, combined with the search above
+        ttk.Label(parent, text="From:").grid(row=1, column=0, sticky=tk.W, pady=2)
+        self.date_from_var = tk.StringVar()
+        from_entry = ttk.Entry(parent, textvariable=self.date_from_var, width=12)
+        from_entry.grid(row=1, column=1, sticky=tk.W, padx=(5, 10), pady=2)
+        from_entry.bind('<KeyRelease>', lambda e: self.schedule_search())
+        
+        ttk.Label(parent, text="To:").grid(row=1, column=2, sticky=tk.W, pady=2)
+        self.date_to_var = tk.StringVar()
+        to_entry = ttk.Entry(parent, textvariable=self.date_to_var, width=12)
+        to_entry.grid(row=1, column=3, sticky=tk.W, padx=(5, 10), pady=2)
+        to_entry.bind('<KeyRelease>', lambda e: self.schedule_search())
     
     def create_form_fields(self, parent):
         """Create form input fields"""
@@ -181,36 +222,36 @@ class GliderLogbook:
         
         ttk.Label(parent, text="Aircraft Type:").grid(row=0, column=2, sticky=tk.W, pady=2)
         self.aircraft_type_var = tk.StringVar()
-        ttk.Entry(parent, textvariable=self.aircraft_type_var, width=15).grid(row=0, column=3, sticky=(tk.W, tk.E), padx=(5, 0), pady=2)
+        self.completing_entry(parent, self.aircraft_type_var, 'aircraft_type').grid(row=0, column=3, sticky=(tk.W, tk.E), padx=(5, 0), pady=2)
         
         # Row 1
         ttk.Label(parent, text="Registration:").grid(row=1, column=0, sticky=tk.W, pady=2)
         self.registration_var = tk.StringVar()
-        ttk.Entry(parent, textvariable=self.registration_var, width=15).grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(5, 10), pady=2)
+        self.completing_entry(parent, self.registration_var, 'aircraft_registration').grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(5, 10), pady=2)
         
         ttk.Label(parent, text="Pilot in Command:").grid(row=1, column=2, sticky=tk.W, pady=2)
         self.pilot_var = tk.StringVar()
-        ttk.Entry(parent, textvariable=self.pilot_var, width=15).grid(row=1, column=3, sticky=(tk.W, tk.E), padx=(5, 0), pady=2)
+        self.completing_entry(parent, self.pilot_var, 'pilot_in_command').grid(row=1, column=3, sticky=(tk.W, tk.E), padx=(5, 0), pady=2)
         
         # Row 2
         ttk.Label(parent, text="Instructor:").grid(row=2, column=0, sticky=tk.W, pady=2)
         self.instructor_var = tk.StringVar()
-        ttk.Entry(parent, textvariable=self.instructor_var, width=15).grid(row=2, column=1, sticky=(tk.W, tk.E), padx=(5, 10), pady=2)
+        self.completing_entry(parent, self.instructor_var, 'instructor').grid(row=2, column=1, sticky=(tk.W, tk.E), padx=(5, 10), pady=2)
         
         ttk.Label(parent, text="Launch Method:").grid(row=2, column=2, sticky=tk.W, pady=2)
         self.launch_method_var = tk.StringVar()
         launch_combo = ttk.Combobox(parent, textvariable=self.launch_method_var, width=12)
-        launch_combo['values'] = ('Winch', 'Aerotow', 'Auto-tow', 'Bungee', 'Motor glider', 'Self Launch')
+        launch_combo['values'] = LAUNCH_METHODS
         launch_combo.grid(row=2, column=3, sticky=(tk.W, tk.E), padx=(5, 0), pady=2)
         
         # Row 3
         ttk.Label(parent, text="Launch Site:").grid(row=3, column=0, sticky=tk.W, pady=2)
         self.launch_site_var = tk.StringVar()
-        ttk.Entry(parent, textvariable=self.launch_site_var, width=15).grid(row=3, column=1, sticky=(tk.W, tk.E), padx=(5, 10), pady=2)
+        self.completing_entry(parent, self.launch_site_var, 'launch_site').grid(row=3, column=1, sticky=(tk.W, tk.E), padx=(5, 10), pady=2)
         
         ttk.Label(parent, text="Landing Site:").grid(row=3, column=2, sticky=tk.W, pady=2)
         self.landing_site_var = tk.StringVar()
-        ttk.Entry(parent, textvariable=self.landing_site_var, width=15).grid(row=3, column=3, sticky=(tk.W, tk.E), padx=(5, 0), pady=2)
+        self.completing_entry(parent, self.landing_site_var, 'landing_site').grid(row=3, column=3, sticky=(tk.W, tk.E), padx=(5, 0), pady=2)
         
         # Row 4
         ttk.Label(parent, text="Duration (H:MM):").grid(row=4, column=0, sticky=tk.W, pady=2)
@@ -237,15 +278,65 @@ class GliderLogbook:
         # Store selected flight ID for updates
         self.selected_flight_id = None
     
+    def completing_entry(self, parent, variable, column):
+        """Return an entry for a free-text field that completes values used on earlier flights"""
+        combo = ttk.Combobox(parent, textvariable=variable, width=15)
+        combo.bind('<KeyRelease>', lambda e: self.complete_field(e, combo, column))
+        return combo
+    
+    def complete_field(self, event, combo, column):
+        """Offer the earlier values starting with the typed text and fill in the best one after the cursor
+        
+        The filled-in part is selected, so typing on replaces it and
+        Backspace removes it. The other suggestions are in the dropdown.
+        """
+        if not event.char or not event.char.isprintable():
+            return
+        typed = combo.get()
+        if combo.index(tk.INSERT) != len(typed):
+            return
+        if column not in self.completions.fields:
+            # Suggestions start once the worker has read them
+            self.reload_completions()
+            return
+        
+        suggestions = self.completions.suggest(column, typed)
+        combo['values'] = suggestions
+        if suggestions and len(suggestions[0]) > len(typed):
+            combo.set(suggestions[0])
+            combo.icursor(len(typed))
+            combo.selection_range(len(typed), tk.END)
+    
+    def reload_completions(self):
+        """Read the autocomplete values on the database worker and swap them in when done
+        
+        The values already shown stay in use until then. A flight saved from
+        this window while the read runs may be missing from it, so the read is
+        made again.
+        """
+        if self.completions_pending:
+            # Have the read under way start again, as it may have missed this change
+            self.completions.generation += 1
+            return
+        
+        def adopt(fields, generation=self.completions.generation):
+            self.completions_pending = False
+            if not self.completions.adopt(fields, generation):
+                self.reload_completions()
+        
+        self.completions_pending = True
+        self.run_in_background(lambda store: store.completions.read(), adopt, "read the autocomplete values")
+    
     def create_treeview(self, parent):
         """Create the treeview for displaying flight data"""
         columns = ('ID', 'Date', 'Aircraft', 'Registration', 'Pilot', 'Launch Method', 'Duration', 'Max Alt', 'Distance')
         
-        self.tree = ttk.Treeview(parent, columns=columns, show='headings', height=15)
+        # Shift and Ctrl clicks select several flights for bulk edit and delete
+        self.tree = ttk.Treeview(parent, columns=columns, show='headings', height=15, selectmode='extended')
         
-        # Define headings
+        # Define headings; clicking one sorts the whole result set in the database
         for col in columns:
-            self.tree.heading(col, text=col)
+            self.tree.heading(col, text=col, command=lambda col=col: self.sort_by(col))
             if col == 'ID':
                 self.tree.column(col, width=50)
             elif col in ['Date', 'Duration']:
@@ -255,16 +346,34 @@ class GliderLogbook:
             else:
                 self.tree.column(col, width=120)
         
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        # Only a window of the result set is materialized in the tree, so the
+        # scrollbar moves that window instead of scrolling the tree itself
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.tree.configure(yscrollcommand=self.on_tree_scrolled)
         
         # Grid layout
         self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        
+        # Virtual scrolling state
+        self.view_offset = 0
+        self.view_total = 0
+        self.visible_rows = int(self.tree['height'])
+        self.view_sort = DEFAULT_SORT
+        self.show_sort_heading()
         
-        # Bind selection event
+        # Bind selection, resize, wheel and keyboard navigation events
         self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        self.tree.bind('<Configure>', self.on_tree_resized)
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll_view(-3 if e.delta > 0 else 3))
+        self.tree.bind('<Button-4>', lambda e: self.scroll_view(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll_view(3))
+        self.tree.bind('<Up>', lambda e: self.move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self.move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self.move_selection(-self.visible_rows))
+        self.tree.bind('<Next>', lambda e: self.move_selection(self.visible_rows))
+        self.tree.bind('<Shift-Up>', lambda e: self.move_selection(-1, extend=True))
+        self.tree.bind('<Shift-Down>', lambda e: self.move_selection(1, extend=True))
     
     def create_totals_widgets(self, parent):
         """Create totals display widgets"""
@@ -274,134 +383,470 @@ class GliderLogbook:
         
         ttk.Label(parent, textvariable=self.total_launches_var).grid(row=0, column=0, padx=(0, 20), pady=2)
         ttk.Label(parent, textvariable=self.total_hours_var).grid(row=0, column=1, padx=(0, 20), pady=2)
-        ttk.Label(parent, textvariable=self.total_distance_var).grid(row=0, column=2, pady=2)
+        ttk.Label(parent, textvariable=self.total_distance_var).grid(row=0, column=2, padx=(0, 20), pady=2)
+        
+        ttk.Button(parent, text="Check Totals", command=self.check_totals).grid(row=0, column=3, padx=(0, 5), pady=2)
+        ttk.Button(parent, text="Statistics...", command=self.open_statistics).grid(row=0, column=4, pady=2)
+        
+        # Currency: launches and hours in the last CURRENCY_WINDOWS days
+        currency_frame = ttk.Frame(parent)
+        currency_frame.grid(row=1, column=0, columnspan=5, sticky=tk.W, pady=(5, 0))
+        ttk.Label(currency_frame, text="Currency:").grid(row=0, column=0, padx=(0, 5))
+        
+        self.currency_pilot_var = tk.StringVar(value=ALL_PILOTS)
+        pilot_combo = ttk.Combobox(currency_frame, textvariable=self.currency_pilot_var, width=18)
+        pilot_combo['postcommand'] = lambda: pilot_combo.configure(
+            values=[ALL_PILOTS] + self.completions.values('pilot_in_command'))
+        pilot_combo.grid(row=0, column=1, padx=(0, 5))
+        
+        self.currency_method_var = tk.StringVar(value=ALL_LAUNCH_METHODS)
+        method_combo = ttk.Combobox(currency_frame, textvariable=self.currency_method_var, width=14)
+        method_combo['values'] = (ALL_LAUNCH_METHODS,) + LAUNCH_METHODS
+        method_combo.grid(row=0, column=2, padx=(0, 15))
+        
+        for combo in (pilot_combo, method_combo):
+            combo.bind('<<ComboboxSelected>>', lambda e: self.update_currency())
+            combo.bind('<Return>', lambda e: self.update_currency())
+        
+        self.currency_vars = {}
+        for column, days in enumerate(CURRENCY_WINDOWS, start=3):
+            self.currency_vars[days] = tk.StringVar(value=f"Last {days} days: 0 launches, 0:00")
+            ttk.Label(currency_frame, textvariable=self.currency_vars[days]).grid(row=0, column=column, padx=(0, 20))
+    
+    def load_data(self):
+        """Load flight data from database into treeview"""
+        self.filter_data()
     
-    def validate_time_format(self, time_str):
-        """Validate time format (H:MM or HH:MM)"""
-        if not time_str:
-            return True
+    def run_in_background(self, job, on_done, action, key=None, on_error=None):
+        """Run a store call on the database worker and pass its result to on_done on the Tk thread
+        
+        A failure is reported and then passed to on_error, if given, e.g. to
+        re-enable the buttons disabled while the job ran.
+        """
+        def report_error(e):
+            messagebox.showerror("Error", f"Failed to {action}: {str(e)}")
+            if on_error:
+                on_error(e)
+        
+        operation = self.trace.start(action) if on_done else None
+        if operation:
+            # The operation runs on the worker, then renders on the Tk thread
+            def traced_job(store, job=job):
+                with self.trace.context(operation):
+                    return job(store)
+            
+            def traced_done(result, on_done=on_done):
+                with self.trace.context(operation):
+                    on_done(result)
+                self.trace.finish(operation)
+                self.show_timings()
+            
+            job, on_done = traced_job, traced_done
         
-        pattern = r'^(\d{1,2}):([0-5]\d)$'
-        match = re.match(pattern, time_str)
-        if not match:
-            return False
+        self.worker.submit(job, on_done, report_error, key)
+        if self.worker_poll_id is None:
+            self.worker_poll_id = self.root.after(WORKER_POLL_MS, self.poll_worker)
+            self.busy_after_id = self.root.after(BUSY_INDICATOR_DELAY_MS, self.show_busy)
+    
+    def run_cancellable(self, job, on_done, action, key, on_cancel):
+        """Run a long job on the database worker with the Cancel button shown
+        
+        The job calls self.worker.check_cancelled() between steps, and stops
+        there once Cancel is pressed. The buttons are disabled until the job
+        finishes or fails; on_done re-enables them, and so does on_cancel,
+        which is called as soon as Cancel is pressed.
+        """
+        def done(result):
+            self.hide_cancel()
+            on_done(result)
+        
+        def failed(e):
+            self.hide_cancel()
+            self.set_buttons_enabled(True)
+        
+        self.cancellable = (key, on_cancel)
+        self.cancel_button.grid()
+        self.set_buttons_enabled(False)
+        self.run_in_background(job, done, action, key=key, on_error=failed)
+    
+    def cancel_job(self):
+        """Stop the job under way after the step it is on, dropping its result"""
+        if self.cancellable is None:
+            return
+        key, on_cancel = self.cancellable
+        self.worker.cancel(key)
+        self.hide_cancel()
+        on_cancel()
+    
+    def hide_cancel(self):
+        """Hide the Cancel button once its job has finished or been cancelled"""
+        self.cancellable = None
+        self.cancel_button.grid_remove()
+    
+    def poll_worker(self):
+        """Deliver finished database jobs and keep polling until the worker is idle"""
+        if self.worker.deliver_results():
+            self.worker_poll_id = self.root.after(WORKER_POLL_MS, self.poll_worker)
+            return
+        
+        self.worker_poll_id = None
+        if self.busy_after_id is not None:
+            self.root.after_cancel(self.busy_after_id)
+            self.busy_after_id = None
+        self.busy_bar.stop()
+        self.busy_bar.grid_remove()
+    
+    def show_busy(self):
+        """Show the busy indicator for a database job that hasn't finished yet"""
+        self.busy_after_id = None
+        self.busy_bar.grid()
+        self.busy_bar.start()
+    
+    def set_buttons_enabled(self, enabled):
+        """Enable or disable the buttons that change the logbook, while a job changing it runs"""
+        for button in self.button_frame.winfo_children():
+            button.state(['!disabled' if enabled else 'disabled'])
+    
+    def upgrade_logbook(self):
+        """Migrate an older logbook on the worker, keeping the buttons disabled until it's done"""
+        self.set_buttons_enabled(False)
         
-        hours = int(match.group(1))
-        minutes = int(match.group(2))
+        def migrate(store):
+            store.migrate(lambda *progress: self.worker.post(self.show_upgrade_progress, progress))
         
-        return hours >= 0 and minutes >= 0 and minutes < 60
+        def failed(e):
+            # Left on the last migration completed, which is picked up again next time
+            self.set_buttons_enabled(True)
+            self.status_var.set(f"Logbook upgrade failed: {e}")
+        
+        # Searches and totals queued after this run on the upgraded schema
+        self.run_in_background(migrate, self.finish_upgrade, "upgrade the logbook", on_error=failed)
+    
+    def show_upgrade_progress(self, progress):
+        """Show how far the logbook upgrade has got in the status bar"""
+        description, done, total = progress
+        if total:
+            self.status_var.set(f"Upgrading logbook: {description} ({done} of {total} flights)")
+        else:
+            self.status_var.set(f"Upgrading logbook: {description}...")
+    
+    def finish_upgrade(self, result):
+        """Re-enable editing once the logbook upgrade has finished"""
+        self.search.load_index()
+        self.set_buttons_enabled(True)
     
-    def time_to_minutes(self, time_str):
-        """Convert time string to minutes"""
-        if not time_str:
-            return 0
+    def check_for_changes(self):
+        """Refresh the Flight Log and totals when another terminal has written to the logbook"""
+        self.backups.deliver_results()
+        
+        # Leave it for the next check while this window's own jobs are running
+        if self.worker_poll_id is None:
+            data_version = self.data_version()
+            if data_version != self.seen_data_version:
+                self.seen_data_version = data_version
+                self.flight_cache.clear()
+                self.reload_completions()
+                self.invalidate_search()
+                self.filter_data()
+                self.update_totals()
         
-        try:
-            parts = time_str.split(':')
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            return hours * 60 + minutes
-        except:
-            return 0
-    
-    def minutes_to_time(self, minutes):
-        """Convert minutes to time string"""
-        hours = minutes // 60
-        mins = minutes % 60
-        return f"{hours}:{mins:02d}"
+        self.root.after(CHANGE_POLL_MS, self.check_for_changes)
     
-    def load_data(self):
-        """Load flight data from database into treeview"""
+    def invalidate_search(self):
+        """Drop the cached result sets after the flights table changes"""
+        self.search.invalidate()
+        self.run_in_background(lambda store: store.search.invalidate(), None, "refresh the search")
+    
+    def schedule_search(self):
+        """Debounce search-as-you-type so only the last keystroke runs a query"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.run_scheduled_search)
+    
+    def run_scheduled_search(self):
+        """Run the pending search unless the criteria are unchanged"""
+        self.search_after_id = None
+        try:
+            date_range = parse_date_range(self.date_from_var.get(), self.date_to_var.get())
+        except ValueError as e:
+            # Wait for the rest of a date that is still being typed
+            self.status_var.set(str(e))
+            return
+        if (self.search_var.get().lower() == (self.search.last_term or '')
+                and self.filter_category_var.get() == self.search.last_category
+                and date_range == self.search.last_range):
+            # Navigation and modifier keys don't change the search term
+            return
         self.filter_data()
     
     def filter_data(self):
         """Filter and display flight data based on search criteria"""
-        # Clear existing data
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        # A direct refresh supersedes any search still waiting to run
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+            self.search_after_id = None
         
-        # Build query based on search criteria
-        search_term = self.search_var.get().lower()
+        search_term = self.search_var.get()
         filter_category = self.filter_category_var.get()
-        
-        base_query = '''
-            SELECT id, date, aircraft_type, aircraft_registration, pilot_in_command, 
-                   launch_method, flight_duration, max_altitude, cross_country_distance
-            FROM flights
-        '''
-        
-        params = []
-        where_clause = ""
-        
-        if search_term:
-            if filter_category == "All":
-                where_clause = '''
-                    WHERE LOWER(date) LIKE ? OR LOWER(aircraft_type) LIKE ? OR 
-                          LOWER(aircraft_registration) LIKE ? OR LOWER(pilot_in_command) LIKE ? OR
-                          LOWER(instructor) LIKE ? OR LOWER(launch_method) LIKE ? OR
-                          LOWER(launch_site) LIKE ? OR LOWER(landing_site) LIKE ?
-                '''
-                params = [f'%{search_term}%'] * 8
-            else:
-                column_map = {
-                    'Date': 'date',
-                    'Aircraft Type': 'aircraft_type',
-                    'Registration': 'aircraft_registration',
-                    'Pilot': 'pilot_in_command',
-                    'Instructor': 'instructor',
-                    'Launch Method': 'launch_method',
-                    'Launch Site': 'launch_site',
-                    'Landing Site': 'landing_site'
-                }
-                if filter_category in column_map:
-                    where_clause = f"WHERE LOWER({column_map[filter_category]}) LIKE ?"
-                    params = [f'%{search_term}%']
-        
-        query = base_query + where_clause + " ORDER BY date DESC"
-        
-        # Execute query
-        self.cursor.execute(query, params)
-        rows = self.cursor.fetchall()
-        
-        # Insert data into treeview
-        for row in rows:
-            # Format the row data
-            formatted_row = list(row)
-            if formatted_row[8] is not None:  # Distance
-                formatted_row[8] = f"{formatted_row[8]:.1f}"
-            else:
-                formatted_row[8] = ""
+        sort = self.view_sort
+        try:
+            date_range = parse_date_range(self.date_from_var.get(), self.date_to_var.get())
+        except ValueError:
+            # Keep the range on show until the dates are corrected
+            date_range = self.search.last_range
+        
+        def run_search(store):
+            store.search.set_sort(sort)
+            total = store.search.search(search_term, filter_category, date_range)
+            rows = store.search.last_rows
+            # The Tk thread patches its copy in place after edits
+            if rows is not None:
+                return total, list(rows), {}
+            # A result set too large to cache is paged, starting with the first page
+            return total, None, {0: list(store.search.fetch_block(0))}
+        
+        self.search_pending = True
+        self.status_var.set("Searching...")
+        self.run_in_background(run_search,
+                               lambda result: self.show_results(search_term, filter_category, sort, date_range,
+                                                                *result),
+                               "search flights", key='search')
+    
+    def show_results(self, search_term, filter_category, sort, date_range, total, rows, blocks):
+        """Display a result set found by the database worker"""
+        self.search_pending = False
+        self.search.adopt(search_term, filter_category, total, rows, sort, date_range)
+        self.search.add_blocks(blocks)
+        self.view_total = total
+        self.view_offset = 0
+        self.render_view()
+        
+        self.status_var.set(f"Showing {self.view_total} flights")
+    
+    def shown_search(self):
+        """Return the (search term, category, date range) that found the flights on show
+        
+        These can differ from the search box while a search is waiting to run,
+        and are None while the list is being refreshed.
+        """
+        if self.search.last_category is None:
+            return None
+        return self.search.last_term, self.search.last_category, self.search.last_range
+    
+    def sort_by(self, column):
+        """Sort the Flight Log on a column, reversing the order if it is already sorted on it"""
+        if column == self.view_sort[0]:
+            self.view_sort = (column, not self.view_sort[1])
+        else:
+            self.view_sort = (column, column == 'Date')
+        self.show_sort_heading()
+        self.filter_data()
+    
+    def show_sort_heading(self):
+        """Mark the sorted column's heading with the sort direction"""
+        column, descending = self.view_sort
+        for col in SORT_COLUMNS:
+            self.tree.heading(col, text=col + (" \u25bc" if descending else " \u25b2") * (col == column))
+    
+    def render_view(self, then=None):
+        """Materialize the visible window of the current result set
+        
+        Pages of a large result set that aren't cached are read on the
+        database worker first. then, if given, is called once the window's
+        rows are in the tree.
+        """
+        self.view_offset = max(0, min(self.view_offset, self.view_total - self.visible_rows))
+        missing = self.search.missing_blocks(self.view_offset, self.visible_rows + VIEW_BUFFER_ROWS)
+        if missing:
+            self.update_scrollbar()
+            self.load_blocks(missing, then)
+            return
+        rows = self.search.rows(self.view_offset, self.visible_rows + VIEW_BUFFER_ROWS)
+        
+        # Reuse items already in the window so scrolling only touches the rows
+        # that enter or leave it
+        wanted = [str(row[0]) for row in rows]
+        wanted_set = set(wanted)
+        with self.trace.tk_update("render view", len(rows)):
+            stale = [item for item in self.tree.get_children() if item not in wanted_set]
+            if stale:
+                self.tree.delete(*stale)
             
-            self.tree.insert('', 'end', values=formatted_row)
+            for index, row in enumerate(rows):
+                item = wanted[index]
+                if self.tree.exists(item):
+                    if self.tree.index(item) != index:
+                        self.tree.move(item, '', index)
+                    self.tree.item(item, values=self.format_row(row))
+                else:
+                    self.tree.insert('', index, iid=item, values=self.format_row(row))
+            
+            # Keep the selected flight highlighted when it scrolls back into view
+            if (self.selected_flight_id is not None and self.tree.exists(str(self.selected_flight_id))
+                    and not self.tree.selection()):
+                self.tree.selection_set(str(self.selected_flight_id))
+            
+            self.tree.yview_moveto(0)
+        self.update_scrollbar()
+        if then:
+            then()
+    
+    def load_blocks(self, blocks, then=None):
+        """Read pages of the result set on show on the database worker, then render the window again
+        
+        A newer scroll supersedes pages still being read, and pages read for
+        a search that has since been replaced are dropped.
+        """
+        criteria, sort = self.shown_search(), self.search.sort
+        if criteria is None:
+            # The search being run renders the window when it is done
+            return
+        neighbours = self.search.neighbours(blocks)
+        
+        def fetch(store):
+            search = store.search_for(*criteria, sort)
+            search.add_blocks(neighbours)
+            return {block: search.fetch_block(block) for block in blocks}
         
-        self.status_var.set(f"Showing {len(rows)} flights")
+        def loaded(fetched):
+            if criteria == self.shown_search() and sort == self.search.sort:
+                self.search.add_blocks(fetched)
+                self.render_view(then)
+        
+        self.run_in_background(fetch, loaded, "load flights", key='page')
+    
+    def refresh_flight(self, flight_id, was_listed, row, criteria, sort):
+        """Patch the Flight Log after a single flight was added, updated or deleted
+        
+        was_listed and row are whether the flight matched the search given by
+        criteria and sort before the change, and its result row after it.
+        """
+        if self.search_pending or criteria is None or criteria != self.shown_search() or sort != self.search.sort:
+            # The search on show may have read the table before this change, or
+            # isn't the one the flight was matched against
+            self.filter_data()
+            return
+        
+        moved = self.search.apply_change(flight_id, was_listed, row)
+        self.view_total = self.search.total
+        
+        item = str(flight_id)
+        if moved:
+            self.render_view()
+        elif self.tree.exists(item):
+            with self.trace.tk_update("patch row", 1):
+                self.tree.item(item, values=self.format_row(row[:self.search.DISPLAY_WIDTH]))
+    
+    def update_scrollbar(self):
+        """Size the scrollbar thumb from the window position in the result set"""
+        if self.view_total <= self.visible_rows:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            first = self.view_offset / self.view_total
+            last = min(1.0, (self.view_offset + self.visible_rows) / self.view_total)
+            self.scrollbar.set(first, last)
+    
+    def scroll_view(self, rows):
+        """Move the materialized window by a number of rows"""
+        offset = self.view_offset
+        self.view_offset += rows
+        self.render_view()
+        if self.view_offset != offset:
+            return "break"
+    
+    def on_scrollbar(self, action, value, unit=None):
+        """Handle scrollbar drags, arrow clicks and trough clicks"""
+        if action == 'moveto':
+            self.view_offset = int(float(value) * self.view_total)
+            self.render_view()
+        elif action == 'scroll':
+            step = self.visible_rows if unit == 'pages' else 1
+            self.scroll_view(int(value) * step)
+    
+    def on_tree_scrolled(self, first, last):
+        """Fold any scrolling done by the tree itself back into the window offset"""
+        if float(first) > 0:
+            shift = round(float(first) * len(self.tree.get_children()))
+            self.view_offset += max(1, shift)
+            self.render_view()
+    
+    def on_tree_resized(self, event):
+        """Recompute how many rows fit in the tree after a resize"""
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else None
+        if bbox:
+            visible_rows = max(1, (event.height - bbox[1]) // bbox[3])
+            if visible_rows != self.visible_rows:
+                self.visible_rows = visible_rows
+                self.render_view()
+    
+    def move_selection(self, rows, extend=False):
+        """Move the selection through the whole result set, not just the window
+        
+        With extend=True the row moved to is added to the selection instead.
+        Only rows in the materialized window stay selected.
+        """
+        if not self.view_total:
+            return "break"
+        
+        children = self.tree.get_children()
+        focus = self.tree.focus()
+        index = self.view_offset + children.index(focus) if focus in children else self.view_offset - 1
+        index = max(0, min(self.view_total - 1, index + rows))
+        
+        if index < self.view_offset:
+            self.view_offset = index
+        elif index >= self.view_offset + self.visible_rows:
+            self.view_offset = index - self.visible_rows + 1
+        self.render_view(lambda: self.select_row(index, extend))
+        return "break"
+    
+    def select_row(self, index, extend=False):
+        """Select the row at an index in the result set if it is in the window, or add it with extend=True"""
+        children = self.tree.get_children()
+        if 0 <= index - self.view_offset < len(children):
+            item = children[index - self.view_offset]
+            if extend:
+                self.tree.selection_add(item)
+            else:
+                self.tree.selection_set(item)
+            self.tree.focus(item)
     
     def clear_search(self):
         """Clear search criteria and reload all data"""
         self.search_var.set("")
         self.filter_category_var.set("All")
+        self.date_from_var.set("")
+        self.date_to_var.set("")
         self.filter_data()
     
     def update_totals(self):
         """Update the totals display"""
-        self.cursor.execute('''
-            SELECT COUNT(*), 
-                   SUM(CASE WHEN flight_duration != '' AND flight_duration IS NOT NULL THEN 1 ELSE 0 END) as duration_count,
-                   SUM(CASE WHEN cross_country_distance IS NOT NULL THEN cross_country_distance ELSE 0 END) as total_distance
-            FROM flights
-        ''')
-        
-        result = self.cursor.fetchone()
-        total_launches = result[0] if result[0] else 0
-        total_distance = result[2] if result[2] else 0.0
-        
-        # Calculate total hours
-        self.cursor.execute('SELECT flight_duration FROM flights WHERE flight_duration IS NOT NULL AND flight_duration != ""')
-        durations = self.cursor.fetchall()
-        
-        total_minutes = 0
-        for duration in durations:
-            total_minutes += self.time_to_minutes(duration[0])
+        self.run_in_background(lambda store: store.totals(), self.show_totals, "load totals", key='totals')
+        self.update_currency()
+        if self.stats_window is not None:
+            self.update_statistics()
+    
+    def update_currency(self):
+        """Count launches and hours in the currency windows for the chosen pilot and launch method"""
+        pilot = self.currency_pilot_var.get().strip()
+        launch_method = self.currency_method_var.get().strip()
+        pilot = None if pilot in ('', ALL_PILOTS) else pilot
+        launch_method = None if launch_method in ('', ALL_LAUNCH_METHODS) else launch_method
+        # Flights are written through the worker's store, which keeps its
+        # currency index up to date, so it is only read again after another
+        # terminal writes
+        self.run_in_background(lambda store: store.currency(pilot, launch_method), self.show_currency,
+                               "load currency", key='currency')
+    
+    def show_currency(self, currency):
+        """Display the launches and hours in each currency window"""
+        for days, (launches, minutes) in currency.items():
+            self.currency_vars[days].set(f"Last {days} days: {launches} launches, {self.minutes_to_time(minutes)}")
+    
+    def show_totals(self, totals):
+        """Display the running totals read by the database worker"""
+        total_launches, total_minutes, total_distance = totals
         
         total_hours_str = self.minutes_to_time(total_minutes)
         
@@ -410,21 +855,257 @@ class GliderLogbook:
         self.total_hours_var.set(f"Total Hours: {total_hours_str}")
         self.total_distance_var.set(f"Total Distance: {total_distance:.1f} km")
     
+    def check_totals(self):
+        """Rebuild the running totals from the flights table and report any drift"""
+        self.status_var.set("Checking totals...")
+        self.run_in_background(lambda store: store.rebuild_totals(), self.report_totals_check,
+                               "check totals", key='check totals')
+    
+    def report_totals_check(self, result):
+        """Show any drift found by check_totals"""
+        previous, rebuilt = result
+        self.update_totals()
+        
+        drift = []
+        if previous is None:
+            drift.append("Running totals were missing")
+        else:
+            if previous[0] != rebuilt[0]:
+                drift.append(f"Launches: {previous[0]} recorded, {rebuilt[0]} actual")
+            if previous[1] != rebuilt[1]:
+                drift.append(f"Hours: {self.minutes_to_time(previous[1])} recorded, "
+                             f"{self.minutes_to_time(rebuilt[1])} actual")
+            if not math.isclose(previous[2], rebuilt[2], abs_tol=0.001):
+                drift.append(f"Distance: {previous[2]:.1f} km recorded, {rebuilt[2]:.1f} km actual")
+        
+        if drift:
+            messagebox.showwarning("Totals Check", "Totals were out of date and have been rebuilt:\n\n" + "\n".join(drift))
+            self.status_var.set("Totals rebuilt")
+        else:
+            self.status_var.set("Totals are consistent")
+    
+    def open_statistics(self):
+        """Open the Statistics window, or bring it to the front if it is already open"""
+        if self.stats_window is not None:
+            self.stats_window.lift()
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("Statistics")
+        window.geometry("560x420")
+        window.columnconfigure(0, weight=1)
+        window.rowconfigure(1, weight=1)
+        window.protocol("WM_DELETE_WINDOW", self.close_statistics)
+        self.stats_window = window
+        
+        controls = ttk.Frame(window, padding="10 10 10 0")
+        controls.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        ttk.Label(controls, text="Breakdown by:").pack(side=tk.LEFT)
+        self.stats_dimension_var = tk.StringVar(value='Aircraft Type')
+        dimension_combo = ttk.Combobox(controls, textvariable=self.stats_dimension_var, state='readonly', width=15,
+                                       values=tuple(STATISTICS_DIMENSIONS))
+        dimension_combo.pack(side=tk.LEFT, padx=(5, 0))
+        dimension_combo.bind('<<ComboboxSelected>>', lambda e: self.update_statistics())
+        ttk.Button(controls, text="Rebuild", command=self.rebuild_statistics_view).pack(side=tk.RIGHT)
+        
+        tree_frame = ttk.Frame(window, padding="10")
+        tree_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        tree_frame.columnconfigure(0, weight=1)
+        tree_frame.rowconfigure(0, weight=1)
+        columns = ('Bucket', 'Launches', 'Hours', 'Distance', 'Share')
+        self.stats_tree = ttk.Treeview(tree_frame, columns=columns, show='headings')
+        for col, width in zip(columns, (160, 80, 80, 100, 80)):
+            self.stats_tree.heading(col, text=col)
+            self.stats_tree.column(col, width=width, anchor=tk.W if col == 'Bucket' else tk.E)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.stats_tree.yview)
+        self.stats_tree.configure(yscrollcommand=scrollbar.set)
+        self.stats_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        
+        self.update_statistics()
+    
+    def close_statistics(self):
+        """Close the Statistics window"""
+        self.stats_window.destroy()
+        self.stats_window = None
+    
+    def update_statistics(self):
+        """Load the selected breakdown from the statistics table"""
+        dimension = self.stats_dimension_var.get()
+        self.run_in_background(lambda store: store.statistics(dimension),
+                               lambda rows: self.show_statistics(dimension, rows), "load statistics", key='statistics')
+    
+    def show_statistics(self, dimension, rows):
+        """Display a breakdown read by the database worker"""
+        # The window may have closed or switched breakdown while it was loading
+        if self.stats_window is None or dimension != self.stats_dimension_var.get():
+            return
+        
+        self.stats_tree.heading('Bucket', text=dimension)
+        launches = sum(row[1] for row in rows)
+        with self.trace.tk_update("render statistics", len(rows)):
+            self.stats_tree.delete(*self.stats_tree.get_children())
+            for bucket, count, minutes, distance in rows:
+                self.stats_tree.insert('', tk.END, values=(bucket, count, self.minutes_to_time(minutes),
+                                                           f"{distance:.1f} km", f"{count / launches:.1%}"))
+    
+    def rebuild_statistics_view(self):
+        """Rebuild the statistics table from the flights table and report any drift"""
+        def report(drift):
+            self.update_statistics()
+            if drift:
+                self.status_var.set(f"Statistics rebuilt, {len(drift)} entries were out of date")
+            else:
+                self.status_var.set("Statistics are consistent")
+        
+        self.status_var.set("Rebuilding statistics...")
+        self.run_in_background(lambda store: store.rebuild_statistics(), report, "rebuild statistics",
+                               key='rebuild statistics')
+    
+    def open_backups(self):
+        """Open the Backups window, or bring it to the front if it is already open"""
+        if self.backups_window is not None:
+            self.backups_window.lift()
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("Backups")
+        window.geometry("460x320")
+        window.columnconfigure(0, weight=1)
+        window.rowconfigure(0, weight=1)
+        window.protocol("WM_DELETE_WINDOW", self.close_backups)
+        self.backups_window = window
+        
+        tree_frame = ttk.Frame(window, padding="10 10 10 0")
+        tree_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        tree_frame.columnconfigure(0, weight=1)
+        tree_frame.rowconfigure(0, weight=1)
+        columns = ('Taken', 'Size')
+        self.backups_tree = ttk.Treeview(tree_frame, columns=columns, show='headings', selectmode='browse')
+        for col, width in zip(columns, (220, 100)):
+            self.backups_tree.heading(col, text=col)
+            self.backups_tree.column(col, width=width, anchor=tk.W if col == 'Taken' else tk.E)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.backups_tree.yview)
+        self.backups_tree.configure(yscrollcommand=scrollbar.set)
+        self.backups_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        
+        buttons = ttk.Frame(window, padding="10")
+        buttons.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        ttk.Button(buttons, text="Back Up Now", command=self.backup_now).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(buttons, text="Restore", command=self.restore_selected_backup).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Close", command=self.close_backups).pack(side=tk.RIGHT)
+        
+        self.show_backups()
+    
+    def close_backups(self):
+        """Close the Backups window"""
+        self.backups_window.destroy()
+        self.backups_window = None
+    
+    def show_backups(self):
+        """List the snapshots in the Backups window, newest first"""
+        if self.backups_window is None:
+            return
+        self.backups_tree.delete(*self.backups_tree.get_children())
+        for path, taken, size in self.backups.backups():
+            self.backups_tree.insert('', tk.END, iid=path, values=(f"{taken:%Y-%m-%d %H:%M:%S}",
+                                                                   f"{size / 1024 / 1024:.1f} MB"))
+    
+    def backup_now(self):
+        """Take a snapshot on the backup thread"""
+        self.status_var.set("Backing up...")
+        self.backups.backup_now(self.show_backup_done, self.show_backup_error)
+    
+    def show_backup_done(self, path):
+        """Report a finished backup and list it"""
+        self.status_var.set(f"Backed up to {os.path.basename(path)}")
+        self.show_backups()
+    
+    def show_backup_error(self, error):
+        """Report a backup or restore that failed"""
+        self.status_var.set(f"Backup failed: {error}")
+        messagebox.showerror("Error", f"Backup failed: {str(error)}")
+    
+    def restore_selected_backup(self):
+        """Replace the logbook with the snapshot selected in the Backups window"""
+        selection = self.backups_tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select a backup to restore", parent=self.backups_window)
+            return
+        
+        path = selection[0]
+        if not messagebox.askyesno("Confirm", "Replace the logbook with this backup? A backup of the current "
+                                   "logbook is taken first.", parent=self.backups_window):
+            return
+        
+        self.status_var.set("Restoring...")
+        self.backups.restore(path, self.finish_restore, self.show_backup_error)
+    
+    def finish_restore(self, saved):
+        """Reload everything after a restore, upgrading the restored logbook if it is from an older version"""
+        self.seen_data_version = self.data_version()
+        self.flight_cache.clear()
+        self.reload_completions()
+        self.clear_form()
+        if self.needs_migration():
+            self.upgrade_logbook()
+        else:
+            self.search.load_index()
+            self.run_in_background(lambda store: store.search.load_index(), None, "reload the search index")
+        self.refresh_all()
+        self.show_backups()
+        self.status_var.set("Backup restored" + (f", the previous logbook is in {os.path.basename(saved)}"
+                                                 if saved else ""))
+    
     def on_select(self, event):
         """Handle treeview selection"""
         selection = self.tree.selection()
-        if selection:
-            item = self.tree.item(selection[0])
-            flight_id = item['values'][0]
-            self.load_flight_details(flight_id)
+        if len(selection) > 1:
+            self.status_var.set(f"{len(selection)} flights selected")
+        elif selection:
+            flight_id = int(selection[0])
+            # Re-rendering the window reselects the flight already in the form
+            if flight_id != self.selected_flight_id:
+                self.load_flight_details(flight_id)
     
     def load_flight_details(self, flight_id):
-        """Load flight details into form for editing"""
-        self.cursor.execute('SELECT * FROM flights WHERE id = ?', (flight_id,))
-        flight = self.cursor.fetchone()
+        """Load flight details into form for editing
+        
+        Cached flights are shown straight away. The flights either side of
+        the selection that aren't cached yet are read with it in one query,
+        so arrowing through the Flight Log mostly hits the cache.
+        """
+        flight = self.flight_cache.get(flight_id)
+        if flight is not None:
+            self.fill_form(flight)
+        
+        wanted = self.flight_cache.missing(self.neighbour_ids(flight_id))
+        if not wanted:
+            return
+        generation = self.flight_cache.generation
         
-        if flight:
-            self.selected_flight_id = flight_id
+        def loaded(flights):
+            self.flight_cache.put_many(flights, generation)
+            if flight is None:
+                self.fill_form(next((row for row in flights if row[0] == flight_id), None))
+        
+        self.run_in_background(lambda store: store.get_flights(wanted), loaded, "load flight", key='flight')
+    
+    def neighbour_ids(self, flight_id):
+        """Return flight_id and the ids of up to PREFETCH_ROWS flights either side of it in the Flight Log"""
+        items = self.tree.get_children()
+        if str(flight_id) not in items:
+            return [flight_id]
+        index = items.index(str(flight_id))
+        nearby = items[max(0, index - PREFETCH_ROWS):index + PREFETCH_ROWS + 1]
+        return [flight_id] + [int(item) for item in nearby if item != str(flight_id)]
+    
+    def fill_form(self, flight):
+        """Show a flight read by the database worker in the form"""
+        # Skip flights the user has moved away from while they were loading
+        if flight and self.tree.selection() == (str(flight[0]),):
+            self.selected_flight_id = flight[0]
             
             # Map database columns to form variables
             self.date_var.set(flight[1])
@@ -435,7 +1116,7 @@ class GliderLogbook:
             self.launch_method_var.set(flight[6])
             self.launch_site_var.set(flight[7])
             self.landing_site_var.set(flight[8] or '')
-            self.duration_var.set(flight[9] or '')
+            self.duration_var.set(self.minutes_to_time(flight[14]) if flight[14] is not None else flight[9] or '')
             self.altitude_var.set(flight[10] or '')
             self.distance_var.set(flight[11] or '')
             
@@ -443,42 +1124,57 @@ class GliderLogbook:
             self.notes_text.delete(1.0, tk.END)
             self.notes_text.insert(1.0, flight[12] or '')
     
+    def write_flight(self, action, flight_id, write, on_done):
+        """Change one flight on the database worker, then patch the Flight Log and reload the totals
+        
+        write(store) makes the change and returns a result, for a new flight
+        (flight_id None) its id. The job also reads whether the flight matched
+        the search on show before and after, and its autocomplete values from
+        before, so nothing waits on the database here. on_done is called with
+        the flight id, the result and those values. The buttons are disabled
+        until the write has finished.
+        """
+        criteria = self.shown_search()
+        sort = self.search.sort
+        
+        def job(store):
+            search = store.search_for(*criteria, sort) if criteria else None
+            was_listed = previous = None
+            if flight_id is not None:
+                was_listed = search is not None and search.matching_row(flight_id) is not None
+                previous = store.flight_fields(flight_id, COMPLETION_FIELDS)
+            result = write(store)
+            written_id = result if flight_id is None else flight_id
+            row = search.matching_row(written_id) if search else None
+            # Result sets cached on the worker are out of date now
+            store.search.invalidate()
+            return written_id, result, was_listed, row, previous
+        
+        def done(written):
+            written_id, result, was_listed, row, previous = written
+            self.set_buttons_enabled(True)
+            # This window's own write, not another terminal's
+            self.seen_data_version = self.data_version()
+            self.flight_cache.invalidate(written_id)
+            self.refresh_flight(written_id, was_listed, row, criteria, sort)
+            self.update_totals()
+            on_done(written_id, result, previous)
+        
+        self.set_buttons_enabled(False)
+        self.run_in_background(job, done, action, on_error=lambda e: self.set_buttons_enabled(True))
+    
     def add_flight(self):
         """Add a new flight to the database"""
         if not self.validate_form():
             return
+        flight = self.form_flight()
         
-        try:
-            notes = self.notes_text.get(1.0, tk.END).strip()
-            
-            self.cursor.execute('''
-                INSERT INTO flights (date, aircraft_type, aircraft_registration, pilot_in_command,
-                                   instructor, launch_method, launch_site, landing_site, flight_duration,
-                                   max_altitude, cross_country_distance, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                self.date_var.get(),
-                self.aircraft_type_var.get(),
-                self.registration_var.get(),
-                self.pilot_var.get(),
-                self.instructor_var.get() or None,
-                self.launch_method_var.get(),
-                self.launch_site_var.get(),
-                self.landing_site_var.get() or None,
-                self.duration_var.get() or None,
-                int(self.altitude_var.get()) if self.altitude_var.get() else None,
-                float(self.distance_var.get()) if self.distance_var.get() else None,
-                notes or None
-            ))
-            
-            self.conn.commit()
-            self.filter_data()
-            self.update_totals()
+        def added(flight_id, result, previous):
+            self.completions.add(flight, flight_id)
             self.clear_form()
             self.status_var.set("Flight added successfully")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to add flight: {str(e)}")
+        
+        self.write_flight("add flight", None, lambda store: store.create_flight(flight), added)
     
     def update_flight(self):
         """Update selected flight in the database"""
@@ -488,56 +1184,139 @@ class GliderLogbook:
         
         if not self.validate_form():
             return
+        flight_id = self.selected_flight_id
+        flight = self.form_flight()
         
-        try:
-            notes = self.notes_text.get(1.0, tk.END).strip()
-            
-            self.cursor.execute('''
-                UPDATE flights SET date=?, aircraft_type=?, aircraft_registration=?, pilot_in_command=?,
-                                 instructor=?, launch_method=?, launch_site=?, landing_site=?, flight_duration=?,
-                                 max_altitude=?, cross_country_distance=?, notes=?
-                WHERE id=?
-            ''', (
-                self.date_var.get(),
-                self.aircraft_type_var.get(),
-                self.registration_var.get(),
-                self.pilot_var.get(),
-                self.instructor_var.get() or None,
-                self.launch_method_var.get(),
-                self.launch_site_var.get(),
-                self.landing_site_var.get() or None,
-                self.duration_var.get() or None,
-                int(self.altitude_var.get()) if self.altitude_var.get() else None,
-                float(self.distance_var.get()) if self.distance_var.get() else None,
-                notes or None,
-                self.selected_flight_id
-            ))
-            
-            self.conn.commit()
-            self.filter_data()
-            self.update_totals()
+        def updated(flight_id, result, previous):
+            if previous:
+                self.completions.remove(previous)
+            self.completions.add(flight, flight_id)
             self.clear_form()
             self.status_var.set("Flight updated successfully")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update flight: {str(e)}")
+        
+        self.write_flight("update flight", flight_id, lambda store: store.save_flight(flight_id, flight), updated)
     
     def delete_flight(self):
         """Delete selected flight from the database"""
+        if len(self.tree.selection()) > 1:
+            self.delete_selected_flights()
+            return
+        
         if not self.selected_flight_id:
             messagebox.showwarning("Warning", "Please select a flight to delete")
             return
         
         if messagebox.askyesno("Confirm", "Are you sure you want to delete this flight?"):
-            try:
-                self.cursor.execute('DELETE FROM flights WHERE id = ?', (self.selected_flight_id,))
-                self.conn.commit()
-                self.filter_data()
-                self.update_totals()
+            flight_id = self.selected_flight_id
+            
+            def deleted(flight_id, result, previous):
+                if previous:
+                    self.completions.remove(previous)
                 self.clear_form()
                 self.status_var.set("Flight deleted successfully")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete flight: {str(e)}")
+            
+            self.write_flight("delete flight", flight_id, lambda store: store.remove_flight(flight_id), deleted)
+    
+    def delete_selected_flights(self):
+        """Delete every selected flight in one transaction"""
+        flight_ids = [int(item) for item in self.tree.selection()]
+        if not messagebox.askyesno("Confirm", f"Are you sure you want to delete these {len(flight_ids)} flights?"):
+            return
+        
+        def deleted(count):
+            self.clear_form()
+            self.finish_bulk_write(f"Deleted {count} flights")
+        
+        self.set_buttons_enabled(False)
+        self.run_in_background(lambda store: store.remove_flights(flight_ids), deleted, "delete flights",
+                               on_error=lambda e: self.set_buttons_enabled(True))
+    
+    def finish_bulk_write(self, status):
+        """Re-enable editing and show everything afresh after the worker changed many flights at once"""
+        self.set_buttons_enabled(True)
+        # This window's own write, not another terminal's
+        self.seen_data_version = self.data_version()
+        self.flight_cache.clear()
+        self.refresh_all()
+        self.status_var.set(status)
+    
+    def open_bulk_edit(self):
+        """Ask for a field and value to set on the selected flights or on every flight matching the search"""
+        selected = [int(item) for item in self.tree.selection()]
+        
+        window = tk.Toplevel(self.root)
+        window.title("Bulk Edit")
+        window.transient(self.root)
+        window.resizable(False, False)
+        frame = ttk.Frame(window, padding="10")
+        frame.grid(row=0, column=0)
+        
+        ttk.Label(frame, text="Set:").grid(row=0, column=0, sticky=tk.W, pady=2)
+        field_var = tk.StringVar(value=next(iter(BULK_EDIT_FIELDS)))
+        ttk.Combobox(frame, textvariable=field_var, state='readonly', width=18,
+                     values=tuple(BULK_EDIT_FIELDS)).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(5, 0), pady=2)
+        ttk.Label(frame, text="To:").grid(row=1, column=0, sticky=tk.W, pady=2)
+        value_var = tk.StringVar()
+        value_entry = ttk.Entry(frame, textvariable=value_var, width=30)
+        value_entry.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(5, 0), pady=2)
+        
+        scope_var = tk.StringVar(value='selected' if selected else 'search')
+        selected_button = ttk.Radiobutton(frame, text=f"Selected flights ({len(selected)})", variable=scope_var,
+                                          value='selected')
+        selected_button.grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(8, 0))
+        if not selected:
+            selected_button.state(['disabled'])
+        ttk.Radiobutton(frame, text=f"All {self.view_total} flights matching the search", variable=scope_var,
+                        value='search').grid(row=3, column=0, columnspan=2, sticky=tk.W)
+        
+        def apply():
+            field, value = field_var.get(), value_var.get()
+            criteria = self.shown_search()
+            if scope_var.get() == 'search':
+                if criteria is None:
+                    messagebox.showinfo("Bulk Edit", "Wait for the flight list to finish refreshing", parent=window)
+                    return
+                flight_ids = None
+                count = self.view_total
+            else:
+                flight_ids = selected
+                count = len(selected)
+                criteria = ()
+            if not messagebox.askyesno("Confirm", f"Set {field} to \"{value.strip()}\" on {count} flights?",
+                                       parent=window):
+                return
+            
+            def changed(count):
+                if window.winfo_exists():
+                    window.destroy()
+                self.clear_form()
+                self.finish_bulk_write(f"Set {field} on {count} flights")
+            
+            def failed(e):
+                self.set_buttons_enabled(True)
+                if window.winfo_exists():
+                    apply_button.state(['!disabled'])
+            
+            # The dialog stays open, without Apply, until the update has finished
+            apply_button.state(['disabled'])
+            self.set_buttons_enabled(False)
+            self.run_in_background(lambda store: store.set_field(field, value, flight_ids, *criteria), changed,
+                                   "update flights", on_error=failed)
+        
+        buttons = ttk.Frame(frame)
+        buttons.grid(row=4, column=0, columnspan=2, sticky=tk.E, pady=(10, 0))
+        apply_button = ttk.Button(buttons, text="Apply", command=apply)
+        apply_button.pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(buttons, text="Cancel", command=window.destroy).pack(side=tk.LEFT)
+        value_entry.focus_set()
+    
+    def refresh_all(self):
+        """Run the search, totals and autocomplete values again after a change to many flights at once"""
+        self.invalidate_search()
+        self.reload_completions()
+        self.filter_data()
+        self.update_totals()
+        self.show_timings()
     
     def clear_form(self):
         """Clear all form fields"""
@@ -554,66 +1333,227 @@ class GliderLogbook:
         self.distance_var.set('')
         self.notes_text.delete(1.0, tk.END)
         self.selected_flight_id = None
+        self.tree.selection_remove(*self.tree.selection())
+    
+    def form_flight(self):
+        """Collect the form fields into a flight dict"""
+        return {
+            'date': self.date_var.get(),
+            'aircraft_type': self.aircraft_type_var.get(),
+            'aircraft_registration': self.registration_var.get(),
+            'pilot_in_command': self.pilot_var.get(),
+            'instructor': self.instructor_var.get(),
+            'launch_method': self.launch_method_var.get(),
+            'launch_site': self.launch_site_var.get(),
+            'landing_site': self.landing_site_var.get(),
+            'flight_duration': self.duration_var.get(),
+            'max_altitude': self.altitude_var.get(),
+            'cross_country_distance': self.distance_var.get(),
+            'notes': self.notes_text.get(1.0, tk.END).strip()
+        }
     
     def validate_form(self):
         """Validate form input"""
-        if not self.date_var.get():
-            messagebox.showerror("Error", "Date is required")
+        error = self.validate_flight(self.form_flight())
+        if error:
+            messagebox.showerror("Error", error)
             return False
         
-        if not self.aircraft_type_var.get():
-            messagebox.showerror("Error", "Aircraft type is required")
-            return False
+        return True
+    
+    def import_flights(self):
+        """Import flights from a CSV file or columnar export chosen by the user, on the database worker
+        
+        Cancel stops the import after the batch it is on; the batches
+        already imported are kept.
+        """
+        path = filedialog.askopenfilename(title="Import Flights",
+                                          filetypes=[("CSV files", "*.csv"), ("Columnar exports", "*.glbc"),
+                                                     ("All files", "*.*")])
+        if not path:
+            return
         
-        if not self.registration_var.get():
-            messagebox.showerror("Error", "Aircraft registration is required")
-            return False
+        def show_progress(count):
+            if self.cancellable is not None:
+                self.status_var.set(f"Importing... {count} flights")
+        
+        def load(store):
+            def progress(count):
+                self.worker.check_cancelled()
+                self.worker.post(show_progress, count)
+            return store.import_file(path, progress=progress)
+        
+        def imported(result):
+            imported, errors = result
+            self.finish_bulk_write(f"Imported {imported} flights")
+            if errors:
+                details = "\n".join(f"Line {line}: {message}" for line, message in errors[:IMPORT_ERRORS_SHOWN])
+                if len(errors) > IMPORT_ERRORS_SHOWN:
+                    details += f"\n... and {len(errors) - IMPORT_ERRORS_SHOWN} more"
+                messagebox.showwarning("Import", f"Imported {imported} flights, skipped {len(errors)} rows:\n\n{details}")
+            else:
+                messagebox.showinfo("Import", f"Imported {imported} flights")
         
-        if not self.pilot_var.get():
-            messagebox.showerror("Error", "Pilot in command is required")
-            return False
+        self.status_var.set("Importing...")
+        self.run_cancellable(load, imported, "import flights", 'import',
+                             lambda: self.finish_bulk_write("Import cancelled, the flights imported so far are kept"))
+    
+    def attach_igc(self):
+        """Attach an IGC logger file to the selected flight and fill in its duration, max altitude and distance"""
+        if not self.selected_flight_id:
+            messagebox.showwarning("Warning", "Please select a flight to attach a logger file to")
+            return
         
-        if not self.launch_method_var.get():
-            messagebox.showerror("Error", "Launch method is required")
-            return False
+        path = filedialog.askopenfilename(title="Attach IGC File",
+                                          filetypes=[("IGC files", "*.igc *.IGC"), ("All files", "*.*")])
+        if not path:
+            return
         
-        if not self.launch_site_var.get():
-            messagebox.showerror("Error", "Launch site is required")
-            return False
+        flight_id = self.selected_flight_id
         
-        # Validate duration format
-        if self.duration_var.get() and not self.validate_time_format(self.duration_var.get()):
-            messagebox.showerror("Error", "Duration must be in H:MM format (e.g., 1:30)")
-            return False
+        def attached(flight_id, summary, previous):
+            # Show the derived values in the form
+            self.selected_flight_id = None
+            self.load_flight_details(flight_id)
+            
+            if summary['free_distance_km'] is not None:
+                self.status_var.set(f"Attached {os.path.basename(path)}: {summary['takeoff_time']}-"
+                                    f"{summary['landing_time']} UTC, {summary['max_altitude_m']} m max, "
+                                    f"{summary['free_distance_km']:.1f} km free distance")
+            elif summary['takeoff_time']:
+                self.status_var.set(f"Attached {os.path.basename(path)}: {summary['takeoff_time']}-"
+                                    f"{summary['landing_time']} UTC, {summary['max_altitude_m']} m max, "
+                                    f"{summary['distance_km']:.1f} km takeoff to landing")
+            else:
+                self.status_var.set(f"Attached {os.path.basename(path)}: no takeoff found, duration left as entered")
         
-        # Validate altitude if provided
-        if self.altitude_var.get():
-            try:
-                int(self.altitude_var.get())
-            except ValueError:
-                messagebox.showerror("Error", "Max altitude must be a number")
-                return False
+        # Reading, summarizing and scoring the track all happen on the worker
+        self.status_var.set(f"Attaching {os.path.basename(path)}...")
+        self.write_flight("attach logger file", flight_id, lambda store: store.attach_track(flight_id, path),
+                          attached)
+    
+    def export_view(self):
+        """Export the flights matching the current search to a file chosen by the user, on the database worker
+        
+        Cancel stops the export after the chunk it is on and deletes the
+        unfinished file.
+        """
+        criteria = self.shown_search()
+        if criteria is None:
+            messagebox.showinfo("Export", "Wait for the flight list to finish refreshing")
+            return
+        search_term, filter_category, date_range = criteria
         
-        # Validate distance if provided
-        if self.distance_var.get():
-            try:
-                float(self.distance_var.get())
-            except ValueError:
-                messagebox.showerror("Error", "Cross country distance must be a number")
-                return False
+        path = filedialog.asksaveasfilename(title="Export Flights", defaultextension=".csv",
+                                            filetypes=[("CSV files", "*.csv"), ("JSON Lines", "*.jsonl"),
+                                                       ("Columnar exports", "*.glbc")])
+        if not path:
+            return
         
-        return True
+        def show_progress(count):
+            if self.cancellable is not None:
+                self.status_var.set(f"Exporting... {count} flights")
+        
+        def export(store):
+            def progress(count):
+                self.worker.check_cancelled()
+                self.worker.post(show_progress, count)
+            try:
+                return store.export_flights(path, search_term=search_term, filter_category=filter_category,
+                                            progress=progress, date_range=date_range)
+            except JobCancelled:
+                os.remove(path)
+                raise
+        
+        def exported(count):
+            self.set_buttons_enabled(True)
+            self.status_var.set(f"Exported {count} flights to {os.path.basename(path)}")
+        
+        def cancelled():
+            self.set_buttons_enabled(True)
+            self.status_var.set("Export cancelled")
+        
+        self.status_var.set("Exporting...")
+        self.run_cancellable(export, exported, "export flights", 'export', cancelled)
+    
+    def toggle_timings(self, shown=None):
+        """Switch query tracing and the timings overlay on or off"""
+        if shown is not None:
+            self.timings_shown_var.set(shown)
+        self.trace.enabled = self.timings_shown_var.get()
+        if self.trace.enabled:
+            self.timings_label.grid()
+            self.save_trace_button.grid()
+        else:
+            self.timings_label.grid_remove()
+            self.save_trace_button.grid_remove()
     
-    def __del__(self):
-        """Close database connection"""
-        if hasattr(self, 'conn'):
-            self.conn.close()
+    def show_timings(self):
+        """Show the timings of the last traced operation in the overlay"""
+        operation = self.trace.last_operation
+        if operation is None:
+            return
+        self.timings_var.set(f"{operation['operation'].capitalize()}: {operation['statements']} queries, "
+                             f"{operation['rows']} rows, SQL {operation['sql_ms']:.1f} ms, "
+                             f"Tk {operation['tk_ms']:.1f} ms, total {operation['wall_ms']:.1f} ms")
+    
+    def save_trace(self):
+        """Write the rolling query trace to a JSON file chosen by the user, e.g. for a bug report"""
+        path = filedialog.asksaveasfilename(title="Save Trace", defaultextension=".json",
+                                            filetypes=[("JSON files", "*.json")])
+        if not path:
+            return
+        
+        try:
+            saved = self.trace.export(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save trace: {str(e)}")
+            return
+        
+        self.status_var.set(f"Saved {saved} trace entries to {os.path.basename(path)}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Glider Pilot Logbook")
+    parser.add_argument('--check-query-plans', nargs='?', const=':memory:', metavar='DATABASE',
+                        help="check that every search query uses an index (default: an empty in-memory logbook)")
+    parser.add_argument('--import', dest='import_path', metavar='FILE',
+                        help="import flights from a CSV file or columnar export without opening the window")
+    parser.add_argument('--export', dest='export_path', metavar='FILE',
+                        help="export flights to a .csv, .jsonl or .glbc file without opening the window")
+    parser.add_argument('--format', choices=sorted(set(EXPORT_FORMATS.values())),
+                        help="export format (default: from the file extension)")
+    parser.add_argument('--search', default='', metavar='TERM',
+                        help="only export flights matching TERM")
+    parser.add_argument('--filter', default='All', choices=['All'] + list(FILTER_COLUMNS),
+                        help="field searched by --search (default: All)")
+    parser.add_argument('--database', default='glider_logbook.db',
+                        help="logbook database to open (default: glider_logbook.db)")
+    parser.add_argument('--profile', default='standard', choices=list(STORAGE_PROFILES),
+                        help="storage profile; use club when several terminals share the logbook (default: standard)")
+    parser.add_argument('--backup-dir', metavar='DIR',
+                        help="where backups are kept (default: a backups folder next to the logbook)")
+    parser.add_argument('--backup-keep', type=int, default=BACKUP_KEEP,
+                        help=f"backups to keep, deleting older ones (default: {BACKUP_KEEP})")
+    parser.add_argument('--backup-interval', type=int, default=BACKUP_INTERVAL_MINUTES, metavar='MINUTES',
+                        help=f"minutes between automatic backups, 0 for none (default: {BACKUP_INTERVAL_MINUTES})")
+    parser.add_argument('--trace', action='store_true',
+                        help="record the timings of every query from startup (same as ticking Timings)")
+    args = parser.parse_args()
+    
+    # Kept for existing scripts, logbook_cli.py does the same without loading tkinter
+    if args.export_path:
+        sys.exit(logbook_cli.run_export(args.database, args.export_path, args.format, args.search, args.filter,
+                                        args.profile))
+    if args.import_path:
+        sys.exit(logbook_cli.run_import(args.database, args.import_path, args.profile))
+    if args.check_query_plans:
+        sys.exit(logbook_cli.run_check_query_plans(args.check_query_plans))
+    
     root = tk.Tk()
-    app = GliderLogbook(root)
+    app = GliderLogbook(root, args.database, args.profile, args.trace, args.backup_dir, args.backup_keep,
+                        args.backup_interval)
     root.mainloop()
 
 if __name__ == "__main__":
-
+    
     main()
@@ -0,0 +1,129 @@
+"""Tests for online backups, snapshot rotation and restores"""
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from logbook_backup import (BackupService, backup_logbook, changed_since_backup, list_backups, quick_check,
+                            restore_backup)
+from logbook_store import LogbookStore
+
+def flight(site='Lasham'):
+    """Return a valid flight dict"""
+    return {
+        'date': '2024-06-01',
+        'aircraft_type': 'ASK 21',
+        'aircraft_registration': 'G-CABC',
+        'pilot_in_command': 'A. Baker',
+        'launch_method': 'Winch',
+        'launch_site': site,
+        'flight_duration': '0:10',
+    }
+
+def flight_count(path):
+    """Number of flights in a logbook or snapshot"""
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM flights').fetchone()[0]
+    finally:
+        conn.close()
+
+class BackupTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'logbook.db')
+        self.backup_dir = os.path.join(self.directory.name, 'backups')
+        self.logbook = LogbookStore(self.path)
+        self.logbook.import_flight_rows(enumerate([flight()] * 3, 1))
+    
+    def tearDown(self):
+        self.logbook.conn.close()
+        self.directory.cleanup()
+    
+    def backup(self, keep=3):
+        return backup_logbook(self.path, self.backup_dir, keep=keep, pause=0)
+    
+    def test_backup_is_checked_snapshot(self):
+        snapshot = self.backup()
+        self.assertEqual(os.path.dirname(snapshot), self.backup_dir)
+        self.assertEqual(quick_check(snapshot), [])
+        self.assertEqual(flight_count(snapshot), 3)
+        self.assertEqual([path for path, _, _ in list_backups(self.path, self.backup_dir)], [snapshot])
+        self.assertFalse([name for name in os.listdir(self.backup_dir) if name.endswith('.partial')])
+    
+    def test_backup_leaves_out_uncommitted_writes(self):
+        self.logbook.cursor.execute('BEGIN IMMEDIATE')
+        self.logbook.cursor.execute("DELETE FROM flights")
+        try:
+            self.assertEqual(flight_count(self.backup()), 3)
+        finally:
+            self.logbook.conn.rollback()
+    
+    def test_rotation_keeps_newest(self):
+        # Mostly taken within one second, and so told apart by their numbers
+        snapshots = [self.backup() for _ in range(5)]
+        self.assertEqual(len(set(snapshots)), 5)
+        self.assertEqual([path for path, _, _ in list_backups(self.path, self.backup_dir)], snapshots[:1:-1])
+        
+        self.backup(keep=None)
+        self.assertEqual(len(list_backups(self.path, self.backup_dir)), 4)
+    
+    def test_restore(self):
+        snapshot = self.backup(keep=1)
+        self.logbook.create_flight(flight('Dunstable'))
+        
+        saved = restore_backup(snapshot, self.path, self.backup_dir, keep=1)
+        self.assertEqual(flight_count(self.path), 3)
+        self.assertEqual(flight_count(saved), 4)
+        # Neither the restored snapshot nor the one taken beforehand is pruned
+        self.assertEqual({path for path, _, _ in list_backups(self.path, self.backup_dir)}, {snapshot, saved})
+        
+        # The store sees the restored contents, including its totals
+        self.assertEqual(self.logbook.totals(), (3, 30, 0.0))
+    
+    def test_restore_refuses_damaged_snapshot(self):
+        damaged = os.path.join(self.directory.name, 'damaged.db')
+        with open(damaged, 'wb') as snapshot:
+            snapshot.write(b'SQLite format 3\0' + b'\xff' * 1000)
+        
+        self.assertTrue(quick_check(damaged))
+        with self.assertRaises(ValueError):
+            restore_backup(damaged, self.path, self.backup_dir)
+        self.assertEqual(flight_count(self.path), 3)
+        self.assertEqual(list_backups(self.path, self.backup_dir), [])
+    
+    def test_changed_since_backup(self):
+        self.assertTrue(changed_since_backup(self.path, self.backup_dir))
+        # File times are set around the snapshot's timestamp, which has whole seconds
+        self.logbook.conn.close()
+        long_ago = time.time() - 3600
+        for path in (self.path, self.path + '-wal'):
+            if os.path.exists(path):
+                os.utime(path, (long_ago, long_ago))
+        self.backup()
+        self.assertFalse(changed_since_backup(self.path, self.backup_dir))
+        
+        later = time.time() + 2
+        os.utime(self.path, (later, later))
+        self.assertTrue(changed_since_backup(self.path, self.backup_dir))
+        self.logbook = LogbookStore(self.path)
+
+class BackupServiceTest(unittest.TestCase):
+    def test_backup_and_restore_requests(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'logbook.db')
+            LogbookStore(path).conn.close()
+            service = BackupService(path, interval_minutes=None)
+            results = []
+            service.backup_now(results.append)
+            service.restore(os.path.join(directory, 'missing.db'), on_error=results.append)
+            service.stop()
+            service.thread.join()
+            service.deliver_results()
+            
+            snapshot, error = results
+            self.assertEqual([backup[0] for backup in service.backups()], [snapshot])
+            self.assertIsInstance(error, sqlite3.Error)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Tests for bulk delete and bulk set-field"""
+import unittest
+from logbook_store import LogbookStore
+
+def flight(registration, pilot, launch_site='Lasham', duration='0:10'):
+    """Return a valid flight dict"""
+    return {
+        'date': '2024-06-15',
+        'aircraft_type': 'ASK 21',
+        'aircraft_registration': registration,
+        'pilot_in_command': pilot,
+        'launch_method': 'Winch',
+        'launch_site': launch_site,
+        'flight_duration': duration,
+    }
+
+class BulkWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.logbook = LogbookStore(':memory:')
+        flights = [flight('G-CABC', 'A. Baker'), flight('G-CXYZ', 'B. Clarke', duration='1:00'),
+                   flight('G-DXYA', 'C. Davies', 'Dunstable'), flight('G-EFGH', 'D. Evans', 'Dunstable')]
+        self.logbook.import_flight_rows(enumerate(flights, 1))
+    
+    def assertConsistent(self):
+        """Check the trigger-maintained totals and statistics match the flights"""
+        previous, rebuilt = self.logbook.rebuild_totals()
+        self.assertEqual(previous, rebuilt)
+        self.assertEqual(self.logbook.rebuild_statistics(), [])
+    
+    def test_remove_flights(self):
+        self.assertEqual(self.logbook.remove_flights([2, 3, 99]), 2)
+        self.assertEqual([row[0] for row in self.logbook.get_flights([1, 2, 3, 4])], [1, 4])
+        self.assertEqual(self.logbook.totals()[:2], (2, 20))
+        self.assertConsistent()
+    
+    def test_set_field_on_search(self):
+        self.assertEqual(self.logbook.completions.suggest('launch_site', 'c'), [])
+        changed = self.logbook.set_field('Launch Site', ' Challock ', search_term='dun', filter_category='Launch Site')
+        self.assertEqual(changed, 2)
+        self.assertEqual(self.logbook.find_flights('challock', 'Launch Site')[0], 2)
+        self.assertEqual(self.logbook.find_flights('lasham', 'Launch Site')[0], 2)
+        self.assertEqual(dict((row[0], row[1]) for row in self.logbook.statistics('Launch Site')),
+                         {'Challock': 2, 'Lasham': 2})
+        self.assertEqual(self.logbook.completions.suggest('launch_site', 'c'), ['Challock'])
+        self.assertConsistent()
+    
+    def test_set_field_on_selection(self):
+        self.assertEqual(self.logbook.set_field('Pilot', 'E. Fox', [1, 4]), 2)
+        self.assertEqual(self.logbook.currency('e. fox', today='2024-06-20')[90], (2, 20))
+        self.assertConsistent()
+    
+    def test_set_required_field_empty(self):
+        with self.assertRaises(ValueError):
+            self.logbook.set_field('Pilot', '  ', [1])
+        with self.assertRaises(ValueError):
+            self.logbook.set_field('Date', '2024-06-16', [1])
+        self.assertEqual(self.logbook.get_flight(1)[4], 'A. Baker')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+"""Tests for sharing one logbook between terminals: the club profile and write retries"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from logbook_store import WRITE_RETRIES, WRITE_RETRY_DELAY, LogbookStore
+
+def flight(site='Lasham'):
+    """Return a valid flight dict"""
+    return {
+        'date': '2024-06-01',
+        'aircraft_type': 'ASK 21',
+        'aircraft_registration': 'G-CABC',
+        'pilot_in_command': 'A. Baker',
+        'launch_method': 'Winch',
+        'launch_site': site,
+        'flight_duration': '0:10',
+    }
+
+class WriteRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'logbook.db')
+        self.logbook = LogbookStore(self.path, profile='club')
+    
+    def tearDown(self):
+        self.logbook.conn.close()
+        self.directory.cleanup()
+    
+    def failing_write(self, errors, result='written'):
+        """Return a write that raises each of errors in turn, then returns result"""
+        errors = list(errors)
+        
+        def write():
+            if errors:
+                raise errors.pop(0)
+            return result
+        
+        return write
+    
+    def test_retries_while_locked(self):
+        write = self.failing_write([sqlite3.OperationalError('database is locked'),
+                                    sqlite3.OperationalError('database is busy')])
+        with mock.patch('logbook_store.time.sleep') as sleep:
+            self.assertEqual(self.logbook.write_with_retry(write), 'written')
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [WRITE_RETRY_DELAY, WRITE_RETRY_DELAY * 2])
+    
+    def test_gives_up_after_last_attempt(self):
+        write = self.failing_write([sqlite3.OperationalError('database is locked')] * WRITE_RETRIES)
+        with mock.patch('logbook_store.time.sleep') as sleep:
+            with self.assertRaises(sqlite3.OperationalError):
+                self.logbook.write_with_retry(write)
+        self.assertEqual(sleep.call_count, WRITE_RETRIES - 1)
+    
+    def test_other_errors_are_not_retried(self):
+        write = self.failing_write([sqlite3.OperationalError('no such table: flights_old')])
+        with mock.patch('logbook_store.time.sleep') as sleep:
+            with self.assertRaises(sqlite3.OperationalError):
+                self.logbook.write_with_retry(write)
+        sleep.assert_not_called()
+    
+    def test_save_waits_for_other_terminal(self):
+        # Without a busy timeout the save is refused at once, and the other
+        # terminal finishes its write while the store backs off
+        self.logbook.cursor.execute('PRAGMA busy_timeout = 0')
+        other = LogbookStore(self.path, profile='club')
+        other.cursor.execute('BEGIN IMMEDIATE')
+        other.cursor.execute(other.INSERT_FLIGHT_SQL, other.flight_values(flight('Dunstable')))
+        
+        try:
+            with mock.patch('logbook_store.time.sleep', side_effect=lambda delay: other.conn.commit()) as sleep:
+                flight_id = self.logbook.create_flight(flight())
+            self.assertEqual(sleep.call_count, 1)
+        finally:
+            other.conn.close()
+        
+        self.assertEqual(flight_id, 2)
+        self.assertEqual(self.logbook.totals(), (2, 20, 0.0))
+        self.assertEqual(self.logbook.rebuild_totals()[0], (2, 20, 0.0))
+
+class ClubProfileTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'logbook.db')
+        self.logbook = LogbookStore(self.path, profile='club')
+        self.logbook.create_flight(flight())
+        self.other = LogbookStore(self.path, profile='club')
+    
+    def tearDown(self):
+        self.other.conn.close()
+        self.logbook.conn.close()
+        self.directory.cleanup()
+    
+    def test_logbook_is_in_wal_mode(self):
+        self.logbook.cursor.execute('PRAGMA journal_mode')
+        self.assertEqual(self.logbook.cursor.fetchone()[0], 'wal')
+    
+    def test_readers_do_not_wait_for_writer(self):
+        self.other.cursor.execute('PRAGMA busy_timeout = 0')
+        self.logbook.cursor.execute('BEGIN IMMEDIATE')
+        self.logbook.cursor.execute('DELETE FROM flights')
+        try:
+            self.assertEqual(self.other.find_flights()[0], 1)
+            self.assertEqual(self.other.totals(), (1, 10, 0.0))
+        finally:
+            self.logbook.conn.rollback()
+    
+    def test_other_terminal_commits_change_data_version(self):
+        version = self.logbook.data_version()
+        self.logbook.create_flight(flight())
+        self.assertEqual(self.logbook.data_version(), version)
+        
+        self.other.create_flight(flight('Dunstable'))
+        self.assertNotEqual(self.logbook.data_version(), version)
+        self.assertEqual(self.logbook.totals(), (3, 30, 0.0))
+
+if __name__ == '__main__':
+    unittest.main()
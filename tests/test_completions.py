@@ -0,0 +1,80 @@
+"""Tests for the autocomplete index of the free-text flight fields"""
+import os
+import tempfile
+import unittest
+from logbook_store import COMPLETION_HALF_LIFE, CompletionIndex, LogbookStore
+
+def flight(flight_date, site='Lasham', pilot='A. Baker'):
+    """Return a valid flight dict"""
+    return {
+        'date': flight_date,
+        'aircraft_type': 'ASK 21',
+        'aircraft_registration': 'G-CABC',
+        'pilot_in_command': pilot,
+        'launch_method': 'Winch',
+        'launch_site': site,
+        'flight_duration': '0:10',
+    }
+
+class CompletionWeightTest(unittest.TestCase):
+    def test_weight_halves_each_half_life(self):
+        self.assertEqual(CompletionIndex.weight((4, 1000), 1000), 4)
+        self.assertAlmostEqual(CompletionIndex.weight((4, 1000 - COMPLETION_HALF_LIFE), 1000), 2)
+        self.assertAlmostEqual(CompletionIndex.weight((4, 1000 - 2 * COMPLETION_HALF_LIFE), 1000), 1)
+
+class CompletionIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'logbook.db')
+        self.logbook = LogbookStore(self.path)
+        flights = [flight('2024-06-01', 'Lasham'), flight('2024-06-02', 'Lasham'), flight('2024-06-03', 'Lleweni Parc'),
+                   flight('2024-06-04', 'Long Mynd', 'C. Davies')]
+        self.logbook.import_flight_rows(enumerate(flights, 1))
+        self.completions = self.logbook.completions
+    
+    def tearDown(self):
+        self.logbook.conn.close()
+        self.directory.cleanup()
+    
+    def test_suggest_matches_prefix_ignoring_case(self):
+        self.assertEqual(self.completions.suggest('launch_site', 'l'), ['Lasham', 'Long Mynd', 'Lleweni Parc'])
+        self.assertEqual(self.completions.suggest('launch_site', 'LL'), ['Lleweni Parc'])
+        self.assertEqual(self.completions.suggest('launch_site', 'x'), [])
+        self.assertEqual(self.completions.suggest('launch_site', ''), [])
+        self.assertEqual(self.completions.suggest('launch_site', 'l', limit=1), ['Lasham'])
+    
+    def test_recent_use_outranks_older_use(self):
+        # Twice the uses, but a half-life older, ties; any older loses
+        _, uses = self.completions.field('launch_site')
+        uses['Lasham'] = [2, 1000 - COMPLETION_HALF_LIFE - 1]
+        uses['Long Mynd'] = [1, 1000]
+        self.assertEqual(self.completions.suggest('launch_site', 'l')[0], 'Long Mynd')
+    
+    def test_writes_update_read_fields(self):
+        self.completions.field('launch_site')
+        flight_id = self.logbook.create_flight(flight('2024-06-05', 'Lyveden'))
+        self.assertIn('Lyveden', self.completions.values('launch_site'))
+        
+        self.logbook.save_flight(flight_id, flight('2024-06-05', 'Lasham'))
+        self.assertNotIn('Lyveden', self.completions.values('launch_site'))
+        self.assertEqual(self.completions.field('launch_site')[1]['Lasham'][0], 3)
+        
+        self.logbook.remove_flight(flight_id)
+        # Counts match a fresh read; the last use isn't wound back
+        _, uses = self.completions.field('launch_site')
+        _, fresh = self.completions.read_field('launch_site')
+        self.assertEqual({value: use[0] for value, use in uses.items()}, {value: use[0] for value, use in fresh.items()})
+        self.assertEqual(uses['Lasham'], [2, flight_id])
+    
+    def test_adopt_drops_read_missing_a_change(self):
+        generation = self.completions.generation
+        fields = self.completions.read()
+        self.completions.add(flight('2024-06-05', 'Lyveden'), 5)
+        self.assertFalse(self.completions.adopt(fields, generation))
+        
+        generation = self.completions.generation
+        self.assertTrue(self.completions.adopt(self.completions.read(), generation))
+        self.assertEqual(self.completions.values('pilot_in_command'), ['A. Baker', 'C. Davies'])
+
+if __name__ == '__main__':
+    unittest.main()
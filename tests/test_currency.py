@@ -0,0 +1,63 @@
+"""Tests for the rolling-window currency index"""
+import os
+import tempfile
+import unittest
+from logbook_store import LogbookStore
+
+def flight(flight_date, pilot='A. Baker', duration='0:10'):
+    """Return a valid flight dict"""
+    return {
+        'date': flight_date,
+        'aircraft_type': 'ASK 21',
+        'aircraft_registration': 'G-CABC',
+        'pilot_in_command': pilot,
+        'launch_method': 'Winch',
+        'launch_site': 'Lasham',
+        'flight_duration': duration,
+    }
+
+class CurrencyReloadTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'logbook.db')
+        self.logbook = LogbookStore(self.path)
+        self.logbook.import_flight_rows(enumerate([flight('2024-06-01'), flight('2024-06-10', 'C. Davies')], 1))
+        
+        self.loads = 0
+        index = self.logbook.currency_index
+        load = index.load
+        
+        def counted_load(cursor):
+            self.loads += 1
+            load(cursor)
+        
+        index.load = counted_load
+    
+    def tearDown(self):
+        self.logbook.conn.close()
+        self.directory.cleanup()
+    
+    def test_local_write_does_not_reload(self):
+        self.assertEqual(self.logbook.currency('A. Baker', today='2024-06-15')[90], (1, 10))
+        self.assertEqual(self.loads, 1)
+        
+        flight_id = self.logbook.create_flight(flight('2024-06-12', duration='1:00'))
+        self.assertTrue(self.logbook.currency_index.is_current())
+        self.assertEqual(self.logbook.currency('A. Baker', today='2024-06-15')[90], (2, 70))
+        
+        self.logbook.remove_flight(flight_id)
+        self.assertEqual(self.logbook.currency('A. Baker', today='2024-06-15')[90], (1, 10))
+        self.assertEqual(self.loads, 1)
+    
+    def test_other_connection_write_reloads(self):
+        self.logbook.currency(today='2024-06-15')
+        other = LogbookStore(self.path)
+        other.create_flight(flight('2024-06-12'))
+        other.conn.close()
+        
+        self.assertFalse(self.logbook.currency_index.is_current())
+        self.assertEqual(self.logbook.currency(today='2024-06-15')[90], (3, 30))
+        self.assertEqual(self.loads, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Tests for normalized flight dates, date-range filtering and the year and month statistics"""
+import os
+import tempfile
+import unittest
+from logbook_store import LogbookStore, julian_day, normalize_date, parse_date_range
+
+def flight(flight_date, duration='0:10'):
+    """Return a valid flight dict"""
+    return {
+        'date': flight_date,
+        'aircraft_type': 'ASK 21',
+        'aircraft_registration': 'G-CABC',
+        'pilot_in_command': 'A. Baker',
+        'launch_method': 'Winch',
+        'launch_site': 'Lasham',
+        'flight_duration': duration,
+    }
+
+class DateParsingTest(unittest.TestCase):
+    def test_normalize_date(self):
+        self.assertEqual(normalize_date('2024/6/5'), '2024-06-05')
+        self.assertEqual(normalize_date(' 2024.06.05 '), '2024-06-05')
+        self.assertIsNone(normalize_date('2024-02-30'))
+        self.assertIsNone(normalize_date('05/06/2024'))
+        self.assertIsNone(normalize_date(''))
+    
+    def test_julian_day(self):
+        self.assertEqual(julian_day('2000-01-01'), 2451545)
+        self.assertEqual(julian_day('2024-03-01') - julian_day('2024-02-28'), 2)
+    
+    def test_parse_date_range(self):
+        self.assertIsNone(parse_date_range('', ' '))
+        self.assertEqual(parse_date_range('2024-06-01', '2024-06-30'), (julian_day('2024-06-01'), julian_day('2024-06-30')))
+        first, last = parse_date_range(date_to='2024-06-30')
+        self.assertEqual((first, last), (0, julian_day('2024-06-30')))
+        with self.assertRaises(ValueError):
+            parse_date_range('2024-06-31')
+        with self.assertRaises(ValueError):
+            parse_date_range('2024-07-01', '2024-06-01')
+
+class DateRangeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.logbook = LogbookStore(os.path.join(self.directory.name, 'logbook.db'))
+        dates = ['2023-12-31', '2024-01-01', '2024/1/15', '2024-02-01']
+        self.logbook.import_flight_rows(enumerate([flight(flight_date) for flight_date in dates], 1))
+    
+    def tearDown(self):
+        self.logbook.conn.close()
+        self.directory.cleanup()
+    
+    def test_dates_are_stored_normalized(self):
+        self.assertEqual(self.logbook.flight_fields(3, ('date',)), {'date': '2024-01-15'})
+    
+    def test_range_includes_both_ends(self):
+        total, _ = self.logbook.find_flights(date_range=parse_date_range('2024-01-01', '2024-01-15'))
+        self.assertEqual(total, 2)
+        total, _ = self.logbook.find_flights(date_range=parse_date_range(date_from='2024-01-15'))
+        self.assertEqual(total, 2)
+        total, _ = self.logbook.find_flights('lasham', 'Launch Site', date_range=parse_date_range(date_to='2023-12-31'))
+        self.assertEqual(total, 1)
+    
+    def test_year_and_month_buckets_follow_date_changes(self):
+        self.assertEqual(self.logbook.statistics('Year'), [('2024', 3, 30, 0.0), ('2023', 1, 10, 0.0)])
+        self.logbook.save_flight(1, flight('2024-02-10', '1:00'))
+        self.assertEqual(self.logbook.statistics('Year'), [('2024', 4, 90, 0.0)])
+        self.assertEqual(self.logbook.statistics('Month'), [('2024-02', 2, 70, 0.0), ('2024-01', 2, 20, 0.0)])
+        self.assertEqual(self.logbook.rebuild_statistics(), [])
+    
+    def test_unreadable_dates_are_unknown(self):
+        # Only an upgraded logbook can hold one; new flights are validated
+        self.logbook.cursor.execute("UPDATE flights SET date = 'sometime', date_jd = NULL WHERE id = 4")
+        self.logbook.conn.commit()
+        self.logbook.rebuild_statistics()
+        
+        self.assertEqual(self.logbook.statistics('Year'), [('2024', 2, 20, 0.0), ('2023', 1, 10, 0.0),
+                                                           ('Unknown', 1, 10, 0.0)])
+        total, _ = self.logbook.find_flights(date_range=parse_date_range(date_from='2023-01-01'))
+        self.assertEqual(total, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""Tests for exporting the logbook and importing the exports back"""
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from logbook_store import EXPORT_COLUMNS, LogbookStore, read_columnar
+
+# The columns a round trip keeps; created_at is restamped
+COMPARED_COLUMNS = ('date', 'aircraft_type', 'aircraft_registration', 'pilot_in_command', 'instructor',
+                    'launch_method', 'launch_site', 'landing_site', 'flight_duration', 'max_altitude',
+                    'cross_country_distance', 'notes', 'duration_minutes', 'date_jd')
+
+FLIGHTS = [
+    {'date': '2024-06-01', 'aircraft_type': 'ASK 21', 'aircraft_registration': 'G-CABC',
+     'pilot_in_command': 'A. Baker', 'instructor': 'E. Evans', 'launch_method': 'Winch',
+     'launch_site': 'Lasham', 'flight_duration': '0:10'},
+    {'date': '2024-06-02', 'aircraft_type': 'Discus', 'aircraft_registration': 'G-DDEF',
+     'pilot_in_command': 'C. Davies', 'launch_method': 'Aerotow', 'launch_site': 'Dunstable',
+     'landing_site': 'Lasham', 'flight_duration': '3:45', 'max_altitude': '1850',
+     'cross_country_distance': '152.5', 'notes': 'Wave, 5 kt – thermals to 6000 ft\nsecond line'},
+    {'date': '2024-06-03', 'aircraft_type': 'Discus', 'aircraft_registration': 'G-DDEF',
+     'pilot_in_command': 'C. Davies', 'launch_method': 'Aerotow', 'launch_site': 'Dunstable'},
+    {'date': '2023-09-14', 'aircraft_type': 'K-13', 'aircraft_registration': 'G-CHKL',
+     'pilot_in_command': 'Ö. Şahin', 'launch_method': 'Winch', 'launch_site': 'Lasham',
+     'flight_duration': '0:06', 'notes': 'Cable break, "circuit" landed'},
+    {'date': '2024-06-04', 'aircraft_type': 'ASK 21', 'aircraft_registration': 'G-CABC',
+     'pilot_in_command': 'A. Baker', 'launch_method': 'Winch', 'launch_site': 'Lasham',
+     'flight_duration': '0:12', 'max_altitude': '0', 'cross_country_distance': '0'},
+]
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.logbook = self.open_logbook('logbook.db')
+        self.logbook.import_flight_rows(enumerate(FLIGHTS, 1))
+    
+    def tearDown(self):
+        self.logbook.conn.close()
+        self.directory.cleanup()
+    
+    def open_logbook(self, name):
+        return LogbookStore(os.path.join(self.directory.name, name))
+    
+    def flights(self, logbook):
+        # Exports are in Flight Log order, so the copies have different ids
+        logbook.cursor.execute(f'SELECT {", ".join(COMPARED_COLUMNS)} FROM flights ORDER BY date_jd')
+        return logbook.cursor.fetchall()
+    
+    def round_trip(self, name):
+        path = os.path.join(self.directory.name, name)
+        self.assertEqual(self.logbook.export_flights(path), len(FLIGHTS))
+        copy = self.open_logbook('copy.db')
+        try:
+            self.assertEqual(copy.import_file(path), (len(FLIGHTS), []))
+            return self.flights(copy), copy.totals(), copy.statistics('Launch Site')
+        finally:
+            copy.conn.close()
+    
+    def test_columnar_round_trip(self):
+        # Several row groups, the last one short
+        with mock.patch('logbook_store.EXPORT_CHUNK_ROWS', 2):
+            flights, totals, sites = self.round_trip('logbook.glbc')
+            groups = list(read_columnar(os.path.join(self.directory.name, 'logbook.glbc')))
+        
+        self.assertEqual(flights, self.flights(self.logbook))
+        self.assertEqual(totals, self.logbook.totals())
+        self.assertEqual(sites, self.logbook.statistics('Launch Site'))
+        self.assertEqual([len(group['id']) for group in groups], [2, 2, 1])
+        self.assertEqual(list(groups[0]), [column for column, _ in EXPORT_COLUMNS])
+        # Zeros stay apart from missing values
+        self.assertEqual(groups[0]['max_altitude'], [0, None])
+        self.assertEqual(groups[0]['cross_country_distance'], [0.0, None])
+    
+    def test_csv_round_trip(self):
+        flights, totals, _ = self.round_trip('logbook.csv')
+        self.assertEqual(flights, self.flights(self.logbook))
+        self.assertEqual(totals, self.logbook.totals())
+    
+    def test_jsonl_export(self):
+        path = os.path.join(self.directory.name, 'logbook.jsonl')
+        self.assertEqual(self.logbook.export_flights(path), len(FLIGHTS))
+        with open(path, encoding='utf-8') as exported:
+            records = [json.loads(line) for line in exported]
+        
+        columns = [column for column, _ in EXPORT_COLUMNS]
+        self.logbook.cursor.execute(f'SELECT {", ".join(columns)} FROM flights')
+        expected = {row[0]: dict(zip(columns, row)) for row in self.logbook.cursor.fetchall()}
+        self.assertEqual({record['id']: record for record in records}, expected)
+    
+    def test_export_matching_search(self):
+        path = os.path.join(self.directory.name, 'dunstable.glbc')
+        self.assertEqual(self.logbook.export_flights(path, search_term='dunst', filter_category='Launch Site'), 2)
+        self.assertEqual([group['launch_site'] for group in read_columnar(path)], [['Dunstable', 'Dunstable']])
+    
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.logbook.export_flights(os.path.join(self.directory.name, 'logbook.xlsx'))
+    
+    def test_not_a_columnar_file(self):
+        path = os.path.join(self.directory.name, 'logbook.glbc')
+        with open(path, 'wb') as not_columnar:
+            not_columnar.write(b'date,aircraft_type\n')
+        with self.assertRaises(ValueError):
+            list(read_columnar(path))
+
+if __name__ == '__main__':
+    unittest.main()
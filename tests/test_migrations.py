@@ -0,0 +1,125 @@
+"""Tests for upgrading logbooks from older schemas"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from logbook_store import LogbookStore
+
+# The flights table before cross-country distance, durations in minutes and
+# dates as Julian days were added
+ORIGINAL_FLIGHTS_SQL = '''
+    CREATE TABLE flights (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        aircraft_type TEXT NOT NULL,
+        aircraft_registration TEXT NOT NULL,
+        pilot_in_command TEXT NOT NULL,
+        instructor TEXT,
+        launch_method TEXT NOT NULL,
+        launch_site TEXT NOT NULL,
+        landing_site TEXT,
+        flight_duration TEXT,
+        max_altitude INTEGER,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+FLIGHTS = [
+    ('2024-06-01', 'ASK 21', 'G-CABC', 'A. Baker', 'Winch', 'Lasham', '0:10'),
+    ('2024/6/5', 'ASK 21', 'G-CABC', 'A. Baker', 'Winch', 'Lasham', '1:30'),
+    ('2023-08-20', 'Discus', 'G-DDEF', 'C. Davies', 'Aerotow', 'Dunstable', '2:05'),
+    ('sometime', 'Discus', 'G-DDEF', 'C. Davies', 'Aerotow', 'Dunstable', 'long'),
+    ('2023-08-21', 'Discus', 'G-DDEF', 'C. Davies', 'Aerotow', 'Dunstable', ''),
+]
+
+class Interrupted(Exception):
+    pass
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'logbook.db')
+        conn = sqlite3.connect(self.path)
+        conn.execute(ORIGINAL_FLIGHTS_SQL)
+        conn.executemany('''
+            INSERT INTO flights (date, aircraft_type, aircraft_registration, pilot_in_command,
+                                 launch_method, launch_site, flight_duration)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', FLIGHTS)
+        conn.commit()
+        conn.close()
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def user_version(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+        finally:
+            conn.close()
+    
+    def assert_upgraded(self, logbook):
+        self.assertFalse(logbook.needs_migration())
+        self.assertEqual(self.user_version(), LogbookStore.MIGRATIONS[-1][0])
+        
+        logbook.cursor.execute('SELECT date, duration_minutes, date_jd IS NOT NULL FROM flights ORDER BY id')
+        self.assertEqual(logbook.cursor.fetchall(), [
+            ('2024-06-01', 10, 1),
+            ('2024-06-05', 90, 1),
+            ('2023-08-20', 125, 1),
+            ('sometime', None, 0),
+            ('2023-08-21', None, 1),
+        ])
+        self.assertEqual(logbook.totals(), (5, 225, 0.0))
+        self.assertEqual(logbook.statistics('Year'), [('2024', 2, 100, 0.0), ('2023', 2, 125, 0.0),
+                                                      ('Unknown', 1, 0, 0.0)])
+        self.assertEqual(logbook.find_flights('dunst', 'Launch Site')[0], 3)
+        self.assertEqual(logbook.rebuild_statistics(), [])
+    
+    def test_upgrade_original_layout(self):
+        steps = []
+        logbook = LogbookStore(self.path, progress=lambda description, done, total: steps.append(description))
+        try:
+            self.assert_upgraded(logbook)
+            self.assertEqual(list(dict.fromkeys(steps)), [description for _, description, _ in LogbookStore.MIGRATIONS])
+        finally:
+            logbook.conn.close()
+    
+    def test_interrupted_upgrade_resumes_from_last_batch(self):
+        def interrupt(description, done, total):
+            if description == "Converting durations to minutes" and done:
+                raise Interrupted()
+        
+        with mock.patch('logbook_store.MIGRATION_BATCH_ROWS', 2):
+            with self.assertRaises(Interrupted):
+                LogbookStore(self.path, progress=interrupt)
+            self.assertEqual(self.user_version(), 1)
+            
+            # The first batch of durations was committed with its checkpoint
+            steps = []
+            logbook = LogbookStore(self.path, migrate=False)
+            try:
+                self.assertTrue(logbook.needs_migration())
+                self.assertEqual(logbook.migration_checkpoint(2), 2)
+                logbook.migrate(lambda description, done, total: steps.append((description, done, total)))
+                self.assert_upgraded(logbook)
+                self.assertIsNone(logbook.migration_checkpoint(2))
+            finally:
+                logbook.conn.close()
+        
+        self.assertNotIn(("Upgrading the flights table", 0, 0), steps)
+        durations = [done for description, done, _ in steps if description == "Converting durations to minutes"]
+        self.assertEqual(durations, [0, 4, 5])
+    
+    def test_current_logbook_skips_migrations(self):
+        LogbookStore(self.path).conn.close()
+        with mock.patch.object(LogbookStore, 'migrate') as migrate:
+            logbook = LogbookStore(self.path)
+            logbook.conn.close()
+        migrate.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+"""Fails when a search query's plan regresses to a full scan or a sort of the whole table"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from logbook_bench import generate_logbook
+from logbook_store import check_query_plans
+
+class QueryPlanTest(unittest.TestCase):
+    def assertNoProblems(self, problems):
+        """Fail listing each query whose plan scans or sorts the flights table"""
+        self.assertEqual([], [f"{description}: {' / '.join(plan)}" for description, _, plan in problems])
+    
+    def test_empty_logbook(self):
+        self.assertNoProblems(check_query_plans())
+    
+    def test_analyzed_logbook(self):
+        # With table statistics the planner weighs the indexes against the data
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'logbook.db')
+            generate_logbook(path, 2000)
+            conn = sqlite3.connect(path)
+            conn.execute('ANALYZE')
+            conn.commit()
+            conn.close()
+            self.assertNoProblems(check_query_plans(path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Tests for cross-country track scoring"""
+import math
+import unittest
+from array import array
+from logbook_igc import FlightTrack, great_circle_km, has_numpy
+
+# Ground speed of the synthetic tracks in m/s, with one fix a second
+SPEED = 25.0
+
+def synthetic_track(turnpoints, ground_fixes=300):
+    """Return a FlightTrack flying straight legs between (lat, lon) degree turnpoints"""
+    points = [turnpoints[0]] * ground_fixes
+    for (lat1, lon1), (lat2, lon2) in zip(turnpoints, turnpoints[1:]):
+        km = great_circle_km(math.radians(lat1), math.radians(lon1), math.radians(lat2), math.radians(lon2))
+        steps = max(1, int(km * 1000 / SPEED))
+        points.extend((lat1 + (lat2 - lat1) * i / steps, lon1 + (lon2 - lon1) * i / steps) for i in range(steps))
+    points.extend([turnpoints[-1]] * ground_fixes)
+    
+    count = len(points)
+    return FlightTrack(
+        0, None,
+        times=array('i', range(count)),
+        lats=array('i', (round(lat * 60000) for lat, _ in points)),
+        lons=array('i', (round(lon * 60000) for _, lon in points)),
+        pressure_alts=array('i', [1000] * count),
+        gnss_alts=array('i', [1000] * count),
+        valid=array('b', [1] * count),
+    )
+
+@unittest.skipUnless(has_numpy(), "scoring needs NumPy")
+class TriangleTest(unittest.TestCase):
+    def test_shorter_fai_triangle(self):
+        # A small FAI triangle south of home, then a long thin one to the north
+        from logbook_scoring import score_track
+        home = (52.0, -1.0)
+        track = synthetic_track([home, (51.64, -1.29), (51.64, -0.71), home, (53.35, -1.0), (53.35, -0.78), home])
+        scores = score_track(track)
+        
+        self.assertFalse(scores['triangle_fai'])
+        self.assertGreater(scores['triangle_km'], 400)
+        self.assertAlmostEqual(scores['fai_triangle_km'], 141.4, delta=2)
+    
+    def test_fai_triangle_is_best_triangle(self):
+        from logbook_scoring import score_track
+        home = (52.0, -1.0)
+        track = synthetic_track([home, (52.6, -1.5), (52.6, -0.5), home])
+        scores = score_track(track)
+        
+        self.assertTrue(scores['triangle_fai'])
+        self.assertEqual(scores['fai_triangle_km'], scores['triangle_km'])
+
+if __name__ == '__main__':
+    unittest.main()
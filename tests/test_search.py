@@ -0,0 +1,103 @@
+"""Tests for FlightSearch result caching"""
+import sqlite3
+import unittest
+from unittest import mock
+from logbook_store import LogbookStore, FlightSearch, DEFAULT_SORT
+
+def flight(registration, pilot, launch_site='Lasham'):
+    """Return a valid flight dict"""
+    return {
+        'date': '2024-06-15',
+        'aircraft_type': 'ASK 21',
+        'aircraft_registration': registration,
+        'pilot_in_command': pilot,
+        'launch_method': 'Winch',
+        'launch_site': launch_site,
+        'flight_duration': '0:08',
+    }
+
+class InterruptedSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.logbook = LogbookStore(':memory:')
+        flights = [flight('G-CABC', 'A. Baker'), flight('G-CXYZ', 'B. Clarke'),
+                   flight('G-DXYA', 'C. Davies', 'Dunstable'), flight('G-EFGH', 'D. Evans', 'Dunstable')]
+        self.logbook.import_flight_rows(enumerate(flights, 1))
+    
+    def interrupted(self, search_term, filter_category):
+        """Run a search that is interrupted before its first query finishes"""
+        self.logbook.conn.set_progress_handler(lambda: 1, 1)
+        try:
+            with self.assertRaises(sqlite3.OperationalError):
+                self.logbook.search.search(search_term, filter_category)
+        finally:
+            self.logbook.conn.set_progress_handler(None, 1)
+    
+    def test_extending_term_after_interrupt(self):
+        self.assertEqual(self.logbook.find_flights('dun', 'Launch Site')[0], 2)
+        self.interrupted('x', 'Registration')
+        
+        total, rows = self.logbook.find_flights('xy', 'Registration')
+        self.assertEqual(total, 2)
+        self.assertEqual(sorted(row[3] for row in rows), ['G-CXYZ', 'G-DXYA'])
+    
+    def test_interrupt_forgets_cached_rows(self):
+        self.logbook.find_flights('g-c', 'Registration')
+        self.interrupted('g-d', 'Registration')
+        
+        search = self.logbook.search
+        self.assertIsNone(search.last_rows)
+        self.assertIsNone(search.last_term)
+        self.assertEqual(self.logbook.find_flights('g-dx', 'Registration')[0], 1)
+
+class PagedSearchTest(unittest.TestCase):
+    """Pages of a result set too large to cache, read by one search and shown by another"""
+    
+    def setUp(self):
+        for name, value in (('CACHE_LIMIT', 10), ('BLOCK_SIZE', 4)):
+            patcher = mock.patch.object(FlightSearch, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.logbook = LogbookStore(':memory:')
+        flights = [dict(flight(f'G-C{day:03d}', 'A. Baker'), date=f'2024-06-{day:02d}') for day in range(1, 29)]
+        self.logbook.import_flight_rows(enumerate(flights, 1))
+        
+        # Newest first, as the Flight Log shows them
+        self.ids = list(range(28, 0, -1))
+        self.shown = FlightSearch(self.logbook.conn)
+        self.shown.adopt('', 'All', len(self.ids), None, DEFAULT_SORT)
+    
+    def fetch(self, blocks):
+        """Read pages as the database worker does, seeking from the neighbours on show"""
+        search = self.logbook.search_for('', 'All', None, DEFAULT_SORT)
+        search.add_blocks(self.shown.neighbours(blocks))
+        return {block: search.fetch_block(block) for block in blocks}
+    
+    def test_missing_pages_are_read_elsewhere(self):
+        self.assertEqual(self.shown.missing_blocks(10, 6), [2, 3])
+        self.shown.add_blocks(self.fetch([2, 3]))
+        self.assertEqual(self.shown.missing_blocks(10, 6), [])
+        self.assertEqual([row[0] for row in self.shown.rows(10, 6)], self.ids[10:16])
+    
+    def test_pages_seek_from_cached_neighbours(self):
+        self.shown.add_blocks(self.fetch([3]))
+        self.assertEqual(list(self.shown.neighbours([2, 4])), [3])
+        
+        seeks = []
+        block_query = FlightSearch.block_query
+        
+        def recorded(search, block, previous_row=None, next_row=None):
+            seeks.append(previous_row)
+            return block_query(search, block, previous_row, next_row)
+        
+        with mock.patch.object(FlightSearch, 'block_query', recorded):
+            fetched = self.fetch([4])
+        self.assertEqual(seeks, [self.shown.blocks[3][-1]])
+        self.assertEqual([row[0] for row in fetched[4]], self.ids[16:20])
+    
+    def test_cached_pages_are_capped(self):
+        self.shown.add_blocks({block: [] for block in range(FlightSearch.MAX_BLOCKS + 2)})
+        self.assertEqual(len(self.shown.blocks), FlightSearch.MAX_BLOCKS)
+        self.assertEqual(self.shown.missing_blocks(0, 8), [0, 1])
+
+if __name__ == '__main__':
+    unittest.main()
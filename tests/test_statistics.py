@@ -0,0 +1,79 @@
+"""Tests for the trigger-maintained statistics breakdowns"""
+import os
+import tempfile
+import unittest
+from logbook_store import LogbookStore
+
+def flight(aircraft='ASK 21', site='Lasham', method='Winch', duration='0:10', distance=''):
+    """Return a valid flight dict"""
+    return {
+        'date': '2024-06-01',
+        'aircraft_type': aircraft,
+        'aircraft_registration': 'G-CABC',
+        'pilot_in_command': 'A. Baker',
+        'launch_method': method,
+        'launch_site': site,
+        'flight_duration': duration,
+        'cross_country_distance': distance,
+    }
+
+class StatisticsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.logbook = LogbookStore(os.path.join(self.directory.name, 'logbook.db'))
+    
+    def tearDown(self):
+        self.logbook.conn.close()
+        self.directory.cleanup()
+    
+    def assert_no_drift(self):
+        self.assertEqual(self.logbook.rebuild_statistics(), [])
+    
+    def test_buckets_follow_single_flight_writes(self):
+        self.logbook.create_flight(flight(duration='1:00', distance='50'))
+        flight_id = self.logbook.create_flight(flight('Discus', method='Aerotow', duration='2:00'))
+        self.assertEqual(self.logbook.statistics('Aircraft Type'), [('ASK 21', 1, 60, 50.0), ('Discus', 1, 120, 0.0)])
+        self.assertEqual(self.logbook.statistics('Launch Site'), [('Lasham', 2, 180, 50.0)])
+        self.assert_no_drift()
+        
+        self.logbook.save_flight(flight_id, flight('Discus', 'Dunstable', 'Aerotow', '2:30'))
+        self.assertEqual(self.logbook.statistics('Launch Site'), [('Dunstable', 1, 150, 0.0), ('Lasham', 1, 60, 50.0)])
+        self.assertEqual(self.logbook.statistics('Launch Method'), [('Aerotow', 1, 150, 0.0), ('Winch', 1, 60, 50.0)])
+        self.assert_no_drift()
+        
+        # Emptied buckets are no longer listed
+        self.logbook.remove_flight(flight_id)
+        self.assertEqual(self.logbook.statistics('Aircraft Type'), [('ASK 21', 1, 60, 50.0)])
+        self.assert_no_drift()
+    
+    def test_buckets_ignore_case(self):
+        self.logbook.create_flight(flight(site='Lasham'))
+        self.logbook.create_flight(flight(site='LASHAM'))
+        self.assertEqual(self.logbook.statistics('Launch Site'), [('Lasham', 2, 20, 0.0)])
+        self.assert_no_drift()
+    
+    def test_buckets_follow_bulk_writes(self):
+        flights = [flight(site='Lasham')] * 3 + [flight('Discus', 'Dunstable', 'Aerotow', '1:00')]
+        self.logbook.import_flight_rows(enumerate(flights, 1))
+        self.assertEqual(self.logbook.statistics('Launch Site'), [('Lasham', 3, 30, 0.0), ('Dunstable', 1, 60, 0.0)])
+        self.assert_no_drift()
+        
+        self.logbook.set_field('Launch Site', 'Challock', flight_ids=[1, 2])
+        self.assertEqual(self.logbook.statistics('Launch Site'),
+                         [('Challock', 2, 20, 0.0), ('Dunstable', 1, 60, 0.0), ('Lasham', 1, 10, 0.0)])
+        self.assert_no_drift()
+        
+        self.logbook.remove_flights([1, 4])
+        self.assertEqual(self.logbook.statistics('Launch Site'), [('Challock', 1, 10, 0.0), ('Lasham', 1, 10, 0.0)])
+        self.assert_no_drift()
+    
+    def test_rebuild_reports_drifted_buckets(self):
+        self.logbook.create_flight(flight())
+        self.logbook.cursor.execute("UPDATE flight_stats SET launches = 5 WHERE dimension = 'launch_site'")
+        self.logbook.conn.commit()
+        
+        self.assertEqual(self.logbook.rebuild_statistics(), [('launch_site', 'lasham')])
+        self.assertEqual(self.logbook.statistics('Launch Site'), [('Lasham', 1, 10, 0.0)])
+
+if __name__ == '__main__':
+    unittest.main()
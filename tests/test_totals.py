@@ -0,0 +1,73 @@
+"""Tests for the trigger-maintained running totals"""
+import os
+import tempfile
+import unittest
+from logbook_store import LogbookStore
+
+def flight(duration='0:10', distance=''):
+    """Return a valid flight dict"""
+    return {
+        'date': '2024-06-01',
+        'aircraft_type': 'ASK 21',
+        'aircraft_registration': 'G-CABC',
+        'pilot_in_command': 'A. Baker',
+        'launch_method': 'Winch',
+        'launch_site': 'Lasham',
+        'flight_duration': duration,
+        'cross_country_distance': distance,
+    }
+
+class RunningTotalsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.logbook = LogbookStore(os.path.join(self.directory.name, 'logbook.db'))
+    
+    def tearDown(self):
+        self.logbook.conn.close()
+        self.directory.cleanup()
+    
+    def assert_totals(self, expected):
+        self.assertEqual(self.logbook.totals(), expected)
+        previous, rebuilt = self.logbook.rebuild_totals()
+        self.assertEqual(previous, rebuilt)
+    
+    def test_single_flight_writes(self):
+        self.assert_totals((0, 0, 0.0))
+        flight_id = self.logbook.create_flight(flight('1:30', '52.5'))
+        self.logbook.create_flight(flight('0:10'))
+        self.assert_totals((2, 100, 52.5))
+        
+        self.logbook.save_flight(flight_id, flight('2:00', '100'))
+        self.assert_totals((2, 130, 100.0))
+        
+        self.logbook.save_flight(flight_id, flight('', ''))
+        self.assert_totals((2, 10, 0.0))
+        
+        self.logbook.remove_flight(flight_id)
+        self.assert_totals((1, 10, 0.0))
+    
+    def test_bulk_writes(self):
+        imported, _ = self.logbook.import_flight_rows(enumerate([flight('1:00', '20')] * 3 + [flight('')], 1))
+        self.assertEqual(imported, 4)
+        self.assert_totals((4, 180, 60.0))
+        
+        # Imports update the totals in one statement per batch, adding to what is there
+        self.logbook.import_flight_rows(enumerate([flight('0:30')], 1))
+        self.assert_totals((5, 210, 60.0))
+        
+        self.logbook.set_field('Launch Site', 'Dunstable')
+        self.assert_totals((5, 210, 60.0))
+        
+        self.logbook.remove_flights([1, 2])
+        self.assert_totals((3, 90, 20.0))
+    
+    def test_rebuild_repairs_drift(self):
+        self.logbook.create_flight(flight('1:00', '20'))
+        self.logbook.cursor.execute('UPDATE flight_totals SET launches = 7, minutes = 0 WHERE id = 1')
+        self.logbook.conn.commit()
+        
+        self.assertEqual(self.logbook.rebuild_totals(), ((7, 0, 20.0), (1, 60, 20.0)))
+        self.assert_totals((1, 60, 20.0))
+
+if __name__ == '__main__':
+    unittest.main()
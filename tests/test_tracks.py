@@ -0,0 +1,66 @@
+"""Tests for attaching IGC logger files to flights"""
+import os
+import tempfile
+import unittest
+from logbook_store import LogbookStore
+
+def write_igc(path, ground_fixes=300, flying_fixes=1200, altitude=1200):
+    """Write an IGC file that sits still, flies due north at 25 m/s for flying_fixes seconds, then sits still"""
+    lines = ['AXXX001 test logger', 'HFDTE150624']
+    lat = 52 * 60000
+    for second in range(2 * ground_fixes + flying_fixes):
+        if ground_fixes <= second < ground_fixes + flying_fixes:
+            # 25 m is about 13.5 thousandths of a minute of latitude
+            lat += 13.5
+        hours, rest = divmod(36000 + second, 3600)
+        minutes, seconds = divmod(rest, 60)
+        degrees, thousandths = divmod(round(lat), 60000)
+        alt = altitude if ground_fixes + 60 <= second < ground_fixes + flying_fixes - 60 else 200
+        lines.append(f"B{hours:02d}{minutes:02d}{seconds:02d}{degrees:02d}{thousandths:05d}N00100000WA"
+                     f"{alt:05d}{alt:05d}")
+    with open(path, 'w') as igc_file:
+        igc_file.write('\r\n'.join(lines) + '\r\n')
+
+class AttachTrackTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.logbook = LogbookStore(':memory:')
+        self.flight_id = self.logbook.create_flight({
+            'date': '2024-06-15', 'aircraft_type': 'ASK 21', 'aircraft_registration': 'G-CABC',
+            'pilot_in_command': 'A. Baker', 'launch_method': 'Winch', 'launch_site': 'Lasham',
+            'flight_duration': '0:05',
+        })
+    
+    def test_attach_takes_duration_and_altitude_from_track(self):
+        path = os.path.join(self.directory.name, 'flight.igc')
+        write_igc(path)
+        summary = self.logbook.attach_track(self.flight_id, path)
+        
+        self.assertEqual(summary['duration_minutes'], 20)
+        self.assertEqual(summary['max_altitude_m'], 1200)
+        self.assertAlmostEqual(summary['distance_km'], 30.0, delta=0.1)
+        flight = self.logbook.get_flight(self.flight_id)
+        self.assertEqual(flight[14], summary['duration_minutes'])
+        self.assertEqual(flight[10], round(1200 * 3.28084))
+        self.assertEqual(self.logbook.totals()[1], summary['duration_minutes'])
+        self.assertEqual(self.logbook.track_summary(self.flight_id)['filename'], 'flight.igc')
+        self.assertEqual(len(self.logbook.get_track(self.flight_id)), 1800)
+    
+    def test_track_that_never_flies_keeps_duration(self):
+        path = os.path.join(self.directory.name, 'ground.igc')
+        write_igc(path, flying_fixes=0)
+        summary = self.logbook.attach_track(self.flight_id, path)
+        
+        self.assertIsNone(summary['takeoff_time'])
+        self.assertEqual(self.logbook.get_flight(self.flight_id)[14], 5)
+    
+    def test_attach_to_missing_flight(self):
+        path = os.path.join(self.directory.name, 'flight.igc')
+        write_igc(path)
+        with self.assertRaises(ValueError):
+            self.logbook.attach_track(self.flight_id + 1, path)
+        self.assertIsNone(self.logbook.track_summary(self.flight_id + 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Tests for writes and reads run on the DatabaseWorker"""
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+from logbook_store import LogbookStore, DatabaseWorker
+
+def flight(flight_date, pilot='A. Baker', duration='0:10'):
+    """Return a valid flight dict"""
+    return {
+        'date': flight_date,
+        'aircraft_type': 'ASK 21',
+        'aircraft_registration': 'G-CABC',
+        'pilot_in_command': pilot,
+        'launch_method': 'Winch',
+        'launch_site': 'Lasham',
+        'flight_duration': duration,
+    }
+
+class WorkerWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'logbook.db')
+        logbook = LogbookStore(self.path)
+        logbook.import_flight_rows(enumerate([flight('2024-06-01'), flight('2024-06-10', 'C. Davies')], 1))
+        logbook.conn.close()
+        
+        self.worker = DatabaseWorker(self.path)
+    
+    def tearDown(self):
+        self.worker.stop()
+        self.worker.thread.join()
+        self.directory.cleanup()
+    
+    def run_job(self, job, key=None):
+        """Run a job on the worker and return its result, or the exception it raised"""
+        results = []
+        # The traceback would keep the worker's store alive on this thread
+        self.worker.submit(job, results.append, lambda e: results.append(e.with_traceback(None)), key)
+        while self.worker.deliver_results():
+            time.sleep(0.005)
+        return results[0]
+    
+    def count_loads(self, store):
+        """Count the worker's currency index reloads in self.loads"""
+        self.loads = 0
+        load = store.currency_index.load
+        
+        def counted_load(cursor):
+            self.loads += 1
+            load(cursor)
+        
+        store.currency_index.load = counted_load
+    
+    def test_write_on_worker_keeps_its_currency_index(self):
+        self.run_job(self.count_loads)
+        self.assertEqual(self.run_job(lambda store: store.currency(today='2024-06-15')[90]), (2, 20))
+        
+        flight_id = self.run_job(lambda store: store.create_flight(flight('2024-06-12', duration='1:00')))
+        self.assertEqual(self.run_job(lambda store: store.currency(today='2024-06-15')[90]), (3, 80))
+        self.run_job(lambda store: store.remove_flight(flight_id))
+        self.assertEqual(self.run_job(lambda store: store.currency(today='2024-06-15')[90]), (2, 20))
+        self.assertEqual(self.loads, 1)
+    
+    def test_search_for_leaves_the_store_search_alone(self):
+        def job(store):
+            store.find_flights('davies', 'Pilot')
+            row = store.search_for('baker', 'Pilot').matching_row(1)
+            return row[4], store.search.last_term, store.search.total
+        
+        self.assertEqual(self.run_job(job), ('A. Baker', 'davies', 1))
+    
+    def test_failed_write_reports_error(self):
+        error = self.run_job(lambda store: store.create_flight(flight('2024-02-30')))
+        self.assertIsInstance(error, ValueError)
+        self.assertEqual(self.run_job(lambda store: store.totals()[0]), 2)
+    
+    def test_cancelled_import_stops_between_batches(self):
+        delivered = []
+        
+        def load(store):
+            def progress(count):
+                # Pressing Cancel after the first batch
+                self.worker.cancel('import')
+                self.worker.check_cancelled()
+            flights = (flight(f'2024-07-{day:02d}') for day in range(1, 11))
+            return store.import_flight_rows(enumerate(flights, 1), progress)
+        
+        with mock.patch('logbook_store.IMPORT_BATCH_ROWS', 4):
+            self.worker.submit(load, delivered.append, delivered.append, 'import')
+            self.assertEqual(self.run_job(lambda store: store.totals()[0]), 6)
+        self.assertEqual(delivered, [])
+    
+    def test_cancelling_another_job(self):
+        def export(store):
+            self.worker.cancel('import')
+            self.worker.check_cancelled()
+            return store.totals()[0]
+        
+        self.assertEqual(self.run_job(export, 'export'), 2)
+
+if __name__ == '__main__':
+    unittest.main()